@@ -0,0 +1,31 @@
+"""Compare two benchmark result files and fail on regressions.
+
+Usage:
+    python -m benchmarks.compare baseline.json results.json --threshold 0.1
+"""
+import argparse
+import sys
+
+from .harness import compare_results, load_results
+
+
+def main(args) -> int:
+    rows = compare_results(load_results(args.baseline), load_results(args.current), args.threshold, args.metric)
+    width = max([len(row["name"]) for row in rows] + [9])
+    print(f"{'benchmark':<{width}}  {'baseline':>12}  {'current':>12}  {'change':>8}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['name']:<{width}}  {row['baseline']:>12.3f}  {row['current']:>12.3f}  {row['change']:>+8.1%}{flag}")
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%} in {args.metric}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare fdk_extension benchmark results")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Allowed slowdown, 0.1 is 10%%")
+    parser.add_argument("--metric", default="p50_us", choices=("mean_us", "p50_us", "p99_us"))
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,77 @@
+"""Timing, result files and regression comparison shared by the benchmarks."""
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Awaitable, Callable, Text
+
+
+RESULTS_VERSION = 1
+
+
+async def measure(func: Callable[[], Awaitable], iterations: int, warmup: int=None) -> dict:
+    """Run `func` sequentially and report latency percentiles in microseconds."""
+    for _ in range(warmup if warmup is not None else max(iterations // 10, 1)):
+        await func()
+
+    samples = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "ops_per_sec": round(iterations / elapsed, 2),
+        "mean_us": round(statistics.mean(samples) * 1e6, 3),
+        "p50_us": round(samples[len(samples) // 2] * 1e6, 3),
+        "p99_us": round(samples[min(int(len(samples) * 0.99), len(samples) - 1)] * 1e6, 3)
+    }
+
+
+def get_environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    }
+
+
+def save_results(path: Text, results: dict) -> None:
+    with open(path, "w") as results_file:
+        json.dump({"version": RESULTS_VERSION, "environment": get_environment(), "results": results},
+                  results_file, indent=2)
+
+
+def load_results(path: Text) -> dict:
+    with open(path) as results_file:
+        return json.load(results_file)["results"]
+
+
+def compare_results(baseline: dict, current: dict, threshold: float=0.1, metric: Text="p50_us") -> list:
+    """Compare latency `metric` of the benchmarks found in both result sets.
+
+    Returns one row per benchmark, rows slower than the baseline by more than `threshold` are marked
+    as regressions.
+    """
+    rows = []
+    for name in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[name].get(metric), current[name].get(metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        rows.append({"name": name, "baseline": before, "current": after, "change": round(change, 4),
+                     "regression": change > threshold})
+    return rows
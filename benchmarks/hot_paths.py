@@ -0,0 +1,210 @@
+"""Benchmark the library's per request hot paths without network access.
+
+Usage:
+    python -m benchmarks.hot_paths --output results.json [--redis-url redis://localhost] [--only webhook]
+    python -m benchmarks.compare baseline.json results.json
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from types import SimpleNamespace
+
+from fdk_client.platform.OAuthClient import OAuthClient
+
+from fdk_extension.extension import extension
+from fdk_extension.middleware.api_middleware import platform_api_on_request
+from fdk_extension.middleware.session_middleware import session_middleware
+from fdk_extension.session.session import Session
+from fdk_extension.session.session_storage import SessionStorage
+from fdk_extension.storage.memory_storage import MemoryStorage
+from fdk_extension.utilities.logger import configure_logging
+from fdk_extension.utilities.utility import get_company_cookie_name
+from fdk_extension.webhook import WebhookRegistry
+
+from .harness import measure, save_results
+
+
+API_KEY = "benchmark_api_key"
+API_SECRET = "benchmark_api_secret"
+CLUSTER = "https://api.fynd.com"
+COMPANY_ID = 1
+WEBHOOK_PAYLOAD_SIZES = (1024, 10 * 1024, 100 * 1024)
+
+
+def setup_extension(storage) -> None:
+    # configure the global extension the way `setup_fdk` would, without fetching extension details
+    extension.api_key = API_KEY
+    extension.api_secret = API_SECRET
+    extension.cluster = CLUSTER
+    extension.storage = storage
+    extension.base_url = "https://benchmark.local"
+    extension.scopes = ["company/profile"]
+    extension.access_mode = "offline"
+    extension.legacy_conn_ctx = False
+    extension._Extension__is_initialized = True
+
+
+def get_session(access_token_validity: int=None) -> Session:
+    session = Session(Session.generate_session_id(False, cluster=CLUSTER, company_id=COMPANY_ID), False)
+    session.company_id = COMPANY_ID
+    session.state = "c5b1c3a8-2d2f-4c3d-8b1a-4f0c4e8f3a11"
+    session.scope = ["company/profile", "company/product", "company/order"]
+    session.access_mode = "offline"
+    session.access_token = "a" * 40
+    session.refresh_token = "r" * 40
+    session.expires_in = 599
+    session.access_token_validity = access_token_validity or int(time.time() * 1000) + 3600 * 1000
+    session.extension_id = "6220daa4a5414621b975a41f"
+    return session
+
+
+def get_request(session_id: str=None) -> SimpleNamespace:
+    cookies = {get_company_cookie_name(company_id=str(COMPANY_ID)): session_id} if session_id else {}
+    return SimpleNamespace(headers={"x-company-id": str(COMPANY_ID)}, args={}, cookies=cookies,
+                           conn_info=None, ctx=SimpleNamespace())
+
+
+async def session_benchmarks(iterations: int) -> dict:
+    session = get_session()
+    session_json = json.loads(session.to_json())
+    return {
+        "session.to_json": await measure(lambda: _async(session.to_json), iterations),
+        "session.clone_session": await measure(lambda: _async(Session.clone_session, dict(session_json)),
+                                               iterations)
+    }
+
+
+async def session_storage_benchmarks(storages: dict, iterations: int) -> dict:
+    results = {}
+    for name, storage in storages.items():
+        setup_extension(storage)
+        session = get_session()
+
+        async def round_trip():
+            session.mark_dirty(["access_token"])
+            await SessionStorage.write_session(session, full=True)
+            await SessionStorage.get_session(session.session_id)
+
+        results[f"session_storage.round_trip.{name}"] = await measure(round_trip, iterations)
+    return results
+
+
+async def middleware_benchmarks(iterations: int) -> dict:
+    setup_extension(MemoryStorage("benchmark"))
+    session = get_session()
+    await SessionStorage.write_session(session, full=True)
+
+    async def platform_request():
+        request = get_request(session.session_id)
+        await session_middleware(request)
+        await platform_api_on_request(request)
+
+    return {"middleware.platform_request": await measure(platform_request, iterations)}
+
+
+async def webhook_benchmarks(iterations: int) -> dict:
+    setup_extension(MemoryStorage("benchmark"))
+
+    async def handler(event_name, body, company_id, application_id):
+        pass
+
+    webhook_registry = WebhookRegistry()
+    webhook_registry._handler_map = {"company/product/update": {"handler": handler}}
+    webhook_registry._config = {"subscribe_on_install": True}
+    webhook_registry._fdk_config = {"api_secret": API_SECRET}
+
+    results = {}
+    for size in WEBHOOK_PAYLOAD_SIZES:
+        body = json.dumps({
+            "event": {"name": "product", "type": "update", "category": "company"},
+            "company_id": COMPANY_ID,
+            "application_id": None,
+            "payload": {"product": {"description": "x" * size}}
+        }).encode()
+        request = SimpleNamespace(body=body, json=json.loads(body), headers={
+            "x-fp-signature": hmac.new(API_SECRET.encode(), body, hashlib.sha256).hexdigest()
+        })
+        results[f"webhook.verify_signature.{size // 1024}kb"] = await measure(
+            lambda: _async(webhook_registry.verify_signature, request), iterations)
+        results[f"webhook.process_webhook.{size // 1024}kb"] = await measure(
+            lambda: webhook_registry.process_webhook(request), iterations)
+    return results
+
+
+async def platform_client_benchmarks(iterations: int) -> dict:
+    setup_extension(MemoryStorage("benchmark"))
+    results = {}
+
+    session = get_session()
+    results["platform_client.build"] = await measure(lambda: extension.get_platform_client(COMPANY_ID, session),
+                                                     iterations)
+
+    async def renew_access_token(self, *args, **kwargs):
+        # token endpoint answered locally, the benchmark measures the library's share of a renewal
+        self.token_expires_at = int(time.time() * 1000) + 600 * 1000
+        return {"access_token": "n" * 40, "refresh_token": "r" * 40, "expires_in": 600, "access_mode": "offline"}
+
+    original_renew_access_token = OAuthClient.renewAccessToken
+    OAuthClient.renewAccessToken = renew_access_token
+    try:
+        async def build_with_renewal():
+            await extension.get_platform_client(COMPANY_ID, get_session(access_token_validity=1))
+
+        results["platform_client.build_with_renewal"] = await measure(build_with_renewal, iterations)
+    finally:
+        OAuthClient.renewAccessToken = original_renew_access_token
+    return results
+
+
+async def _async(func, *args):
+    return func(*args)
+
+
+async def get_storages(redis_url: str) -> dict:
+    storages = {"memory": MemoryStorage("benchmark")}
+    if redis_url:
+        import aioredis
+        from fdk_extension.storage.redis_storage import RedisStorage
+        client = aioredis.from_url(redis_url)
+        try:
+            await client.ping()
+            storages["redis"] = RedisStorage(client, prefix_key="benchmark")
+        except Exception as e:
+            print(f"Skipping redis benchmark, Reason: {str(e)}")
+    return storages
+
+
+SUITES = ("session", "session_storage", "middleware", "webhook", "platform_client")
+
+
+async def main(args) -> dict:
+    suites = args.only or SUITES
+    results = {}
+    if "session" in suites:
+        results.update(await session_benchmarks(args.iterations))
+    if "session_storage" in suites:
+        results.update(await session_storage_benchmarks(await get_storages(args.redis_url), args.iterations))
+    if "middleware" in suites:
+        results.update(await middleware_benchmarks(args.iterations))
+    if "webhook" in suites:
+        results.update(await webhook_benchmarks(args.iterations))
+    if "platform_client" in suites:
+        results.update(await platform_client_benchmarks(args.iterations))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark fdk_extension hot paths")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--redis-url", default=None, help="Redis url, skipped when not passed")
+    parser.add_argument("--only", nargs="+", choices=SUITES, help="Run only these suites")
+    parser.add_argument("--output", default=None, help="Save results as json to this path")
+    arguments = parser.parse_args()
+    configure_logging(level="warning")
+    report = asyncio.run(main(arguments))
+    if arguments.output:
+        save_results(arguments.output, report)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,182 @@
+"""Measure memory held per session, cached client and pending webhook with tracemalloc.
+
+Usage:
+    python -m benchmarks.memory_benchmark [--scale 10] [--only sessions memory_storage] [--output memory.json]
+
+Each scenario reports the bytes retained per entry and the peak traced memory while populating it. The
+command exits with status 1 when an entry costs more than its limit in `memory_thresholds.json`.
+"""
+import argparse
+import asyncio
+import gc
+import hashlib
+import hmac
+import json
+import os
+import tracemalloc
+from types import SimpleNamespace
+
+from fdk_extension.clients.application_client_cache import ApplicationClientCache
+from fdk_extension.clients.rate_limiter import MAX_TRACKED_COMPANIES, PlatformRateLimiter
+from fdk_extension.extension import extension
+from fdk_extension.session.session import Session
+from fdk_extension.storage.memory_storage import MemoryStorage
+from fdk_extension.utilities.logger import configure_logging
+from fdk_extension.utilities.lru_cache import LRUCache
+from fdk_extension.webhook import WebhookRegistry
+
+from .harness import save_results
+from .hot_paths import API_SECRET, CLUSTER, get_session, setup_extension
+
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), "memory_thresholds.json")
+
+# entries per scenario at scale 1
+ENTRIES = {
+    "sessions": 100000,
+    "memory_storage": 100000,
+    "platform_clients": 10000,
+    "application_client_cache": 10000,
+    "negative_session_cache": 100000,
+    "rate_limiter_companies": MAX_TRACKED_COMPANIES,
+    "pending_webhooks": 10000
+}
+
+
+def new_session(index: int) -> Session:
+    session = get_session()
+    session.session_id = Session.generate_session_id(False, cluster=CLUSTER, company_id=index)
+    session.company_id = index
+    return session
+
+
+async def populate_sessions(count: int) -> list:
+    return [new_session(index) for index in range(count)]
+
+
+async def populate_memory_storage(count: int) -> MemoryStorage:
+    storage = MemoryStorage("benchmark")
+    for index in range(count):
+        session = new_session(index)
+        await storage.setex(session.session_id, 900, session.to_json())
+    return storage
+
+
+async def populate_platform_clients(count: int) -> list:
+    return [await extension.get_platform_client(index, new_session(index)) for index in range(1, count + 1)]
+
+
+async def populate_application_client_cache(count: int) -> ApplicationClientCache:
+    cache = ApplicationClientCache(max_size=count)
+    for index in range(count):
+        cache.get_client(f"{index:024x}", f"token_{index}", CLUSTER)
+    return cache
+
+
+async def populate_negative_session_cache(count: int) -> LRUCache:
+    cache = LRUCache(count, 5)
+    for index in range(count):
+        cache.set(hashlib.sha256(str(index).encode()).hexdigest(), True)
+    return cache
+
+
+async def populate_rate_limiter_companies(count: int) -> PlatformRateLimiter:
+    rate_limiter = PlatformRateLimiter({"company": {"rate": 10, "burst": 20, "concurrency": 5}}, CLUSTER)
+    for index in range(count):
+        rate_limiter._get_company_limits(index)
+    return rate_limiter
+
+
+async def populate_pending_webhooks(count: int) -> tuple:
+    # events accepted and waiting inside their handler, like a backlog behind a slow database
+    release = asyncio.Event()
+
+    async def handler(event_name, body, company_id, application_id):
+        await release.wait()
+
+    webhook_registry = WebhookRegistry()
+    webhook_registry._handler_map = {"company/product/update": {"handler": handler}}
+    webhook_registry._config = {"subscribe_on_install": True}
+    webhook_registry._fdk_config = {"api_secret": API_SECRET}
+
+    tasks = []
+    for index in range(count):
+        body = json.dumps({"event": {"name": "product", "type": "update", "category": "company"},
+                           "company_id": index, "application_id": None,
+                           "payload": {"product": {"id": index, "description": "x" * 1024}}}).encode()
+        request = SimpleNamespace(body=body, json=json.loads(body), headers={
+            "x-fp-signature": hmac.new(API_SECRET.encode(), body, hashlib.sha256).hexdigest()
+        })
+        tasks.append(asyncio.ensure_future(webhook_registry.process_webhook(request)))
+    await asyncio.sleep(0)
+    return release, tasks
+
+
+SCENARIOS = {
+    "sessions": populate_sessions,
+    "memory_storage": populate_memory_storage,
+    "platform_clients": populate_platform_clients,
+    "application_client_cache": populate_application_client_cache,
+    "negative_session_cache": populate_negative_session_cache,
+    "rate_limiter_companies": populate_rate_limiter_companies,
+    "pending_webhooks": populate_pending_webhooks
+}
+
+
+async def measure_scenario(name: str, count: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        retained = await SCENARIOS[name](count)
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    if name == "pending_webhooks":
+        release, tasks = retained
+        release.set()
+        await asyncio.gather(*tasks)
+    del retained
+    return {
+        "entries": count,
+        "bytes_per_entry": round((current - baseline) / count, 1),
+        "total_mb": round((current - baseline) / 2 ** 20, 2),
+        "peak_mb": round((peak - baseline) / 2 ** 20, 2)
+    }
+
+
+def check_thresholds(results: dict, thresholds: dict) -> list:
+    return [f"{name}: {result['bytes_per_entry']} bytes per entry, limit {thresholds[name]}"
+            for name, result in results.items()
+            if name in thresholds and result["bytes_per_entry"] > thresholds[name]]
+
+
+async def main(args) -> dict:
+    setup_extension(MemoryStorage("benchmark"))
+    results = {}
+    for name in args.only or SCENARIOS:
+        count = ENTRIES[name] if name == "rate_limiter_companies" else max(int(ENTRIES[name] * args.scale), 1)
+        results[name] = await measure_scenario(name, count)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure fdk_extension memory per entry")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier of the entries of every scenario")
+    parser.add_argument("--only", nargs="+", choices=list(SCENARIOS), help="Run only these scenarios")
+    parser.add_argument("--output", default=None, help="Save results as json to this path")
+    parser.add_argument("--thresholds", default=THRESHOLDS_PATH, help="Json of max bytes per entry by scenario")
+    arguments = parser.parse_args()
+    configure_logging(level="warning")
+    report = asyncio.run(main(arguments))
+    if arguments.output:
+        save_results(arguments.output, report)
+    print(json.dumps(report, indent=2))
+
+    with open(arguments.thresholds) as thresholds_file:
+        failures = check_thresholds(report, json.load(thresholds_file))
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    raise SystemExit(1 if failures else 0)
@@ -0,0 +1,197 @@
+"""Local stand-in for the platform apis the library calls, for load tests.
+
+Point the extension's `cluster` at it:
+
+    python -m benchmarks.mock_platform --port 9000 --latency 0.02 --error-rate 0.01 --rate-limit-rate 0.01
+    setup_fdk({..., "cluster": "http://localhost:9000"})
+
+It serves extension details, webhook event details, the OAuth authorize redirect, token, offline token and
+renewal grants, and the webhook subscriber apis. Tokens expire after `token_expires_in` seconds, platform
+apis answer 401 to expired tokens. State is kept in process, so it runs as a single process.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from urllib.parse import urlencode
+
+from sanic import Sanic
+from sanic.request import Request
+from sanic.response import json as json_response, redirect
+
+
+AUTH_PATH = "/service/panel/authentication/v1.0/company/<company_id:int>/oauth"
+WEBHOOK_PATH = "/service/platform/webhook/v1.0/company/<company_id:int>"
+
+SCOPES = ["company/profile", "company/saleschannel", "company/product", "company/order",
+          "company/application/catalogue", "company/application/settings"]
+
+
+class MockPlatformState:
+    """Issued tokens, webhook subscribers and request counters of a mock platform."""
+
+    def __init__(self, api_key: str, api_secret: str, base_url: str, token_expires_in: int=600):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.base_url = base_url
+        self.token_expires_in = token_expires_in
+        self.tokens = {}
+        self.refresh_tokens = {}
+        self.subscribers = {}
+        self.event_ids = {}
+        self.requests = Counter()
+        self.faults = Counter()
+
+    def issue_token(self, company_id: int, access_mode: str) -> dict:
+        access_token = uuid.uuid4().hex
+        refresh_token = uuid.uuid4().hex
+        self.tokens[access_token] = (company_id, time.time() + self.token_expires_in)
+        self.refresh_tokens[refresh_token] = company_id
+        token = {
+            "access_token": access_token,
+            "token_type": "Bearer",
+            "expires_in": self.token_expires_in,
+            "refresh_token": refresh_token,
+            "scope": SCOPES,
+            "access_mode": access_mode
+        }
+        if access_mode == "online":
+            token["current_user"] = {"_id": "5f0d7e2a3b1c", "username": "loadtest_user", "active": True}
+        return token
+
+    def is_token_valid(self, request: Request, company_id: int) -> bool:
+        authorization = request.headers.get("authorization", "")
+        token = self.tokens.get(authorization[len("Bearer "):]) if authorization.startswith("Bearer ") else None
+        return token is not None and token[0] == company_id and token[1] > time.time()
+
+    def get_event_id(self, event: dict) -> int:
+        key = (event["event_category"], event["event_name"], event["event_type"], str(event.get("version") or "1"))
+        return self.event_ids.setdefault(key, len(self.event_ids) + 1)
+
+    def get_stats(self) -> dict:
+        return {"requests": dict(self.requests), "faults": dict(self.faults), "tokens": len(self.tokens),
+                "subscribers": len(self.subscribers)}
+
+
+def create_mock_platform_app(api_key: str, api_secret: str, base_url: str, latency: float=0.0,
+                             latency_jitter: float=0.0, error_rate: float=0.0, rate_limit_rate: float=0.0,
+                             retry_after: int=1, token_expires_in: int=600, name: str="mock_platform") -> Sanic:
+    app = Sanic(name)
+    state = app.ctx.state = MockPlatformState(api_key, api_secret, base_url, token_expires_in)
+
+    @app.on_request
+    async def inject_faults(request: Request):
+        if request.path.startswith("/_mock"):
+            return None
+        state.requests[request.route.name if request.route else request.path] += 1
+        if latency or latency_jitter:
+            await asyncio.sleep(latency + random.uniform(0, latency_jitter))
+        if rate_limit_rate and random.random() < rate_limit_rate:
+            state.faults["429"] += 1
+            return json_response({"message": "Too many requests"}, 429, headers={"Retry-After": str(retry_after)})
+        if error_rate and random.random() < error_rate:
+            state.faults["500"] += 1
+            return json_response({"message": "Injected error"}, 500)
+        return None
+
+    @app.get("/service/panel/partners/v1.0/extensions/details/<extension_id>")
+    async def extension_details(request: Request, extension_id: str):
+        return json_response({
+            "name": "Load test extension",
+            "extention_type": "private",
+            "base_url": state.base_url,
+            "scope": SCOPES
+        })
+
+    @app.post("/service/common/webhook/v1.0/events/query-event-details")
+    async def event_details(request: Request):
+        event_configs = [{
+            "id": state.get_event_id(event),
+            "event_category": event["event_category"],
+            "event_name": event["event_name"],
+            "event_type": event["event_type"],
+            "version": str(event.get("version") or "1"),
+            "display_name": f"{event['event_name'].title()} {event['event_type'].title()}",
+            "description": f"Triggered on {event['event_name']} {event['event_type']}"
+        } for event in request.json or []]
+        return json_response({"event_configs": event_configs, "event_not_found": []})
+
+    @app.get(f"{AUTH_PATH}/authorize")
+    async def authorize(request: Request, company_id: int):
+        # the user approves right away, the platform redirects back with a code
+        query = urlencode({"code": uuid.uuid4().hex, "state": request.args.get("state", ""),
+                           "company_id": company_id})
+        return redirect(f"{request.args.get('redirect_uri')}?{query}")
+
+    @app.post(f"{AUTH_PATH}/token")
+    async def token(request: Request, company_id: int):
+        return _grant_token(state, request, company_id, "online")
+
+    @app.post(f"{AUTH_PATH}/offline-token")
+    async def offline_token(request: Request, company_id: int):
+        return _grant_token(state, request, company_id, "offline")
+
+    @app.get(f"{WEBHOOK_PATH}/extension/<extension_id>/subscriber", strict_slashes=False)
+    async def get_subscribers(request: Request, company_id: int, extension_id: str):
+        if not state.is_token_valid(request, company_id):
+            return json_response({"message": "Unauthorized"}, 401)
+        subscriber = state.subscribers.get(company_id)
+        return json_response({"items": [subscriber] if subscriber else [],
+                              "page": {"type": "number", "current": 1, "size": 1, "item_total": int(bool(subscriber))}})
+
+    @app.route(f"{WEBHOOK_PATH}/subscriber", methods=["POST", "PUT"], strict_slashes=False)
+    async def save_subscriber(request: Request, company_id: int):
+        if not state.is_token_valid(request, company_id):
+            return json_response({"message": "Unauthorized"}, 401)
+        body = dict(request.json or {})
+        event_ids = body.pop("event_id", [])
+        existing = state.subscribers.get(company_id) or {"id": len(state.subscribers) + 1}
+        subscriber = dict(existing, **body)
+        subscriber["event_configs"] = [{"id": event_id} for event_id in event_ids]
+        subscriber["modified_by"] = "loadtest"
+        state.subscribers[company_id] = subscriber
+        return json_response(subscriber)
+
+    @app.get("/_mock/stats")
+    async def stats(request: Request):
+        return json_response(state.get_stats())
+
+    return app
+
+
+def _grant_token(state: MockPlatformState, request: Request, company_id: int, access_mode: str):
+    body = _get_body(request)
+    if body.get("client_id") not in (None, state.api_key) or body.get("client_secret") not in (None, state.api_secret):
+        return json_response({"message": "Invalid client credentials"}, 401)
+    if body.get("grant_type") == "refresh_token" and state.refresh_tokens.get(body.get("refresh_token")) != company_id:
+        return json_response({"message": "Invalid refresh token"}, 401)
+    return json_response(state.issue_token(company_id, access_mode))
+
+
+def _get_body(request: Request) -> dict:
+    if request.form:
+        return {key: request.form.get(key) for key in request.form}
+    return request.json or {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock of the platform apis")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--api-key", default=os.environ.get("EXTENSION_API_KEY", "loadtest_api_key"))
+    parser.add_argument("--api-secret", default=os.environ.get("EXTENSION_API_SECRET", "loadtest_api_secret"))
+    parser.add_argument("--base-url", default="http://localhost:8000", help="Extension base url")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Random extra seconds up to this value")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--token-expires-in", type=int, default=600)
+    arguments = parser.parse_args()
+    create_mock_platform_app(arguments.api_key, arguments.api_secret, arguments.base_url, arguments.latency,
+                             arguments.latency_jitter, arguments.error_rate, arguments.rate_limit_rate,
+                             arguments.retry_after, arguments.token_expires_in) \
+        .run(host=arguments.host, port=arguments.port, access_log=False, single_process=True)
@@ -0,0 +1,88 @@
+"""Compare storage backends on session sized values.
+
+Usage:
+    python -m benchmarks.storage_benchmark --operations 10000 --redis-url redis://localhost
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from fdk_extension.storage.memory_storage import MemoryStorage
+from fdk_extension.storage.sqlite_storage import SQLiteStorage
+
+
+SESSION_VALUE = json.dumps({
+    "session_id": "0" * 64,
+    "company_id": 1,
+    "state": "c5b1c3a8-2d2f-4c3d-8b1a-4f0c4e8f3a11",
+    "scope": ["company/profile", "company/product", "company/order"],
+    "expires": None,
+    "access_mode": "offline",
+    "access_token": "a" * 40,
+    "refresh_token": "r" * 40,
+    "expires_in": 599,
+    "is_new": False,
+    "extension_id": "6220daa4a5414621b975a41f"
+})
+
+
+async def run_operations(storage, operations: int, concurrency: int) -> dict:
+    results = {}
+    keys = [f"session:{index}" for index in range(operations)]
+
+    async def run(name, func):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(key):
+            async with semaphore:
+                await func(key)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[call(key) for key in keys])
+        elapsed = time.perf_counter() - start
+        results[name] = {"ops_per_sec": round(operations / elapsed, 2), "avg_us": round(elapsed / operations * 1e6, 2)}
+
+    await run("setex", lambda key: storage.setex(key, 900, SESSION_VALUE))
+    await run("get", lambda key: storage.get(key))
+    await run("get_miss", lambda key: storage.get(f"missing:{key}"))
+    await run("delete", lambda key: storage.delete(key))
+    return results
+
+
+async def get_storages(redis_url: str, db_path: str) -> dict:
+    storages = {
+        "memory": MemoryStorage("benchmark"),
+        "sqlite": SQLiteStorage(db_path, prefix_key="benchmark")
+    }
+    if redis_url:
+        import aioredis
+        from fdk_extension.storage.redis_storage import RedisStorage
+        client = aioredis.from_url(redis_url)
+        try:
+            await client.ping()
+            storages["redis"] = RedisStorage(client, prefix_key="benchmark")
+        except Exception as e:
+            print(f"Skipping redis benchmark, Reason: {str(e)}")
+    return storages
+
+
+async def main(args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storages = await get_storages(args.redis_url, os.path.join(tmp_dir, "benchmark.db"))
+        report = {}
+        for name, storage in storages.items():
+            report[name] = await run_operations(storage, args.operations, args.concurrency)
+            if isinstance(storage, SQLiteStorage):
+                await storage.close()
+        return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark fdk_extension storage backends")
+    parser.add_argument("--operations", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--redis-url", default=None, help="Redis url, skipped when not passed")
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
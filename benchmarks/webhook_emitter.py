@@ -0,0 +1,118 @@
+"""Send signed webhook events to an extension at a fixed rate.
+
+Usage:
+    python -m benchmarks.webhook_emitter --url http://localhost:8000/webhook --api-secret <secret> \\
+        --rate 200 --duration 30 --events company/product/create application/coupon/update
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import time
+import uuid
+from collections import Counter
+
+import aiohttp
+
+
+def build_event(event_key: str, company_id: int, application_id: str, payload_size: int) -> dict:
+    category, name, event_type = event_key.split("/")
+    return {
+        "event": {
+            "name": name,
+            "type": event_type,
+            "category": category,
+            "version": "1",
+            "trace_id": [uuid.uuid4().hex],
+            "created_timestamp": int(time.time() * 1000)
+        },
+        "company_id": company_id,
+        "application_id": application_id if category == "application" else None,
+        "contains": [name],
+        "payload": {name: {"id": uuid.uuid4().hex, "data": "x" * payload_size}}
+    }
+
+
+def sign(body: bytes, api_secret: str) -> str:
+    return hmac.new(api_secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+class WebhookEmitter:
+    """Posts signed events on an open loop schedule of `rate` events per second.
+
+    Latency is measured from the scheduled send time, so time spent waiting for a free connection counts.
+    """
+
+    def __init__(self, url: str, api_secret: str, events: list, rate: float=100, duration: float=10,
+                 concurrency: int=100, companies: int=100, payload_size: int=1024):
+        self.url = url
+        self.api_secret = api_secret
+        self.events = events
+        self.rate = rate
+        self.duration = duration
+        self.concurrency = concurrency
+        self.companies = companies
+        self.payload_size = payload_size
+        self.statuses = Counter()
+        self.latencies = []
+
+    async def run(self) -> dict:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            start = time.perf_counter()
+            tasks = []
+            for index in range(int(self.rate * self.duration)):
+                scheduled = start + index / self.rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.ensure_future(self._send(session, semaphore, scheduled)))
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - start
+        return self.get_report(elapsed)
+
+    async def _send(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, scheduled: float) -> None:
+        company_id = random.randint(1, self.companies)
+        body = json.dumps(build_event(random.choice(self.events), company_id, f"app_{company_id}",
+                                      self.payload_size)).encode()
+        headers = {"Content-Type": "application/json", "x-fp-signature": sign(body, self.api_secret)}
+        async with semaphore:
+            try:
+                async with session.post(self.url, data=body, headers=headers) as response:
+                    await response.read()
+                    self.statuses[str(response.status)] += 1
+            except Exception as e:
+                self.statuses[e.__class__.__name__] += 1
+        self.latencies.append(time.perf_counter() - scheduled)
+
+    def get_report(self, elapsed: float) -> dict:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            "sent": count,
+            "elapsed": round(elapsed, 3),
+            "events_per_sec": round(count / elapsed, 2) if elapsed else 0,
+            "statuses": dict(self.statuses),
+            "p50_ms": round(latencies[count // 2] * 1000, 3) if count else None,
+            "p99_ms": round(latencies[min(int(count * 0.99), count - 1)] * 1000, 3) if count else None
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send signed webhook events to an extension")
+    parser.add_argument("--url", default="http://localhost:8000/webhook")
+    parser.add_argument("--api-secret", required=True)
+    parser.add_argument("--events", nargs="+", default=["company/product/create"],
+                        help="Event keys as category/name/type")
+    parser.add_argument("--rate", type=float, default=100, help="Events per second")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--companies", type=int, default=100)
+    parser.add_argument("--payload-size", type=int, default=1024, help="Bytes of filler in each payload")
+    arguments = parser.parse_args()
+    emitter = WebhookEmitter(arguments.url, arguments.api_secret, arguments.events, arguments.rate,
+                             arguments.duration, arguments.concurrency, arguments.companies, arguments.payload_size)
+    print(json.dumps(asyncio.run(emitter.run()), indent=2))
@@ -51,15 +51,15 @@ async def handle_ext_install(payload, company_id):
 
 
 fdk_extension_client = setup_fdk({
-    "api_key": "6220daa4a5414621b975a41f",
-    "api_secret": "EbeGBRC~Fthv5om",
+    "api_key": os.environ.get("EXTENSION_API_KEY", "6220daa4a5414621b975a41f"),
+    "api_secret": os.environ.get("EXTENSION_API_SECRET", "EbeGBRC~Fthv5om"),
     "base_url": base_url, # this is optional
     "scopes": ["company/product"], # this is optional
     "callbacks": extension_handler,
     "storage": RedisStorage(redis_connection),
     "access_mode": "offline",
     "debug": True,
-    "cluster": "https://api.fyndx0.de",  # this is optional by default it points to prod.
+    "cluster": os.environ.get("FDK_CLUSTER", "https://api.fyndx0.de"),  # this is optional by default it points to prod.
     "webhook_config": {
         "api_path": "/webhook",
         "notification_email": "test2@abc.com",  # required
@@ -93,7 +93,7 @@ def run(request):
 
 async def test_route_handler(request):
     try:
-        data = await request.conn_info.ctx.platform_client.lead.getTicket(id="61b08ec5c63045521bcf124f")
+        data = await request.ctx.platform_client.lead.getTicket(id="61b08ec5c63045521bcf124f")
         return response.json({"data": data["json"]})
     except Exception as e:
         logger.exception(e)
@@ -111,7 +111,7 @@ async def webhook_handler(request):
 
 async def enable_sales_channel_webhook_handler(request, application_id):
     try:
-        await fdk_extension_client.webhook_registry.enable_sales_channel_webhook(request.conn_info.ctx.platform_client,
+        await fdk_extension_client.webhook_registry.enable_sales_channel_webhook(request.ctx.platform_client,
                                                                                  application_id)
         return response.json({"success": True})
     except Exception as e:
@@ -121,7 +121,7 @@ async def enable_sales_channel_webhook_handler(request, application_id):
 
 async def disable_sales_channel_webhook_handler(request, application_id):
     try:
-        await fdk_extension_client.webhook_registry.disable_sales_channel_webhook(request.conn_info.ctx.platform_client,
+        await fdk_extension_client.webhook_registry.disable_sales_channel_webhook(request.ctx.platform_client,
                                                                                   application_id)
         return response.json({"success": True})
     except Exception as e:
@@ -1,7 +1,7 @@
 async def auth(request):
     # Write you code here to return initial launch url
     company_id = int(request.args.get("company_id"))
-    return f"{request.conn_info.ctx.extension.base_url}?company_id={company_id}"
+    return f"{request.ctx.extension.base_url}?company_id={company_id}"
 
 
 async def uninstall(request):
@@ -3,9 +3,19 @@ from typing import Tuple, Optional, Union
 from sanic import Blueprint
 from sanic.blueprint_group import BlueprintGroup
 
+from .exceptions import FdkSessionNotFoundError
+from .extension import extension
 from .middleware.api_middleware import application_proxy_on_request
+from .middleware.api_middleware import lazy_platform_api_on_request
 from .middleware.api_middleware import platform_api_on_request
+from .middleware.api_middleware import session_not_found_handler
+from .middleware.context_middleware import request_context_on_request
+from .middleware.server_timing_middleware import server_timing_on_request
+from .middleware.server_timing_middleware import server_timing_on_response
+from .middleware.session_middleware import session_cookie_on_response
 from .middleware.session_middleware import session_middleware
+from .middleware.session_middleware import session_unit_of_work_on_request
+from .middleware.session_middleware import session_unit_of_work_on_response
 
 
 class ClientBlueprintGroup(BlueprintGroup):
@@ -25,15 +35,43 @@ class ClientBlueprintGroup(BlueprintGroup):
                     yield i
 
         # check and register middleware if not already exist
-        for bp in chain(value):
+        for bp in chain([value]):
             middleware_function = [i.middleware.func for i in bp._future_middleware]
 
+            if self.client_type == "platform" and extension.server_timing:
+                if server_timing_on_request not in middleware_function:
+                    bp.middleware(server_timing_on_request, "request", *args, **kwargs)
+
+                if server_timing_on_response not in middleware_function:
+                    bp.middleware(server_timing_on_response, "response", *args, **kwargs)
+
+            if self.client_type in ("platform", "application"):
+                if request_context_on_request not in middleware_function:
+                    bp.middleware(request_context_on_request, "request", *args, **kwargs)
+
             if self.client_type == "platform":
-                if session_middleware not in middleware_function:
-                    bp.middleware(session_middleware, "request", *args, **kwargs)
+                if session_unit_of_work_on_request not in middleware_function:
+                    bp.middleware(session_unit_of_work_on_request, "request", *args, **kwargs)
+
+                if session_unit_of_work_on_response not in middleware_function:
+                    bp.middleware(session_unit_of_work_on_response, "response", *args, **kwargs)
+
+                if extension.lazy_platform_client:
+                    if lazy_platform_api_on_request not in middleware_function:
+                        bp.middleware(lazy_platform_api_on_request, "request", *args, **kwargs)
+
+                    exception_handlers = [i.handler for i in bp._future_exceptions]
+                    if session_not_found_handler not in exception_handlers:
+                        bp.exception(FdkSessionNotFoundError)(session_not_found_handler)
+                else:
+                    if session_middleware not in middleware_function:
+                        bp.middleware(session_middleware, "request", *args, **kwargs)
+
+                    if platform_api_on_request not in middleware_function:
+                        bp.middleware(platform_api_on_request, "request", *args, **kwargs)
 
-                if platform_api_on_request not in middleware_function:
-                    bp.middleware(platform_api_on_request, "request", *args, **kwargs)
+                if session_cookie_on_response not in middleware_function:
+                    bp.middleware(session_cookie_on_response, "response", *args, **kwargs)
 
             elif self.client_type == "application":
                 if application_proxy_on_request not in middleware_function:
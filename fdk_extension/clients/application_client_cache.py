@@ -0,0 +1,49 @@
+from typing import Tuple
+
+from fdk_client.application.ApplicationClient import ApplicationClient
+from fdk_client.application.ApplicationConfig import ApplicationConfig
+
+from ..utilities.lru_cache import LRUCache
+
+
+class ApplicationClientCache:
+    """Reuses ApplicationClient instances across requests, keyed by application id.
+
+    A cached client is replaced as soon as a different token is seen for its application.
+    """
+
+    def __init__(self, max_size: int=1000):
+        self._cache = LRUCache(max_size=max_size)
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get_client(self, application_id: str, application_token: str, domain: str) -> ApplicationClient:
+        return self.get_client_with_config(application_id, application_token, domain)[0]
+
+    def get_client_with_config(self, application_id: str, application_token: str,
+                               domain: str) -> Tuple[ApplicationClient, ApplicationConfig]:
+        entry = self._cache.get(application_id)
+        if entry is not None and entry[0] == application_token and entry[1] == domain:
+            self.stats["hits"] += 1
+            return entry[2], entry[3]
+
+        if entry is not None:
+            self.stats["invalidations"] += 1
+        self.stats["misses"] += 1
+        application_config = ApplicationConfig({
+            "applicationID": application_id,
+            "applicationToken": application_token,
+            "domain": domain
+        })
+        application_client = ApplicationClient(application_config)
+        self._cache.set(application_id, (application_token, domain, application_client, application_config))
+        return application_client, application_config
+
+    def invalidate(self, application_id: str) -> None:
+        if self._cache.pop(application_id) is not None:
+            self.stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def get_stats(self) -> dict:
+        return dict(self.stats, size=len(self._cache), evictions=self._cache.evictions)
@@ -0,0 +1,238 @@
+"""Outbound rate limiting of platform api calls."""
+import asyncio
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import functools
+import time
+
+from ..exceptions import FdkInvalidConfig
+from ..utilities.latency import LatencyTracker
+from ..utilities.logger import get_logger
+from ..utilities.lru_cache import LRUCache
+from .service_proxy import instrument_services
+
+logger = get_logger()
+
+
+# bound on companies with their own bucket and semaphore in one process
+MAX_TRACKED_COMPANIES = 10000
+
+# Token bucket shared through redis. Tokens are reserved ahead, so the reply is the number of
+# milliseconds the caller has to wait before its call may start. Uses server time to avoid clock skew.
+SHARED_BUCKET_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local block_ms = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'blocked_until')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+local blocked_until = tonumber(state[3]) or 0
+local ttl = math.ceil(burst * 1000 / rate) + 60000
+if block_ms > 0 then
+    redis.call('HSET', KEYS[1], 'blocked_until', math.max(blocked_until, now + block_ms))
+    redis.call('PEXPIRE', KEYS[1], ttl + block_ms)
+    return 0
+end
+tokens = math.min(burst, tokens + (now - ts) * rate / 1000) - 1
+local wait = 0
+if tokens < 0 then
+    wait = math.ceil(-tokens * 1000 / rate)
+end
+if blocked_until > now + wait then
+    wait = blocked_until - now
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], ttl + wait)
+return wait
+"""
+
+
+class TokenBucket:
+    """In-process token bucket refilled at `rate` tokens per second up to `burst` tokens."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+
+    async def reserve(self) -> float:
+        """Take one token and return the seconds to wait before using it."""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate) - 1
+        self._updated_at = now
+        wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        return max(wait, self._blocked_until - now)
+
+    async def block(self, seconds: float) -> None:
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+class SharedTokenBucket:
+    """Token bucket kept in redis, so every node calling the platform shares the same budget."""
+
+    def __init__(self, client, key: str, rate: float, burst: int):
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self._script = client.register_script(SHARED_BUCKET_SCRIPT)
+
+    async def reserve(self) -> float:
+        wait_ms = await self._script(keys=[self.key], args=[self.rate, self.burst, 0])
+        return int(wait_ms) / 1000
+
+    async def block(self, seconds: float) -> None:
+        await self._script(keys=[self.key], args=[self.rate, self.burst, int(seconds * 1000)])
+
+
+class PlatformRateLimiter:
+    """Token bucket rate limit and concurrency limit for platform api calls, per company and per cluster.
+
+    `config` has optional `company` and `cluster` sections, each with `rate` (calls per second), `burst`
+    and `concurrency`. With a redis client the buckets are shared between nodes, concurrency limits are
+    always per process.
+    """
+
+    def __init__(self, config: dict, cluster: str, redis_client=None, prefix_key: str=""):
+        self.cluster = cluster
+        self.company_config = self.__validate(config.get("company") or {}, "company")
+        self.cluster_config = self.__validate(config.get("cluster") or {}, "cluster")
+        self.max_retry_after = config.get("max_retry_after", 60)
+        self.retry_on_429 = int(config.get("retry_on_429", 1))
+        self.redis_client = redis_client
+        self.prefix_key = prefix_key
+        self._company_limits = LRUCache(MAX_TRACKED_COMPANIES)
+        self._cluster_limits = (self.__create_bucket(self.cluster_config, f"cluster:{cluster}"),
+                                self.__create_semaphore(self.cluster_config))
+        self.wait_latency = LatencyTracker()
+        self.stats = {"calls": 0, "throttled": 0, "throttle_wait_seconds": 0.0, "concurrency_waits": 0,
+                      "rate_limited_responses": 0, "retries": 0}
+
+    @staticmethod
+    def __validate(config: dict, name: str) -> dict:
+        for key in ("rate", "burst", "concurrency"):
+            if config.get(key) is not None and config[key] <= 0:
+                raise FdkInvalidConfig(f"Invalid rate_limit {name} {key}. Invalid value: {config[key]}")
+        return config
+
+    def __create_bucket(self, config: dict, key: str):
+        if not config.get("rate"):
+            return None
+        burst = config.get("burst") or max(1, int(config["rate"]))
+        if self.redis_client is not None:
+            return SharedTokenBucket(self.redis_client, f"{self.prefix_key}fdk_rate_limit:{key}", config["rate"], burst)
+        return TokenBucket(config["rate"], burst)
+
+    @staticmethod
+    def __create_semaphore(config: dict):
+        return asyncio.Semaphore(config["concurrency"]) if config.get("concurrency") else None
+
+    def _get_company_limits(self, company_id) -> tuple:
+        # company ids arrive as int from sessions and as str from webhooks, one company gets one set of limits
+        company_id = str(company_id)
+        limits = self._company_limits.get(company_id)
+        if limits is None:
+            limits = (self.__create_bucket(self.company_config, f"company:{self.cluster}:{company_id}"),
+                      self.__create_semaphore(self.company_config))
+            self._company_limits.set(company_id, limits)
+        return limits
+
+    async def call(self, company_id, method, *args, **kwargs):
+        """Run `method` within the limits of the company and the cluster, retrying on a 429 with Retry-After."""
+        company_bucket, company_semaphore = self._get_company_limits(company_id)
+        cluster_bucket, cluster_semaphore = self._cluster_limits
+        attempt = 0
+        while True:
+            self.stats["calls"] += 1
+            await self._throttle(company_bucket, cluster_bucket)
+            async with _Acquired(self, company_semaphore), _Acquired(self, cluster_semaphore):
+                response = await method(*args, **kwargs)
+
+            retry_after = self._get_retry_after(response)
+            if retry_after is None:
+                return response
+            # the platform limits per company, so only this company's calls are held back
+            self.stats["rate_limited_responses"] += 1
+            # a huge Retry-After or a far away HTTP-date must not hold the company back for longer than this
+            too_long = retry_after > self.max_retry_after
+            retry_after = min(retry_after, self.max_retry_after)
+            if company_bucket is not None:
+                await company_bucket.block(retry_after)
+            if attempt >= self.retry_on_429 or too_long:
+                return response
+            attempt += 1
+            self.stats["retries"] += 1
+            logger.debug("Platform api rate limited for company %s, retrying after %ss", company_id, retry_after,
+                         log_key="rate_limit_retry")
+            if company_bucket is None:
+                await asyncio.sleep(retry_after)
+
+    async def _throttle(self, *buckets) -> None:
+        wait = 0.0
+        for bucket in buckets:
+            if bucket is not None:
+                wait = max(wait, await bucket.reserve())
+        if wait > 0:
+            self.stats["throttled"] += 1
+            self.stats["throttle_wait_seconds"] += wait
+            self.wait_latency.record(wait)
+            await asyncio.sleep(wait)
+
+    @staticmethod
+    def _get_retry_after(response):
+        if not isinstance(response, dict) or response.get("status_code") != 429:
+            return None
+        headers = response.get("headers") or {}
+        value = next((value for key, value in headers.items() if key.lower() == "retry-after"), None)
+        if value is None:
+            return 1.0
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return 1.0
+
+    def instrument(self, client, company_id):
+        """Route every api call of the platform client's services through the limiter."""
+        def wrap(endpoint, method, scope):
+            @functools.wraps(method)
+            async def rate_limited(*args, **kwargs):
+                return await self.call(company_id, method, *args, **kwargs)
+            return rate_limited
+        return instrument_services(client, wrap)
+
+    def forget_company(self, company_id) -> None:
+        """Drop the in-process bucket and semaphore of a company."""
+        self._company_limits.pop(str(company_id))
+
+    def get_company_keys(self, company_id) -> list:
+        """Storage keys of the shared buckets of a company, without the storage prefix."""
+        if self.redis_client is None or not self.company_config.get("rate"):
+            return []
+        return [f"fdk_rate_limit:company:{self.cluster}:{company_id}"]
+
+    def get_stats(self) -> dict:
+        return dict(self.stats, wait=self.wait_latency.snapshot())
+
+
+class _Acquired:
+    def __init__(self, limiter: PlatformRateLimiter, semaphore: asyncio.Semaphore):
+        self._limiter = limiter
+        self._semaphore = semaphore
+
+    async def __aenter__(self):
+        if self._semaphore is not None:
+            if self._semaphore.locked():
+                self._limiter.stats["concurrency_waits"] += 1
+            await self._semaphore.acquire()
+
+    async def __aexit__(self, *exc_info):
+        if self._semaphore is not None:
+            self._semaphore.release()
+
@@ -0,0 +1,104 @@
+"""Caching of idempotent platform api calls."""
+import asyncio
+from collections import defaultdict
+import copy
+import functools
+import json
+
+from ..exceptions import FdkInvalidConfig
+from ..utilities.lru_cache import LRUCache
+from .service_proxy import instrument_services
+
+
+class PlatformResponseCache:
+    """Per company TTL cache of selected platform GET endpoints with in-flight coalescing.
+
+    `endpoints` maps `"<service>.<method>"` to a ttl in seconds. Only successful responses are cached and
+    concurrent identical calls share one upstream call.
+    """
+
+    def __init__(self, endpoints: dict, max_size: int=1000):
+        for endpoint, ttl in endpoints.items():
+            if not isinstance(ttl, (int, float)) or ttl <= 0:
+                raise FdkInvalidConfig(f"Invalid response_cache ttl for {endpoint}. Invalid value: {ttl}")
+        self.endpoints = dict(endpoints)
+        self._cache = LRUCache(max_size=max_size)
+        self._etags = LRUCache(max_size=max_size)
+        self._in_flight: dict = {}
+        self.stats = defaultdict(lambda: {"hits": 0, "misses": 0, "coalesced": 0, "unchanged": 0})
+
+    def instrument(self, client, company_id):
+        """Serve the configured endpoints of the platform client's services from the cache."""
+        def wrap(endpoint, method, scope):
+            ttl = self.endpoints.get(endpoint)
+            if ttl is None:
+                return method
+
+            @functools.wraps(method)
+            async def cached(*args, **kwargs):
+                return await self.call((str(company_id), scope, endpoint), ttl, method, *args, **kwargs)
+            return cached
+        return instrument_services(client, wrap)
+
+    async def call(self, scope_key: tuple, ttl: float, method, *args, **kwargs):
+        endpoint = scope_key[2]
+        stats = self.stats[endpoint]
+        key = scope_key + (json.dumps([args, kwargs], sort_keys=True, default=str),)
+        response = self._cache.get(key)
+        if response is not None:
+            stats["hits"] += 1
+            return copy.deepcopy(response)
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            stats["coalesced"] += 1
+        else:
+            stats["misses"] += 1
+            # detached from the caller, so a cancelled caller does not cancel the calls coalesced on it
+            in_flight = asyncio.ensure_future(self._fetch(key, ttl, stats, method, *args, **kwargs))
+            in_flight.add_done_callback(_retrieve_exception)
+            self._in_flight[key] = in_flight
+        return copy.deepcopy(await asyncio.shield(in_flight))
+
+    async def _fetch(self, key: tuple, ttl: float, stats: dict, method, *args, **kwargs):
+        try:
+            response = await method(*args, **kwargs)
+        finally:
+            self._in_flight.pop(key, None)
+        if isinstance(response, dict) and response.get("status_code") == 200:
+            self._store(key, response, ttl, stats)
+        return response
+
+    def _store(self, key: tuple, response: dict, ttl: float, stats: dict) -> None:
+        # the sdk can not send If-None-Match per call, so an ETag only tells that a refresh was unchanged
+        headers = response.get("headers") or {}
+        etag = next((value for name, value in headers.items() if name.lower() == "etag"), None)
+        if etag is not None:
+            if self._etags.get(key) == etag:
+                stats["unchanged"] += 1
+            self._etags.set(key, etag)
+        self._cache.set(key, copy.deepcopy(response), ttl)
+
+    def invalidate(self, company_id=None) -> None:
+        """Drop cached responses of one company, or of all companies."""
+        if company_id is None:
+            self._cache.clear()
+            self._etags.clear()
+            return
+        for cache in (self._cache, self._etags):
+            for key in cache.keys():
+                if key[0] == str(company_id):
+                    cache.pop(key)
+
+    def get_stats(self) -> dict:
+        stats = {}
+        for endpoint, endpoint_stats in self.stats.items():
+            calls = endpoint_stats["hits"] + endpoint_stats["misses"] + endpoint_stats["coalesced"]
+            stats[endpoint] = dict(endpoint_stats, hit_rate=(calls - endpoint_stats["misses"]) / calls if calls else 0.0)
+        return {"endpoints": stats, "size": len(self._cache), "evictions": self._cache.evictions}
+
+
+def _retrieve_exception(task: asyncio.Future) -> None:
+    # waiters are optional, an exception nobody awaited must not be reported as never retrieved
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,50 @@
+"""Wrapping of platform client api services."""
+import functools
+import inspect
+
+
+# attributes of a platform client that are not api services
+NON_SERVICE_ATTRIBUTES = ("config", "_conf")
+
+
+class ServiceProxy:
+    """Proxy of a platform api service whose coroutine methods are wrapped with `wrap(endpoint, method, scope)`.
+
+    `endpoint` is `"<service>.<method>"` and `scope` is the application id for application scoped services.
+    """
+
+    def __init__(self, service, name: str, wrap, scope=None):
+        self._service = service
+        self._name = name
+        self._wrap = wrap
+        self._scope = scope
+
+    def __getattr__(self, name):
+        value = getattr(self._service, name)
+        if not inspect.iscoroutinefunction(value):
+            return value
+        return self._wrap(f"{self._name}.{name}", value, self._scope)
+
+
+def instrument_services(client, wrap, scope=None):
+    """Replace the api services of a platform client, and of its application clients, with ServiceProxy."""
+    for name, value in list(vars(client).items()):
+        if name not in NON_SERVICE_ATTRIBUTES and _is_service(value):
+            setattr(client, name, ServiceProxy(value, name, wrap, scope))
+
+    application = getattr(client, "application", None)
+    if callable(application) and not inspect.iscoroutinefunction(application):
+        @functools.wraps(application)
+        def instrumented_application(application_id, *args, **kwargs):
+            return instrument_services(application(application_id, *args, **kwargs), wrap, application_id)
+        client.application = instrumented_application
+    return client
+
+
+def _is_service(value) -> bool:
+    if isinstance(value, ServiceProxy):
+        return True
+    if isinstance(value, (str, bytes, int, float, bool, dict, list, tuple, set)) or value is None:
+        return False
+    return any(inspect.iscoroutinefunction(getattr(type(value), name, None))
+               for name in dir(type(value)) if not name.startswith("_"))
@@ -9,10 +9,29 @@ SESSION_COOKIE_NAME = "ext_session"
 
 SESSION_EXPIRY_IN_SECONDS = 900
 
+# minimum gap between two sliding expiry refreshes of the same session
+SESSION_EXPIRY_REFRESH_INTERVAL_IN_SECONDS = 60
+
+# how long a session id missing from storage is remembered, to absorb repeated lookups of stale cookies
+NEGATIVE_SESSION_CACHE_TTL_IN_SECONDS = 5
+NEGATIVE_SESSION_CACHE_SIZE = 10000
+
+# upper bound for the uninstall callback, which runs after the platform is acknowledged
+UNINSTALL_CALLBACK_TIMEOUT_IN_SECONDS = 30
+
+# session storage layouts
+SESSION_LAYOUT_STRING = "string"  # whole session serialized as one json value
+SESSION_LAYOUT_HASH = "hash"  # one hash field per session attribute
+
 ASSOCIATION_CRITERIA = {
     "ALL": "ALL",
     "SPECIFIC": "SPECIFIC-EVENTS",  # to be set when saleschannel specific events are subscribed & sales channel present
     "EMPTY": "EMPTY"  # to be set when saleschannel specific events are subscribed but not sales channel present
 }
 
-TEST_WEBHOOK_EVENT_NAME = "ping"
\ No newline at end of file
+TEST_WEBHOOK_EVENT_NAME = "ping"
+
+# execution modes of webhook handlers
+WEBHOOK_EXECUTION_ASYNC = "async"  # coroutine awaited on the event loop
+WEBHOOK_EXECUTION_THREAD = "thread"  # function run in a bounded thread pool
+WEBHOOK_EXECUTION_PROCESS = "process"  # picklable function run in a bounded process pool
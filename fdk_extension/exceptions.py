@@ -71,3 +71,19 @@ class FdkWebhookProcessError(Exception):
     def __init__(self, message="Failed to process webhook."):
         """Initialize function __init__."""
         super(FdkWebhookProcessError, self).__init__(message)
+
+
+class FdkWebhookExecutorBusy(Exception):
+    """Class FdkWebhookExecutorBusy."""
+
+    def __init__(self, message="Webhook handler pool queue is full."):
+        """Initialize function __init__."""
+        super(FdkWebhookExecutorBusy, self).__init__(message)
+
+
+class FdkProfilerBusy(Exception):
+    """Class FdkProfilerBusy."""
+
+    def __init__(self, message="A profile is already running in this worker."):
+        """Initialize function __init__."""
+        super(FdkProfilerBusy, self).__init__(message)
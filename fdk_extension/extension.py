@@ -10,13 +10,29 @@ from fdk_client.common.aiohttp_helper import AiohttpHelper
 
 from . import __version__
 from .constants import ONLINE_ACCESS_MODE, OFFLINE_ACCESS_MODE, FYND_CLUSTER
-from .exceptions import FdkInvalidConfig
+from .constants import SESSION_LAYOUT_STRING, SESSION_LAYOUT_HASH
+from .constants import SESSION_EXPIRY_IN_SECONDS, SESSION_EXPIRY_REFRESH_INTERVAL_IN_SECONDS
+from .constants import NEGATIVE_SESSION_CACHE_TTL_IN_SECONDS, NEGATIVE_SESSION_CACHE_SIZE
+from .constants import UNINSTALL_CALLBACK_TIMEOUT_IN_SECONDS
+from .exceptions import FdkInvalidConfig, FdkSessionNotFoundError
 from .session.session import Session
-from .utilities.logger import get_logger, safe_stringify
+from .session.session_token import MAX_TOKEN_SIZE, SessionTokenSealer, SessionRevocationList
+from .utilities.logger import LOG_FORMAT_CONSOLE, LOG_FORMAT_JSON, configure_logging, get_logger, is_debug_enabled, safe_stringify
+from .utilities.loop_watchdog import LoopWatchdog
+from .utilities.lru_cache import LRUCache
+from .utilities.metrics import Metrics, PrometheusMetrics
+from .utilities.profiler import SamplingProfiler
+from .utilities.server_timing import server_timing
+from .utilities.tracing import Tracer, OpenTelemetryTracer
 from .utilities.utility import is_valid_url, get_current_timestamp
 from .webhook import WebhookRegistry
+from .clients.application_client_cache import ApplicationClientCache
+from .clients.rate_limiter import PlatformRateLimiter
+from .clients.response_cache import PlatformResponseCache
+from .storage.base_storage import BaseStorage
 from .storage.redis_storage import RedisStorage
 
+from sanic.blueprints import Blueprint
 from sanic.blueprint_group import BlueprintGroup
 
 logger = get_logger()
@@ -29,17 +45,81 @@ class Extension:
         self.storage: RedisStorage = None
         self.base_url: str = None
         self.callbacks: dict = None
+        self.uninstall_callback_timeout: float = UNINSTALL_CALLBACK_TIMEOUT_IN_SECONDS
         self.access_mode: str = None
         self.scopes: list = None
         self.cluster: str = FYND_CLUSTER
         self.webhook_registry: WebhookRegistry = None
+        self.session_layout: str = SESSION_LAYOUT_STRING
+        self.session_layout_migration: bool = True
+        self.session_expiry: int = SESSION_EXPIRY_IN_SECONDS
+        self.sliding_session_expiry: dict = None
+        self.lazy_platform_client: bool = False
+        self.server_timing: bool = False
+        self.legacy_conn_ctx: bool = True
+        self.application_client_cache: ApplicationClientCache = ApplicationClientCache()
+        self.session_token_sealer: SessionTokenSealer = None
+        self.session_revocation_list: SessionRevocationList = None
+        self.rate_limiter: PlatformRateLimiter = None
+        self.response_cache: PlatformResponseCache = None
+        self.metrics: Metrics = Metrics()
+        self.metrics_company_label: bool = False
+        self.tracer: Tracer = Tracer()
+        self.loop_watchdog: LoopWatchdog = None
+        self.profiler: SamplingProfiler = None
+        self.profiler_token: str = None
+        self.negative_session_cache: LRUCache = LRUCache(NEGATIVE_SESSION_CACHE_SIZE, NEGATIVE_SESSION_CACHE_TTL_IN_SECONDS)
         self.__is_initialized: bool = False
 
     async def initialize(self, data: dict) -> None:
         self.__is_initialized = False
 
+        # Logging, applied before the library logs its first line
+        if data.get("logging"):
+            logging_config = data["logging"]
+            if logging_config.get("format", LOG_FORMAT_CONSOLE) not in (LOG_FORMAT_CONSOLE, LOG_FORMAT_JSON):
+                raise FdkInvalidConfig(f"Invalid logging format. Invalid value: {logging_config['format']}")
+            configure_logging(logging_config.get("format", LOG_FORMAT_CONSOLE), logging_config.get("level", "debug"),
+                              logging_config.get("rate_limit", 100), logging_config.get("rate_limit_interval", 1.0))
+
         self.storage = data["storage"]
 
+        # Metrics backend. `True` keeps metrics in process for the prometheus route
+        metrics = data.get("metrics")
+        if metrics is True:
+            metrics = PrometheusMetrics()
+        if metrics and not isinstance(metrics, Metrics):
+            raise FdkInvalidConfig("Invalid metrics. Pass True or an instance of fdk_extension.utilities.metrics.Metrics")
+        self.metrics = metrics or Metrics()
+        self.metrics_company_label = bool(data.get("metrics_company_label", False))
+
+        # Tracing backend. `True` uses the OpenTelemetry api
+        tracer = data.get("tracing")
+        if tracer is True:
+            tracer = OpenTelemetryTracer()
+        if tracer and not isinstance(tracer, Tracer):
+            raise FdkInvalidConfig("Invalid tracing. Pass True or an instance of fdk_extension.utilities.tracing.Tracer")
+        self.tracer = tracer or Tracer()
+
+        # Event loop stall detection, started with the server
+        self.loop_watchdog = None
+        if data.get("loop_watchdog"):
+            watchdog_config = data["loop_watchdog"] if isinstance(data["loop_watchdog"], dict) else {}
+            self.loop_watchdog = LoopWatchdog(watchdog_config.get("threshold", 0.1),
+                                              watchdog_config.get("step_thresholds"),
+                                              warning_interval=watchdog_config.get("warning_interval", 60.0))
+
+        # Sampling profiler admin route, off unless configured with a token
+        self.profiler = None
+        if data.get("profiler"):
+            profiler_config = data["profiler"]
+            if not isinstance(profiler_config, dict) or not profiler_config.get("token"):
+                raise FdkInvalidConfig("profiler needs a token to authenticate the profile route")
+            self.profiler_token = profiler_config["token"]
+            self.profiler = SamplingProfiler(profiler_config.get("interval", 0.01),
+                                             profiler_config.get("max_duration", 30.0),
+                                             profiler_config.get("max_overhead", 0.05))
+
         # API Key
         if not data.get("api_key"):
             raise FdkInvalidConfig("Invalid api_key")
@@ -50,20 +130,92 @@ class Extension:
             raise FdkInvalidConfig("Invalid api_secret")
         self.api_secret = data["api_secret"]
 
+        # Stateless online sessions sealed into the session cookie
+        self.session_token_sealer = None
+        if data.get("stateless_sessions"):
+            stateless_config = data["stateless_sessions"] if isinstance(data["stateless_sessions"], dict) else {}
+            self.session_token_sealer = SessionTokenSealer(self.api_secret, stateless_config.get("key_id", "k1"),
+                                                           stateless_config.get("previous_key_ids"),
+                                                           stateless_config.get("max_token_size", MAX_TOKEN_SIZE))
+            self.session_revocation_list = SessionRevocationList(stateless_config.get("revocation_refresh_interval", 30))
+
         # Callbacks
         if (not data.get("callbacks") or (data.get("callbacks") and (not data["callbacks"].get("auth") or not data["callbacks"].get("uninstall")))):
             raise FdkInvalidConfig("Missing some of callbacks. Please add all `auth` and `uninstall` callbacks.")
         self.callbacks = data["callbacks"]
+        self.uninstall_callback_timeout = data.get("uninstall_callback_timeout", UNINSTALL_CALLBACK_TIMEOUT_IN_SECONDS)
 
         # Access Mode
         self.access_mode = data.get("access_mode") or OFFLINE_ACCESS_MODE
 
+        # Session layout
+        self.session_layout = data.get("session_layout") or SESSION_LAYOUT_STRING
+        if self.session_layout not in (SESSION_LAYOUT_STRING, SESSION_LAYOUT_HASH):
+            raise FdkInvalidConfig(f"Invalid session_layout. Invalid value: {self.session_layout}")
+        if self.session_layout == SESSION_LAYOUT_HASH and getattr(type(self.storage), "expire", None) is BaseStorage.expire:
+            raise FdkInvalidConfig("session_layout hash needs a storage implementing expire, "
+                                   f"{self.storage.__class__.__name__} does not")
+        # Convert sessions of the string layout found on hash layout misses. To be removed with the string
+        # layout fallback in a future release, turn it off once sessions saved before the switch have expired
+        self.session_layout_migration = bool(data.get("session_layout_migration", True))
+
+        # Sliding session expiry
+        self.sliding_session_expiry = None
+        if data.get("sliding_session_expiry"):
+            sliding_config = data["sliding_session_expiry"]
+            if not isinstance(sliding_config, dict):
+                sliding_config = {}
+            self.sliding_session_expiry = {
+                "ttl": int(sliding_config.get("ttl") or SESSION_EXPIRY_IN_SECONDS),
+                "refresh_interval": sliding_config.get("refresh_interval", SESSION_EXPIRY_REFRESH_INTERVAL_IN_SECONDS)
+            }
+            if self.sliding_session_expiry["refresh_interval"] >= self.sliding_session_expiry["ttl"]:
+                raise FdkInvalidConfig("sliding_session_expiry refresh_interval should be less than ttl")
+        self.session_expiry = (self.sliding_session_expiry or {}).get("ttl", SESSION_EXPIRY_IN_SECONDS)
+
+        # Resolve session and platform client on first use in platform routes
+        self.lazy_platform_client = bool(data.get("lazy_platform_client", False))
+
+        # Write library timings of fdk and platform routes as a Server-Timing response header
+        self.server_timing = bool(data.get("server_timing", False))
+
+        # Mirror request context values on request.conn_info.ctx for older handlers
+        self.legacy_conn_ctx = bool(data.get("legacy_conn_ctx", True))
+
+        # Application clients reused across application proxy requests
+        if data.get("application_client_cache_size"):
+            self.application_client_cache = ApplicationClientCache(int(data["application_client_cache_size"]))
+
+        # Session ids recently missing from storage. A ttl of 0 disables the cache
+        negative_cache_ttl = data.get("negative_session_cache_ttl", NEGATIVE_SESSION_CACHE_TTL_IN_SECONDS)
+        self.negative_session_cache = LRUCache(NEGATIVE_SESSION_CACHE_SIZE, negative_cache_ttl) \
+            if negative_cache_ttl else None
+
         # Cluster
         if data.get("cluster"):
             if not is_valid_url(data["cluster"]):
                 raise FdkInvalidConfig("Invalid cluster")
             self.cluster = data["cluster"]
 
+        # Rate and concurrency limits of platform api calls
+        self.rate_limiter = None
+        if data.get("rate_limit"):
+            rate_limit_config = data["rate_limit"]
+            redis_client = None
+            if rate_limit_config.get("shared"):
+                if not isinstance(self.storage, RedisStorage):
+                    raise FdkInvalidConfig("Shared rate_limit needs RedisStorage")
+                redis_client = self.storage.client
+            self.rate_limiter = PlatformRateLimiter(rate_limit_config, self.cluster, redis_client,
+                                                    self.storage.prefix_key)
+
+        # Cached platform GET endpoints
+        self.response_cache = None
+        if data.get("response_cache"):
+            response_cache_config = data["response_cache"]
+            self.response_cache = PlatformResponseCache(response_cache_config.get("endpoints") or {},
+                                                        int(response_cache_config.get("max_size", 1000)))
+
         # Webhook Registry
         self.webhook_registry = WebhookRegistry()
 
@@ -100,6 +252,12 @@ class Extension:
             raise FdkInvalidConfig(f"Invalid scopes in extension config. Invalid scopes: {', '.join(missing_scopes)}")
         return scopes
 
+    def get_metric_labels(self, company_id=None, **labels) -> dict:
+        """Metric labels, with the company id only when `metrics_company_label` is enabled."""
+        if self.metrics_company_label and company_id is not None:
+            labels["company_id"] = str(company_id)
+        return labels
+
     def get_auth_callback(self) -> str:
         return urljoin(self.base_url, "/fp/auth")
 
@@ -133,17 +291,44 @@ class Extension:
         if (session.access_token_validity and session.refresh_token):
             ac_nr_expired = (session.access_token_validity - get_current_timestamp() // 1000) <= 120
             if ac_nr_expired:
-                logger.debug(f"Renewing access token for company {company_id} with platform config {json.dumps(safe_stringify(platform_config))}")
-                renew_token_res = await platform_config.oauthClient.renewAccessToken(session.access_mode == OFFLINE_ACCESS_MODE)
+                if session.is_stateless and \
+                        await self.session_revocation_list.is_revoked_in_storage(self.storage, session):
+                    raise FdkSessionNotFoundError("Session has been revoked")
+                if is_debug_enabled():
+                    logger.debug(f"Renewing access token for company {company_id} with platform config "
+                                 f"{json.dumps(safe_stringify(platform_config))}")
+                labels = self.get_metric_labels(company_id, access_mode=session.access_mode)
+                try:
+                    with self.metrics.timer("fdk_token_renewal_duration_seconds", labels), \
+                            self.tracer.span("fdk.oauth.renew_access_token", {"fdk.access_mode": session.access_mode}), \
+                            server_timing("token_renewal"):
+                        renew_token_res = await platform_config.oauthClient.renewAccessToken(session.access_mode == OFFLINE_ACCESS_MODE)
+                except Exception:
+                    self.metrics.increment("fdk_token_renewals_total", labels=dict(labels, outcome="error"))
+                    raise
+                self.metrics.increment("fdk_token_renewals_total", labels=dict(labels, outcome="success"))
                 renew_token_res["access_token_validity"] = platform_config.oauthClient.token_expires_at
                 session.update_token(renew_token_res)
-                await SessionStorage.save_session(session)
-                logger.debug(f"Access token renewed for comapny {company_id} with response {renew_token_res}")
-
-        platform_client = PlatformClient(platform_config)
-        await platform_client.setExtraHeaders({
-            'x-ext-lib-version': f"py/{__version__}"
-        })
+                await SessionStorage.update_session_fields(session, Session.TOKEN_FIELDS)
+                if is_debug_enabled():
+                    logger.debug(f"Access token renewed for comapny {company_id} with response "
+                                 f"{json.dumps(safe_stringify(renew_token_res))}")
+
+        self.metrics.increment("fdk_platform_client_builds_total", labels=self.get_metric_labels(company_id))
+        with server_timing("platform_client"):
+            platform_client = PlatformClient(platform_config)
+            await platform_client.setExtraHeaders({
+                'x-ext-lib-version': f"py/{__version__}"
+            })
+            traceparent = self.tracer.get_traceparent()
+            if traceparent:
+                # extra headers are per client, calls made with it join the trace it was built in
+                await platform_client.setExtraHeaders({"traceparent": traceparent})
+            if self.rate_limiter:
+                self.rate_limiter.instrument(platform_client, company_id)
+            if self.response_cache:
+                # instrumented last, so cache hits do not take rate limit tokens
+                self.response_cache.instrument(platform_client, company_id)
         return platform_client
 
 
@@ -180,6 +365,8 @@ class FdkExtensionClient:
         from .api_blueprints import ClientBlueprintGroup
 
         self.fdk_route: BlueprintGroup = client_data["fdk_handler"]
+        self.metrics_route: Blueprint = client_data.get("metrics_route")
+        self.profiler_route: Blueprint = client_data.get("profiler_route")
         self.extension: Extension = client_data["extension"]
         self.platform_api_routes: ClientBlueprintGroup = client_data["platform_api_routes"]
         self.webhook_registry: WebhookRegistry = client_data["webhook_registry"]
@@ -0,0 +1,102 @@
+"""Run a task for every installed company."""
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Text
+
+from fdk_client.platform.PlatformClient import PlatformClient
+
+from .extension import extension
+from .install_index import InstallIndex
+from .session.session import Session
+from .session.session_storage import SessionStorage
+from .utilities.logger import get_logger
+
+logger = get_logger()
+
+
+FLEET_CHECKPOINT_KEY = "fdk_fleet_checkpoint"
+
+# bound on failed company ids kept in the progress report
+MAX_REPORTED_FAILURES = 100
+
+
+class FleetRunner:
+    """Runs `task(company_id, platform_client)` for every installed company with bounded concurrency.
+
+    Companies are read from the install index one batch at a time. When `job_name` is set, the cursor
+    of the last completed batch is saved to storage, and a later run with the same name resumes after
+    it. The checkpoint is removed once all companies are done.
+    """
+
+    def __init__(self, task: Callable[[int, PlatformClient], Awaitable], concurrency: int=10, batch_size: int=100,
+                 job_name: Text=None, on_progress: Callable[[dict], None]=None):
+        self.task = task
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.job_name = job_name
+        self.on_progress = on_progress
+        self.progress = {"processed": 0, "succeeded": 0, "failed": 0, "skipped": 0, "failed_companies": [],
+                         "started_at": None, "elapsed": 0.0}
+
+    async def run(self) -> dict:
+        checkpoint = await self._load_checkpoint()
+        cursor = checkpoint.get("cursor", 0)
+        if checkpoint:
+            self.progress.update(checkpoint["progress"])
+            logger.debug(f"Fleet job {self.job_name} resuming after {self.progress['processed']} companies")
+            if cursor == 0:
+                await self._clear_checkpoint()
+                return self.progress
+
+        started = time.monotonic() - self.progress["elapsed"]
+        self.progress["started_at"] = self.progress["started_at"] or time.time()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async for cursor, entries in InstallIndex.iter_companies(self.batch_size, cursor):
+            await asyncio.gather(*[self._run_company(semaphore, company_id, entry)
+                                   for company_id, entry in entries.items()])
+            self.progress["elapsed"] = time.monotonic() - started
+            await self._save_checkpoint(cursor)
+            if self.on_progress:
+                self.on_progress(dict(self.progress))
+
+        await self._clear_checkpoint()
+        return self.progress
+
+    async def _run_company(self, semaphore: asyncio.Semaphore, company_id: int, entry: dict) -> None:
+        async with semaphore:
+            try:
+                session = await SessionStorage.get_session(entry.get("session_id") or Session.generate_session_id(
+                    False, **{"cluster": extension.cluster, "company_id": company_id}))
+                if not session:
+                    self.progress["skipped"] += 1
+                    return
+                platform_client = await extension.get_platform_client(company_id, session)
+                await self.task(company_id, platform_client)
+                self.progress["succeeded"] += 1
+            except Exception as e:
+                logger.exception(f"Fleet task failed for company {company_id}: {e}")
+                self.progress["failed"] += 1
+                if len(self.progress["failed_companies"]) < MAX_REPORTED_FAILURES:
+                    self.progress["failed_companies"].append(company_id)
+            finally:
+                self.progress["processed"] += 1
+
+    def _get_checkpoint_key(self) -> Text:
+        return f"{FLEET_CHECKPOINT_KEY}:{extension.api_key}:{self.job_name}"
+
+    async def _load_checkpoint(self) -> dict:
+        if not self.job_name:
+            return {}
+        checkpoint = await extension.storage.get(self._get_checkpoint_key())
+        return json.loads(checkpoint) if checkpoint else {}
+
+    async def _save_checkpoint(self, cursor) -> None:
+        if self.job_name:
+            cursor = cursor.decode() if isinstance(cursor, bytes) else cursor
+            await extension.storage.set(self._get_checkpoint_key(),
+                                        json.dumps({"cursor": cursor, "progress": self.progress}))
+
+    async def _clear_checkpoint(self) -> None:
+        if self.job_name:
+            await extension.storage.delete(self._get_checkpoint_key())
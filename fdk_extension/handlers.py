@@ -1,32 +1,66 @@
 """Request handlers."""
 from datetime import datetime, timedelta
+import functools
+import hmac
+import math
 import uuid
 
 from sanic.blueprints import Blueprint
 from sanic.blueprint_group import BlueprintGroup
 from sanic.response import json as json_response
 from sanic.response import redirect
+from sanic.response import text as text_response
 from sanic.request import Request
 
 from .constants import *
-from .exceptions import FdkSessionNotFoundError, FdkInvalidOAuthError
+from .exceptions import FdkSessionNotFoundError, FdkInvalidOAuthError, FdkProfilerBusy
 from .extension import extension
+from .install_index import InstallIndex
+from .middleware.context_middleware import request_context_on_request
+from .middleware.server_timing_middleware import server_timing_on_request
+from .middleware.server_timing_middleware import server_timing_on_response
 from .middleware.session_middleware import session_middleware
+from .middleware.session_middleware import session_unit_of_work_on_request
+from .middleware.session_middleware import session_unit_of_work_on_response
 from .session.session import Session
+from .request_context import set_context
 from .session.session_storage import SessionStorage
 from .utilities import logger
-from .utilities.utility import get_company_cookie_name
+from .utilities.loop_watchdog import watch_step
+from .utilities.profiler import to_collapsed
+from .utilities.server_timing import server_timing
+from .uninstall import schedule_uninstall
+from .uninstall import uninstall_listener_on_start
+from .uninstall import uninstall_listener_on_stop
+from .utilities.utility import set_session_cookie
 
 logger = logger.get_logger()
 
 
+def record_outcome(handler_name: str):
+    """Count handler responses by outcome, observe their duration and trace them in a `fdk.<handler>` span."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def instrumented_handler(request: Request):
+            with extension.metrics.timer("fdk_handler_duration_seconds", {"handler": handler_name}), \
+                    extension.tracer.span(f"fdk.{handler_name}") as span:
+                response = await watch_step(f"route:{handler_name}", handler(request))
+                span.set_attribute("http.status_code", response.status)
+            outcome = "success" if response.status < 400 else "error"
+            extension.metrics.increment("fdk_handler_requests_total", labels={"handler": handler_name, "outcome": outcome})
+            return response
+        return instrumented_handler
+    return decorator
+
+
+@record_outcome("install")
 async def install_handler(request: Request):
     try:
         company_id = int(request.args.get("company_id"))
         platform_config = extension.get_platform_config(company_id)
 
         session = Session(Session.generate_session_id(True))
-        session_expires = datetime.now() + timedelta(seconds=SESSION_EXPIRY_IN_SECONDS) # 15 mins
+        session_expires = datetime.now() + timedelta(seconds=extension.session_expiry) # 15 mins by default
 
         if session.is_new:
             session.company_id = company_id
@@ -35,8 +69,7 @@ async def install_handler(request: Request):
             session.access_mode = ONLINE_ACCESS_MODE  # Always generate online mode token for extension launch
             session.extension_id = extension.api_key
 
-        request.conn_info.ctx.fdk_session = session
-        request.conn_info.ctx.extension = extension
+        set_context(request, fdk_session=session, extension=extension)
 
         session.state = str(uuid.uuid4())
 
@@ -56,14 +89,8 @@ async def install_handler(request: Request):
 
         logger.debug(f"Redirecting after install callback to url: {redirect_url}")
 
-        company_cookie_name =  get_company_cookie_name(company_id=company_id)
-
         next_response = redirect(redirect_url, headers={"x-company-id": str(company_id)})
-        next_response.cookies[company_cookie_name] = session.session_id
-        next_response.cookies[company_cookie_name]["secure"] = True
-        next_response.cookies[company_cookie_name]["samesite"] = "None"
-        next_response.cookies[company_cookie_name]["httponly"] = True
-        next_response.cookies[company_cookie_name]["expires"] = session.expires
+        set_session_cookie(next_response, company_id, session.session_id, session.expires)
 
         await SessionStorage.save_session(session)
 
@@ -73,27 +100,29 @@ async def install_handler(request: Request):
         return json_response({"error_message": str(e)}, 500)
 
 
+@record_outcome("auth")
 async def auth_handler(request: Request):
     try:
-        if not request.conn_info.ctx.fdk_session:
+        if not request.ctx.fdk_session:
             raise FdkSessionNotFoundError("Can not complete oauth process as session not found")
 
-        if request.conn_info.ctx.fdk_session.state != request.args.get("state"):
+        if request.ctx.fdk_session.state != request.args.get("state"):
             raise FdkInvalidOAuthError("Invalid oauth call")
 
-        company_id = request.conn_info.ctx.fdk_session.company_id
+        company_id = request.ctx.fdk_session.company_id
 
         platform_config = extension.get_platform_config(company_id)
-        await platform_config.oauthClient.verifyCallback(request.args)
+        with extension.tracer.span("fdk.oauth.verify_callback"), server_timing("oauth"):
+            await platform_config.oauthClient.verifyCallback(request.args)
 
         token: dict = platform_config.oauthClient.raw_token
         session_expires = datetime.now() + timedelta(seconds=token["expires_in"])
 
-        request.conn_info.ctx.fdk_session.expires = session_expires
+        request.ctx.fdk_session.expires = session_expires
         token["access_token_validity"] = int(session_expires.timestamp()*1000)
-        request.conn_info.ctx.fdk_session.update_token(token)
+        request.ctx.fdk_session.update_token(token)
 
-        await SessionStorage.save_session(request.conn_info.ctx.fdk_session)
+        await SessionStorage.save_session(request.ctx.fdk_session)
 
 
         if not extension.is_online_access_mode():
@@ -108,36 +137,36 @@ async def auth_handler(request: Request):
                 session = Session(session_id=session_id)
             
             platform_config = extension.get_platform_config(company_id)
-            offline_token_response = await platform_config.oauthClient.getOfflineAccessToken(
-                extension.scopes, request.args.get("code")
-                )
+            with extension.tracer.span("fdk.oauth.get_offline_access_token"), server_timing("oauth"):
+                offline_token_response = await platform_config.oauthClient.getOfflineAccessToken(
+                    extension.scopes, request.args.get("code")
+                    )
             
             session.company_id = company_id
             session.scope = extension.scopes
-            session.state = request.conn_info.ctx.fdk_session.state
+            session.state = request.ctx.fdk_session.state
             session.extension_id = extension.api_key
             offline_token_response["access_token_valid"] = platform_config.oauthClient.token_expires_at
             offline_token_response["access_mode"] = OFFLINE_ACCESS_MODE
             session.update_token(offline_token_response)
 
             await SessionStorage.save_session(session=session)
-
-        request.conn_info.ctx.extension = extension
+            await InstallIndex.add(company_id, session_id)
+        else:
+            await InstallIndex.add(company_id)
 
         if extension.webhook_registry.is_initialized:
             client = await extension.get_platform_client(
-                company_id=company_id, session=request.conn_info.ctx.fdk_session)
-            await extension.webhook_registry.sync_events(client, None, True)
+                company_id=company_id, session=request.ctx.fdk_session)
+            with extension.tracer.span("fdk.webhook.sync_events"), server_timing("webhook_sync"):
+                await extension.webhook_registry.sync_events(client, None, True)
         
-        redirect_url = await extension.callbacks["auth"](request)
+        with extension.tracer.span("fdk.callback.auth"), server_timing("callback"):
+            redirect_url = await watch_step("callback:auth", extension.callbacks["auth"](request))
         next_response = redirect(redirect_url, headers={"x-company-id": str(company_id)})
 
-        company_cookie_name = get_company_cookie_name(company_id=company_id)
-        next_response.cookies[company_cookie_name] = request.conn_info.ctx.fdk_session.session_id
-        next_response.cookies[company_cookie_name]["secure"] = True
-        next_response.cookies[company_cookie_name]["samesite"] = "None"
-        next_response.cookies[company_cookie_name]["httponly"] = True
-        next_response.cookies[company_cookie_name]["expires"] = session_expires
+        set_session_cookie(next_response, company_id, await SessionStorage.seal_session(request.ctx.fdk_session),
+                           session_expires)
 
         logger.debug(f"Redirecting after auth callback to url: {redirect_url}")
 
@@ -147,6 +176,7 @@ async def auth_handler(request: Request):
         return json_response({"error_message": str(e)}, 500)
 
 
+@record_outcome("auto_install")
 async def auto_install_handler(request: Request):
     try:
         company_id, code = int(request.json.get("company_id")), request.json.get("code")
@@ -165,7 +195,8 @@ async def auto_install_handler(request: Request):
         elif session.extension_id != extension.api_key:
             session = Session(session_id=session_id)
 
-        offline_token_response = await platform_config.oauthClient.getOfflineAccessToken(extension.scopes, code=code)
+        with extension.tracer.span("fdk.oauth.get_offline_access_token"), server_timing("oauth"):
+            offline_token_response = await platform_config.oauthClient.getOfflineAccessToken(extension.scopes, code=code)
 
         session.company_id = company_id
         session.scope = extension.scopes
@@ -177,17 +208,21 @@ async def auto_install_handler(request: Request):
 
         if not extension.is_online_access_mode():
             await SessionStorage.save_session(session=session)
+            await InstallIndex.add(company_id, session_id)
+        else:
+            await InstallIndex.add(company_id)
 
         if extension.webhook_registry.is_initialized:
-            client = await extension.get_platform_client(
-                company_id=company_id, session=request.conn_info.ctx.fdk_session)
-            await extension.webhook_registry.sync_events(client, None, True)
+            client = await extension.get_platform_client(company_id=company_id, session=session)
+            with extension.tracer.span("fdk.webhook.sync_events"), server_timing("webhook_sync"):
+                await extension.webhook_registry.sync_events(client, None, True)
 
 
         logger.debug(f"Extension installed for company: {company_id} on company creation.")
 
         if extension.callbacks["auto_install"]:
-            await extension.callbacks["auto_install"](request)
+            with extension.tracer.span("fdk.callback.auto_install"), server_timing("callback"):
+                await watch_step("callback:auto_install", extension.callbacks["auto_install"](request))
 
             
         return json_response({ "message": "success" })
@@ -197,34 +232,99 @@ async def auto_install_handler(request: Request):
         return json_response({"error_message": str(e)}, 500)
 
 
+@record_outcome("uninstall")
 async def uninstall_handler(request: Request):
     try:
         company_id = request.json["company_id"]
-        if not extension.is_online_access_mode():
-            session_id = Session.generate_session_id(False, **{
-                "cluster": extension.cluster,
-                "company_id": company_id
-            })
-            await SessionStorage.delete_session(session_id=session_id)
-
-        request.conn_info.ctx.extension = extension
-        await extension.callbacks["uninstall"](request)
+        # cleanup and the uninstall callback run in background, the platform is acknowledged right away
+        schedule_uninstall(request, company_id)
         return json_response({"success": True})
     except Exception as e:
         logger.exception(e)
         return json_response({"error_message": str(e)}, 500)
 
 
+async def metrics_handler(request: Request):
+    if not hasattr(extension.metrics, "render"):
+        return json_response({"error_message": "Metrics backend does not support export"}, 404)
+    return text_response(extension.metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+async def profile_handler(request: Request):
+    if not extension.profiler:
+        return json_response({"error_message": "Profiler is not enabled"}, 404)
+    authorization = request.headers.get("authorization", "")
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {extension.profiler_token}".encode()):
+        return json_response({"error_message": "unauthorized"}, 401)
+    try:
+        seconds = float(request.args.get("seconds", 10))
+    except ValueError:
+        return json_response({"error_message": "Invalid seconds"}, 400)
+    if not math.isfinite(seconds):
+        # nan passes min and max and would never stop sleeping
+        return json_response({"error_message": "Invalid seconds"}, 400)
+
+    try:
+        profile = await extension.profiler.profile(seconds)
+    except FdkProfilerBusy as e:
+        return json_response({"error_message": str(e)}, 409)
+
+    if request.args.get("format") == "json":
+        return json_response(dict(profile, stacks=dict(profile["stacks"].most_common())))
+    headers = {"x-fdk-profile-samples": str(profile["samples"]), "x-fdk-profile-overhead": str(profile["overhead"])}
+    return text_response(to_collapsed(profile["stacks"]), headers=headers)
+
+
+async def loop_watchdog_on_start(app, loop) -> None:
+    if extension.loop_watchdog:
+        extension.loop_watchdog.start(extension.metrics)
+
+
+async def loop_watchdog_on_stop(app, loop) -> None:
+    if extension.loop_watchdog:
+        extension.loop_watchdog.stop()
+
+
+async def webhook_executors_on_stop(app, loop) -> None:
+    if extension.webhook_registry:
+        await extension.webhook_registry.shutdown_executors()
+
+
+def setup_metrics_routes(path: str="/metrics") -> Blueprint:
+    fdk_metrics_bp = Blueprint("fdk_metrics_bp")
+    fdk_metrics_bp.add_route(metrics_handler, path, methods=["GET"])
+    return fdk_metrics_bp
+
+
+def setup_profiler_routes(path: str="/fdk/admin/profile") -> Blueprint:
+    fdk_profiler_bp = Blueprint("fdk_profiler_bp")
+    fdk_profiler_bp.add_route(profile_handler, path, methods=["GET"])
+    return fdk_profiler_bp
+
+
 def setup_routes() -> BlueprintGroup:
     fdk_routes_bp1 = Blueprint("fdk_routes_bp1")
     fdk_routes_bp2 = Blueprint("fdk_routes_bp2")
 
+    for bp in (fdk_routes_bp1, fdk_routes_bp2):
+        if extension.server_timing:
+            bp.middleware(server_timing_on_request, "request")
+            bp.middleware(server_timing_on_response, "response")
+        bp.middleware(request_context_on_request, "request")
+        bp.middleware(session_unit_of_work_on_request, "request")
+        bp.middleware(session_unit_of_work_on_response, "response")
+
     fdk_routes_bp1.middleware(session_middleware, "request")
     fdk_routes_bp1.add_route(auth_handler, "/fp/auth", methods=["GET"])
     fdk_routes_bp1.add_route(auto_install_handler, "/fp/auto_install", methods=["POST"])
 
     fdk_routes_bp2.add_route(install_handler, "/fp/install", methods=["GET"])
     fdk_routes_bp2.add_route(uninstall_handler, "/fp/uninstall", methods=["POST"])
+    fdk_routes_bp2.listener("after_server_start")(uninstall_listener_on_start)
+    fdk_routes_bp2.listener("before_server_stop")(uninstall_listener_on_stop)
+    fdk_routes_bp2.listener("after_server_start")(loop_watchdog_on_start)
+    fdk_routes_bp2.listener("before_server_stop")(loop_watchdog_on_stop)
+    fdk_routes_bp2.listener("after_server_stop")(webhook_executors_on_stop)
 
     fdk_route = Blueprint.group(fdk_routes_bp1, fdk_routes_bp2)
     return fdk_route
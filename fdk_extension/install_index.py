@@ -0,0 +1,78 @@
+"""Index of companies that installed the extension."""
+from typing import AsyncIterator, List, Text
+import json
+
+from .extension import extension
+from .session.session import Session
+from .session.session_storage import SessionStorage
+from .utilities.utility import get_current_timestamp
+
+
+INSTALL_INDEX_KEY = "fdk_installed_companies"
+
+
+class InstallIndex:
+    """Hash of installed company ids kept in the extension storage.
+
+    It is maintained by the install, auto install and uninstall handlers. Companies installed before the
+    index existed can be added with `InstallIndex.add`.
+    """
+
+    @staticmethod
+    def get_key() -> Text:
+        return f"{INSTALL_INDEX_KEY}:{extension.api_key}"
+
+    @staticmethod
+    async def add(company_id, session_id: Text=None) -> None:
+        """Add the company, or set the offline session id of its entry.
+
+        Called on every launch, so an existing entry keeps its `installed_at` and is only rewritten when
+        a new session id is given.
+        """
+        key = InstallIndex.get_key()
+        entry = await extension.storage.hget(key, str(company_id))
+        entry = json.loads(entry) if entry else None
+        if entry is not None and (session_id is None or entry.get("session_id") == session_id):
+            return
+        entry = {"session_id": session_id, "installed_at": entry["installed_at"] if entry else get_current_timestamp()}
+        await extension.storage.hset(key, str(company_id), json.dumps(entry))
+
+    @staticmethod
+    async def remove(company_id) -> None:
+        await extension.storage.hdel(InstallIndex.get_key(), str(company_id))
+
+    @staticmethod
+    async def iter_companies(batch_size: int=100, cursor=0) -> AsyncIterator[tuple]:
+        """Yield `(next_cursor, entries)` per page of the index, `entries` being `{company_id: entry}`.
+
+        Pass a yielded cursor back as `cursor` to resume after that page.
+        """
+        while True:
+            cursor, page = await extension.storage.hscan(InstallIndex.get_key(), cursor, batch_size)
+            entries = {}
+            for company_id, entry in (page or {}).items():
+                company_id = company_id.decode() if isinstance(company_id, bytes) else company_id
+                entries[int(company_id)] = json.loads(entry)
+            if entries:
+                yield cursor, entries
+            if cursor == 0 or cursor == b"0":
+                return
+
+    @staticmethod
+    async def iter_sessions(batch_size: int=100) -> AsyncIterator[List[Session]]:
+        """Yield batches of offline sessions of installed companies.
+
+        Companies without an offline session, such as those installed in online access mode, are left out.
+        """
+        async for _, entries in InstallIndex.iter_companies(batch_size):
+            sessions = []
+            for company_id, entry in entries.items():
+                session_id = entry.get("session_id") or Session.generate_session_id(False, **{
+                    "cluster": extension.cluster,
+                    "company_id": company_id
+                })
+                session = await SessionStorage.get_session(session_id)
+                if session:
+                    sessions.append(session)
+            if sessions:
+                yield sessions
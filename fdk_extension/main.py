@@ -1,11 +1,12 @@
 """Setup fdk file."""
 from fdk_client.application.ApplicationClient import ApplicationClient
-from fdk_client.application.ApplicationConfig import ApplicationConfig
 from fdk_client.platform.PlatformClient import PlatformClient
 
 from .api_blueprints import setup_proxy_routes
 from .extension import FdkExtensionClient
 from .extension import extension
+from .handlers import setup_metrics_routes
+from .handlers import setup_profiler_routes
 from .handlers import setup_routes
 from .session.session import Session
 from .session.session_storage import SessionStorage
@@ -27,13 +28,7 @@ async def get_platform_client(company_id: str) -> PlatformClient:
 
 
 async def get_application_client(application_id: str, application_token: str) -> ApplicationClient:
-    application_config = ApplicationConfig({
-        "applicationID": application_id,
-        "applicationToken": application_token,
-        "domain": extension.cluster
-    })
-    application_client = ApplicationClient(application_config)
-    return application_client
+    return extension.application_client_cache.get_client(application_id, application_token, extension.cluster)
 
 
 def setup_fdk(data: dict) -> FdkExtensionClient:
@@ -44,6 +39,8 @@ def setup_fdk(data: dict) -> FdkExtensionClient:
 
     return FdkExtensionClient(**{
         "fdk_handler": fdk_route,
+        "metrics_route": setup_metrics_routes(),
+        "profiler_route": setup_profiler_routes(),
         "extension": extension,
         "platform_api_routes": platform_api_routes,
         "webhook_registry": extension.webhook_registry,
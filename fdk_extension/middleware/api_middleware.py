@@ -1,32 +1,58 @@
-import json
+import ujson
 
-from fdk_client.application.ApplicationClient import ApplicationClient
-from fdk_client.application.ApplicationConfig import ApplicationConfig
 from sanic.response import json as json_response
 from sanic.request import Request
 
 from ..extension import extension
-
-
+from ..request_context import set_context
+from .platform_context import PlatformRequestContext
 
 
 async def application_proxy_on_request(request: Request) -> None:
-    if request.headers.get("x-user-data"):
-        request.conn_info.ctx.user = json.loads(request.headers["x-user-data"])
-        request.conn_info.ctx.user.user_id = request.conn_info.ctx.user._id
-    if request.headers.get("x-application-data"):
-        request.conn_info.ctx.application = json.loads(request.headers["x-application-data"])
-        request.conn_info.ctx.application_config = ApplicationConfig({
-            "applicationID": request.conn_info.ctx.application._id,
-            "applicationToken": request.conn_info.ctx.application.token,
-        })
-        request.conn_info.ctx.application_client = ApplicationClient(request.conn_info.ctx.application_config)
+    user_data = request.headers.get("x-user-data")
+    if user_data:
+        user = ujson.loads(user_data)
+        user["user_id"] = user["_id"]
+        set_context(request, user=user)
+    application_data = request.headers.get("x-application-data")
+    if application_data:
+        application = ujson.loads(application_data)
+        application_client, application_config = extension.application_client_cache.get_client_with_config(
+            application["_id"], application["token"], extension.cluster)
+        set_context(request, application=application, application_config=application_config,
+                    application_client=application_client)
 
 
 async def platform_api_on_request(request: Request) -> None:
-    if not request.conn_info.ctx.fdk_session:
+    if not request.ctx.fdk_session:
         return json_response({"message": "unauthorized"}, status=401)
-    client = await extension.get_platform_client(request.conn_info.ctx.fdk_session.company_id,
-                                                 request.conn_info.ctx.fdk_session)
-    request.conn_info.ctx.platform_client = client
-    request.conn_info.ctx.extension = extension
+    client = await get_request_context(request).get_platform_client()
+    set_context(request, platform_client=client, extension=extension)
+
+
+async def lazy_platform_api_on_request(request: Request) -> None:
+    # session and platform client are resolved on first access through the request context
+    set_context(request, fdk_context=PlatformRequestContext(request))
+    if not request.ctx.fdk_context.session_id:
+        return json_response({"message": "unauthorized"}, status=401)
+
+
+async def session_not_found_handler(request: Request, exception: Exception):
+    return json_response({"message": "unauthorized"}, status=401)
+
+
+def get_request_context(request: Request) -> PlatformRequestContext:
+    context = getattr(request.ctx, "fdk_context", None)
+    if context is None:
+        context = PlatformRequestContext(request)
+        set_context(request, fdk_context=context)
+    return context
+
+
+async def get_request_session(request: Request):
+    return await get_request_context(request).get_session()
+
+
+async def get_request_platform_client(request: Request):
+    """Platform client of the request, built on first call and reused for the rest of the request."""
+    return await get_request_context(request).get_platform_client()
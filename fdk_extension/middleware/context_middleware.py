@@ -0,0 +1,7 @@
+from ..request_context import reset_context
+
+from sanic.request import Request
+
+
+async def request_context_on_request(request: Request) -> None:
+    reset_context(request)
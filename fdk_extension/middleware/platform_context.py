@@ -0,0 +1,60 @@
+import asyncio
+
+from fdk_client.platform.PlatformClient import PlatformClient
+from sanic.request import Request
+
+from ..exceptions import FdkSessionNotFoundError
+from ..extension import extension
+from ..request_context import set_context
+from ..session.session import Session
+from ..session.session_storage import SessionStorage
+from ..utilities.server_timing import server_timing
+from ..utilities.utility import get_company_cookie_name
+
+
+_UNSET = object()
+
+
+def get_request_session_id(request: Request):
+    company_id = request.headers.get("x-company-id") or request.args.get("company_id")
+    company_cookie_name = get_company_cookie_name(company_id=company_id)
+    return request.cookies.get(company_cookie_name)
+
+
+class PlatformRequestContext:
+    """Resolves the fdk session and platform client of a request on first use and memoizes them."""
+
+    def __init__(self, request: Request):
+        self._request = request
+        self._session = _UNSET
+        self._platform_client: PlatformClient = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def session_id(self):
+        return get_request_session_id(self._request)
+
+    async def get_session(self) -> Session:
+        if self._session is _UNSET:
+            async with self._lock:
+                await self._load_session()
+        return self._session
+
+    async def get_platform_client(self) -> PlatformClient:
+        """Raises FdkSessionNotFoundError when the request has no valid session."""
+        if self._platform_client is None:
+            async with self._lock:
+                if self._platform_client is None:
+                    session = await self._load_session()
+                    if not session:
+                        raise FdkSessionNotFoundError("Session not found for platform request")
+                    self._platform_client = await extension.get_platform_client(session.company_id, session)
+                    set_context(self._request, platform_client=self._platform_client)
+        return self._platform_client
+
+    async def _load_session(self) -> Session:
+        if self._session is _UNSET:
+            with server_timing("session"):
+                self._session = await SessionStorage.get_request_session(self.session_id)
+            set_context(self._request, fdk_session=self._session)
+        return self._session
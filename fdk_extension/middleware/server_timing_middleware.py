@@ -0,0 +1,20 @@
+from ..utilities.server_timing import begin_timings, end_timings, format_server_timing, get_timings
+
+from sanic.request import Request
+from sanic.response import HTTPResponse
+
+
+async def server_timing_on_request(request: Request) -> None:
+    begin_timings()
+
+
+async def server_timing_on_response(request: Request, response: HTTPResponse) -> None:
+    # registered first, so it runs after the other response middleware and includes the session commit
+    timings = get_timings()
+    end_timings()
+    if not timings:
+        return
+    header = format_server_timing(timings)
+    if response.headers.get("Server-Timing"):
+        header = f"{response.headers['Server-Timing']}, {header}"
+    response.headers["Server-Timing"] = header
@@ -1,10 +1,39 @@
-from ..utilities.utility import get_company_cookie_name
+from ..utilities.logger import get_logger
+from ..utilities.server_timing import server_timing
+from ..utilities.utility import set_session_cookie
+from ..request_context import set_context
 from ..session.session_storage import SessionStorage
+from .platform_context import PlatformRequestContext
 
 from sanic.request import Request
+from sanic.response import HTTPResponse
+from sanic.response import json as json_response
+
+logger = get_logger()
+
 
 async def session_middleware(request: Request) -> None:
-    company_id = request.headers.get("x-company-id") or request.args.get("company_id")
-    company_cookie_name = get_company_cookie_name(company_id=company_id)
-    session_id = request.cookies.get(company_cookie_name)
-    request.conn_info.ctx.fdk_session = await SessionStorage.get_session(session_id)
\ No newline at end of file
+    set_context(request, fdk_context=PlatformRequestContext(request))
+    await request.ctx.fdk_context.get_session()
+
+
+async def session_unit_of_work_on_request(request: Request) -> None:
+    SessionStorage.begin_unit_of_work()
+
+
+async def session_unit_of_work_on_response(request: Request, response: HTTPResponse):
+    try:
+        with server_timing("session_save"):
+            await SessionStorage.commit_unit_of_work()
+    except Exception as e:
+        logger.exception(e)
+        return json_response({"error_message": str(e)}, 500)
+
+
+async def session_cookie_on_response(request: Request, response: HTTPResponse) -> None:
+    # keep cookie expiry in sync with a session ttl extended by sliding expiry, and reseal changed stateless sessions
+    session = getattr(request.ctx, "fdk_session", None)
+    if not session or not session.company_id:
+        return
+    if session.expiry_refreshed or (session.is_stateless and session.is_dirty):
+        set_session_cookie(response, session.company_id, await SessionStorage.seal_session(session), session.expires)
@@ -0,0 +1,39 @@
+"""Request scoped context for values the library attaches to a request."""
+from types import SimpleNamespace
+
+from sanic.request import Request
+
+from .extension import extension
+
+
+# attributes owned by the library, reset at the start of every library request
+FDK_CONTEXT_KEYS = ("extension", "fdk_session", "fdk_context", "platform_client", "user", "application",
+                    "application_config", "application_client")
+
+
+def get_context(request: Request) -> SimpleNamespace:
+    """Context of the current request. Use this instead of `request.conn_info.ctx`."""
+    return request.ctx
+
+
+def set_context(request: Request, **values) -> None:
+    for key, value in values.items():
+        setattr(request.ctx, key, value)
+    legacy_ctx = _get_legacy_context(request)
+    if legacy_ctx is not None:
+        for key, value in values.items():
+            setattr(legacy_ctx, key, value)
+
+
+def reset_context(request: Request) -> None:
+    values = dict.fromkeys(FDK_CONTEXT_KEYS)
+    values["extension"] = extension
+    set_context(request, **values)
+
+
+def _get_legacy_context(request: Request):
+    # `request.conn_info.ctx` is shared by all requests of a keep-alive connection. Values are only mirrored
+    # there for handlers written against older versions, and are reset with the request context.
+    if not extension.legacy_conn_ctx or request.conn_info is None:
+        return None
+    return request.conn_info.ctx
@@ -1,14 +1,28 @@
+from datetime import datetime
 import hashlib
 import json
+import re
 import uuid
 
 from ..constants import ONLINE_ACCESS_MODE
 from ..utilities.utility import isoformat_to_datetime
 from ..utilities.utility import json_serial
 
+# formats produced by `Session.generate_session_id`
+ONLINE_SESSION_ID_PATTERN = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}")
+OFFLINE_SESSION_ID_PATTERN = re.compile(r"[0-9a-f]{64}")
 
 class Session:
+    # fields changed when access token is renewed
+    TOKEN_FIELDS = ("access_mode", "access_token", "current_user", "refresh_token", "expires_in",
+                    "access_token_validity")
+
     def __init__(self, session_id: str, is_new=True):
+        self._dirty_fields: set = set()
+        self._persisted: bool = False
+        self._expiry_refreshed: bool = False
+        self._stateless: bool = False
+        self._issued_at: int = None
         self.session_id: str = session_id
         self.company_id: int = None
         self.state: str = None
@@ -24,6 +38,60 @@ class Session:
         self.extension_id: str = None
 
 
+    def __setattr__(self, key, value):
+        if not key.startswith("_") and (key not in self.__dict__ or self.__dict__[key] != value):
+            self._dirty_fields.add(key)
+        object.__setattr__(self, key, value)
+
+    @property
+    def dirty_fields(self) -> set:
+        """Fields changed since the session was created, loaded or last saved."""
+        return set(self._dirty_fields)
+
+    @property
+    def is_dirty(self) -> bool:
+        return bool(self._dirty_fields)
+
+    def mark_dirty(self, fields):
+        self._dirty_fields.update(fields)
+
+    def mark_clean(self):
+        self._dirty_fields.clear()
+        self._persisted = True
+
+    @property
+    def is_persisted(self) -> bool:
+        """Whether this session was loaded from or written to storage."""
+        return self._persisted
+
+    def refresh_expiry(self, expires: datetime):
+        """Set `expires` after the storage ttl was extended, without marking it as changed."""
+        was_dirty = "expires" in self._dirty_fields
+        self.expires = expires
+        if not was_dirty:
+            self._dirty_fields.discard("expires")
+        self._expiry_refreshed = True
+
+    @property
+    def expiry_refreshed(self) -> bool:
+        return self._expiry_refreshed
+
+    def mark_stateless(self, issued_at: int=None):
+        self._stateless = True
+        self._issued_at = issued_at
+        # not in storage, a later write must add it to the company index
+        self._persisted = False
+
+    @property
+    def is_stateless(self) -> bool:
+        """Whether the session was unsealed from a stateless session token instead of storage."""
+        return self._stateless
+
+    @property
+    def issued_at(self):
+        """When the stateless token of the session was first sealed. Resealing keeps it."""
+        return self._issued_at
+
     @staticmethod
     def clone_session(session):
         session_object = Session(session["session_id"], session["is_new"])
@@ -32,6 +100,7 @@ class Session:
                 if session[key]:
                     session[key] = isoformat_to_datetime(session[key])
             setattr(session_object, key, session[key])
+        session_object.mark_clean()
         return session_object
 
     def update_token(self, raw_token: dict):
@@ -42,8 +111,29 @@ class Session:
         self.expires_in = raw_token.get("expires_in")
         self.access_token_validity = raw_token.get("access_token_validity")
 
+    def to_dict(self) -> dict:
+        return {key: value for key, value in self.__dict__.items() if not key.startswith("_")}
+
     def to_json(self):
-        return json.dumps(self.__dict__, default=json_serial)
+        return json.dumps(self.to_dict(), default=json_serial)
+
+    def to_hash(self, fields=None) -> dict:
+        data = self.to_dict()
+        return {key: json.dumps(data[key], default=json_serial) for key in (fields or data.keys())}
+
+    @staticmethod
+    def from_hash(session_id: str, hash_map: dict):
+        session = {"session_id": session_id, "is_new": False}
+        for key, value in hash_map.items():
+            if value is None:
+                continue
+            if isinstance(key, bytes):
+                key = key.decode()
+            session[key] = json.loads(value)
+        if session.get("company_id") is None:
+            # a partial write that raced the deletion of the session, not a session
+            return None
+        return Session.clone_session(session)
 
     @staticmethod
     def generate_session_id(is_online, **config_options):
@@ -52,3 +142,8 @@ class Session:
         else:
             return hashlib.sha256(
                 "{}:{}".format(config_options["cluster"], config_options["company_id"]).encode()).hexdigest()
+
+    @staticmethod
+    def is_valid_session_id(session_id) -> bool:
+        return isinstance(session_id, str) and bool(
+            ONLINE_SESSION_ID_PATTERN.fullmatch(session_id) or OFFLINE_SESSION_ID_PATTERN.fullmatch(session_id))
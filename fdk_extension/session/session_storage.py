@@ -1,29 +1,332 @@
-from datetime import datetime
-from typing import Text, Dict
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Text, Dict, Iterable
 import json
+import math
+import time
 
+from ..constants import ONLINE_ACCESS_MODE, SESSION_LAYOUT_HASH
 from ..extension import extension
+from ..utilities.logger import get_logger
 from .session import Session
+from .session_token import SessionTokenSealer
+from .unit_of_work import SessionUnitOfWork
+
+logger = get_logger()
+
+# bound on session ids remembered for sliding expiry throttling
+MAX_TRACKED_TOUCHES = 10000
+
+STORAGE_DURATION_METRIC = "fdk_session_storage_duration_seconds"
+
+# online session ids of a company, so they can be removed on uninstall
+COMPANY_SESSIONS_KEY = "fdk_company_sessions"
+
 
 class SessionStorage:
 
+    write_stats: Dict[Text, int] = {"writes": 0, "writes_skipped": 0, "writes_coalesced": 0, "touches": 0}
+    lookup_stats: Dict[Text, int] = {"lookups": 0, "missing_cookie": 0, "rejected": 0, "negative_hits": 0, "misses": 0}
+    _last_touched: OrderedDict = OrderedDict()
+
     @staticmethod
     async def save_session(session: Session):
-        if session.expires:
-            ttl: float = (datetime.now() - session.expires).total_seconds()
-            ttl = abs(round(min(ttl, 0)))
-            return await extension.storage.setex(session.session_id, ttl, session.to_json())
+        with extension.tracer.span("fdk.session.save"):
+            return await SessionStorage.__save_session(session)
+
+    @staticmethod
+    async def __save_session(session: Session):
+        if session.is_stateless:
+            # changes are sealed into the session cookie by the response middleware
+            SessionStorage.write_stats["writes_skipped"] += 1
+            return None
+        if not session.is_dirty:
+            SessionStorage.write_stats["writes_skipped"] += 1
+            return None
+
+        unit_of_work = SessionUnitOfWork.current()
+        if unit_of_work is not None:
+            if not unit_of_work.register(session):
+                SessionStorage.write_stats["writes_coalesced"] += 1
+            return None
+
+        return await SessionStorage.write_session(session)
+
+    @staticmethod
+    async def update_session_fields(session: Session, fields: Iterable[Text]):
+        """Persist `fields` of the session. Only the hash layout writes them individually."""
+        session.mark_dirty(fields)
+        return await SessionStorage.save_session(session)
+
+    @staticmethod
+    async def write_session(session: Session, full: bool=False):
+        """Write session to storage immediately, bypassing the request unit of work."""
+        with extension.metrics.timer(STORAGE_DURATION_METRIC, {"operation": "save"}):
+            return await SessionStorage.__write_session(session, full)
+
+    @staticmethod
+    async def __write_session(session: Session, full: bool=False):
+        ttl = SessionStorage.__get_ttl(session)
+        SessionStorage.write_stats["writes"] += 1
+        if ttl == 0:
+            # already expired, writing it would create a key without ttl
+            session.mark_clean()
+            return await extension.storage.delete(session.session_id)
+        if not session.is_persisted and session.company_id and session.access_mode == ONLINE_ACCESS_MODE:
+            await extension.storage.hset_mapping(SessionStorage.get_company_sessions_key(session.company_id),
+                                                 {session.session_id: "1"})
+        await SessionStorage.__extend_company_index(session, ttl)
+        if extension.session_layout == SESSION_LAYOUT_HASH:
+            if session.is_persisted and not full:
+                # a partial update must not recreate a session deleted or expired since it was read
+                result = await extension.storage.hset_existing(session.session_id,
+                                                               session.to_hash(list(session.dirty_fields)), ttl)
+            else:
+                result = await extension.storage.hset_mapping(session.session_id, session.to_hash(), ttl)
+        elif ttl is not None and extension.sliding_session_expiry:
+            # a touch extends the key ttl without rewriting expires, which is only a lower bound then
+            result = await extension.storage.setex_extend(session.session_id, ttl, session.to_json())
+        elif ttl is not None:
+            result = await extension.storage.setex(session.session_id, ttl, session.to_json())
         else:
-            return await extension.storage.set(session.session_id, session.to_json())
+            result = await extension.storage.set(session.session_id, session.to_json())
+        session.mark_clean()
+        if extension.negative_session_cache is not None:
+            extension.negative_session_cache.pop(session.session_id)
+        return result
 
     @staticmethod
-    async def get_session(session_id: Text):
+    def get_company_sessions_key(company_id) -> Text:
+        return f"{COMPANY_SESSIONS_KEY}:{company_id}"
+
+    @staticmethod
+    async def __extend_company_index(session: Session, ttl) -> None:
+        # the index outlives every online session of the company, a shorter lived one never shortens it
+        if ttl and session.company_id and session.access_mode == ONLINE_ACCESS_MODE:
+            await extension.storage.extend_expire(SessionStorage.get_company_sessions_key(session.company_id), ttl)
+
+    @staticmethod
+    def begin_unit_of_work() -> None:
+        SessionUnitOfWork.begin()
+
+    @staticmethod
+    async def commit_unit_of_work() -> None:
+        """Write every session saved since `begin_unit_of_work` once and close the unit of work."""
+        unit_of_work = SessionUnitOfWork.current()
+        SessionUnitOfWork.end()
+        if unit_of_work is None:
+            return
+        unit_of_work.close()
+        for session in unit_of_work.pending():
+            if session.is_dirty:
+                await SessionStorage.write_session(session)
+
+    @staticmethod
+    def get_write_stats() -> dict:
+        return dict(SessionStorage.write_stats)
+
+    @staticmethod
+    def get_lookup_stats() -> dict:
+        return dict(SessionStorage.lookup_stats)
+
+    @staticmethod
+    async def get_request_session(session_id: Text):
+        """Load the session of a request cookie, touching it with sliding expiry.
+
+        Missing and malformed session ids are rejected without a storage read, and ids recently
+        missing from storage are remembered for a few seconds.
+        """
+        stats = SessionStorage.lookup_stats
+        if not session_id:
+            stats["missing_cookie"] += 1
+            return None
+        is_token = extension.session_token_sealer is not None and SessionTokenSealer.is_token(session_id)
+        if not is_token and not Session.is_valid_session_id(session_id):
+            stats["rejected"] += 1
+            return None
+        negative_cache = extension.negative_session_cache
+        if negative_cache is not None and session_id in negative_cache:
+            stats["negative_hits"] += 1
+            return None
+
+        stats["lookups"] += 1
+        session = await SessionStorage.get_session(session_id, touch=True)
+        if session is None:
+            stats["misses"] += 1
+            if negative_cache is not None:
+                negative_cache.set(session_id, True)
+        return session
+
+    @staticmethod
+    async def get_session(session_id: Text, fields: Iterable[Text]=None, touch: bool=False):
+        """Load session. With the hash layout `fields` limits which attributes are fetched.
+
+        With `touch` and sliding session expiry configured, the session ttl is extended at most once
+        per refresh interval, using GETEX with the string layout.
+        """
+        with extension.metrics.timer(STORAGE_DURATION_METRIC, {"operation": "get"}):
+            return await SessionStorage.__get_session(session_id, fields, touch)
+
+    @staticmethod
+    async def __get_session(session_id: Text, fields: Iterable[Text]=None, touch: bool=False):
+        if extension.session_token_sealer and SessionTokenSealer.is_token(session_id):
+            return await SessionStorage.__get_stateless_session(session_id, touch)
+
+        unit_of_work = SessionUnitOfWork.current()
+        pending = unit_of_work.get(session_id) if unit_of_work is not None and session_id else None
+        if pending is not None:
+            return pending
+
+        if touch and SessionStorage.__should_touch(session_id):
+            ttl = extension.sliding_session_expiry["ttl"]
+            if extension.session_layout == SESSION_LAYOUT_HASH:
+                session = await SessionStorage.__get_session(session_id, fields)
+                if session:
+                    await SessionStorage.touch_session(session, force=True)
+                return session
+            value = await extension.storage.getex(session_id, ttl)
+            if not value:
+                return None
+            session = Session.clone_session(json.loads(value))
+            await SessionStorage.__extend_company_index(session, ttl)
+            SessionStorage.__mark_touched(session, ttl)
+            return session
+
+        if extension.session_layout == SESSION_LAYOUT_HASH:
+            return await SessionStorage.__get_hash_session(session_id, fields)
         session: Text = await extension.storage.get(session_id)
         if session:
             session: Dict = json.loads(session)
             session: Session = Session.clone_session(session)
         return session
 
+    @staticmethod
+    async def touch_session(session: Session, ttl: int=None, force: bool=False) -> bool:
+        """Extend session ttl. Throttled by the sliding expiry refresh interval.
+
+        The hash layout writes only `expires` with the new ttl. The string layout only extends the key ttl,
+        its stored `expires` stays a lower bound and later saves never shorten the ttl.
+        """
+        ttl = ttl or (extension.sliding_session_expiry or {}).get("ttl") or extension.session_expiry
+        if not force and not SessionStorage.__should_touch(session.session_id):
+            return False
+        if extension.session_layout == SESSION_LAYOUT_HASH:
+            expires = datetime.now() + timedelta(seconds=ttl)
+            if not await extension.storage.hset_existing(session.session_id,
+                                                         {"expires": json.dumps(expires.isoformat())}, ttl):
+                return False
+            await SessionStorage.__extend_company_index(session, ttl)
+            SessionStorage.__mark_touched(session, ttl)
+        else:
+            if not await extension.storage.expire(session.session_id, ttl):
+                return False
+            await SessionStorage.__extend_company_index(session, ttl)
+            SessionStorage.__mark_touched(session, ttl)
+        return True
+
     @staticmethod
     async def delete_session(session_id: Text):
-        return await extension.storage.delete(session_id)
+        unit_of_work = SessionUnitOfWork.current()
+        if unit_of_work is not None:
+            unit_of_work.discard(session_id)
+        with extension.metrics.timer(STORAGE_DURATION_METRIC, {"operation": "delete"}):
+            return await extension.storage.delete(session_id)
+
+    @staticmethod
+    async def revoke_session(session: Session):
+        """Delete the session and reject stateless tokens issued for it until they expire."""
+        await SessionStorage.delete_session(session.session_id)
+        if extension.session_revocation_list:
+            expires_at = session.expires.timestamp() if isinstance(session.expires, datetime) else None
+            await extension.session_revocation_list.revoke(extension.storage, session.session_id, expires_at)
+
+    @staticmethod
+    async def seal_session(session: Session) -> Text:
+        """Cookie value for the session: a sealed token with stateless sessions, otherwise the session id.
+
+        A session too large for a cookie is kept in storage instead and the cookie holds its id.
+        """
+        if extension.session_token_sealer and session.access_mode == ONLINE_ACCESS_MODE:
+            token = extension.session_token_sealer.seal(session)
+            if token is not None:
+                return token
+            logger.warning(f"Session {session.session_id} is too large to seal into a cookie, keeping it in storage")
+            if session.is_stateless:
+                await SessionStorage.write_session(session, full=True)
+        return session.session_id
+
+    @staticmethod
+    async def __get_stateless_session(token: Text, touch: bool=False):
+        session = extension.session_token_sealer.unseal(
+            token, {"scope": extension.scopes, "extension_id": extension.api_key})
+        if session is None or await extension.session_revocation_list.is_revoked(extension.storage, session):
+            return None
+        sliding_config = extension.sliding_session_expiry
+        if touch and sliding_config and isinstance(session.expires, datetime):
+            remaining = (session.expires - datetime.now()).total_seconds()
+            if remaining <= sliding_config["ttl"] - sliding_config["refresh_interval"]:
+                SessionStorage.write_stats["touches"] += 1
+                session.refresh_expiry(datetime.now() + timedelta(seconds=sliding_config["ttl"]))
+        return session
+
+    @staticmethod
+    def __should_touch(session_id: Text) -> bool:
+        if not session_id or not extension.sliding_session_expiry:
+            return False
+        last_touched = SessionStorage._last_touched.get(session_id)
+        return last_touched is None or \
+            time.monotonic() - last_touched >= extension.sliding_session_expiry["refresh_interval"]
+
+    @staticmethod
+    def __mark_touched(session: Session, ttl: int) -> None:
+        SessionStorage.write_stats["touches"] += 1
+        SessionStorage._last_touched.pop(session.session_id, None)
+        SessionStorage._last_touched[session.session_id] = time.monotonic()
+        while len(SessionStorage._last_touched) > MAX_TRACKED_TOUCHES:
+            SessionStorage._last_touched.popitem(last=False)
+        session.refresh_expiry(datetime.now() + timedelta(seconds=ttl))
+
+    @staticmethod
+    def __get_ttl(session: Session):
+        if session.expires:
+            # rounded up, so 0 means expired
+            return max(math.ceil((session.expires - datetime.now()).total_seconds()), 0)
+        return None
+
+    @staticmethod
+    async def __get_hash_session(session_id: Text, fields: Iterable[Text]=None):
+        if not session_id:
+            return None
+        try:
+            if fields:
+                # company_id tells a session from a stray partial write
+                fields = list(fields) + ([] if "company_id" in fields else ["company_id"])
+                hash_map = dict(zip(fields, await extension.storage.hmget(session_id, fields)))
+            else:
+                hash_map = await extension.storage.hgetall(session_id)
+        except Exception as e:
+            if "WRONGTYPE" not in str(e):
+                raise
+            hash_map = None
+
+        if isinstance(hash_map, dict) and any(value is not None for value in hash_map.values()):
+            return Session.from_hash(session_id, hash_map)
+        if not extension.session_layout_migration:
+            return None
+        return await SessionStorage.__migrate_string_session(session_id)
+
+    @staticmethod
+    async def __migrate_string_session(session_id: Text):
+        # sessions saved before switching to the hash layout are rewritten as hashes on first read
+        try:
+            value = await extension.storage.get(session_id)
+        except Exception as e:
+            if "WRONGTYPE" not in str(e):
+                raise
+            return None
+        if not isinstance(value, (str, bytes)):
+            return None
+        session = Session.clone_session(json.loads(value))
+        await extension.storage.delete(session_id)
+        await SessionStorage.write_session(session, full=True)
+        return session
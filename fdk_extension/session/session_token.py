@@ -0,0 +1,167 @@
+"""Stateless session tokens sealed with AES-GCM."""
+import base64
+from datetime import datetime
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import List, Text
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:  # optional dependency, needed only for stateless sessions
+    AESGCM = None
+    InvalidTag = None
+
+from ..exceptions import FdkInvalidConfig
+from ..utilities.utility import json_serial
+from .session import Session
+
+
+TOKEN_VERSION = "v1"
+REVOKED_SESSIONS_KEY = "fdk_revoked_sessions"
+REVOKED_COMPANIES_KEY = "fdk_revoked_companies"
+# browsers drop cookies over about 4KB, leave room for the cookie name and attributes
+MAX_TOKEN_SIZE = 3800
+# not sealed, `unseal` takes them from its defaults. `is_new` is always False once sealed
+OMITTED_FIELDS = ("state", "scope", "extension_id", "is_new")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class SessionTokenSealer:
+    """Seals a session into a `v1.<key_id>.<payload>` token that can be stored in the session cookie.
+
+    Keys are derived from the api secret and the key id. Rotate by setting a new `key_id` and moving the
+    old one to `previous_key_ids` until tokens sealed with it have expired.
+    """
+
+    def __init__(self, api_secret: str, key_id: str, previous_key_ids: List[str]=None,
+                 max_size: int=MAX_TOKEN_SIZE):
+        if AESGCM is None:
+            raise FdkInvalidConfig("Stateless sessions need the `cryptography` package. "
+                                   "Install it with `pip install fdk_extension[stateless]`")
+        if not key_id or "." in key_id:
+            raise FdkInvalidConfig(f"Invalid stateless session key_id. Invalid value: {key_id}")
+        self.key_id = key_id
+        self.max_size = max_size
+        self._keys = {kid: self.__derive_key(api_secret, kid) for kid in [key_id] + list(previous_key_ids or [])}
+
+    @staticmethod
+    def __derive_key(api_secret: str, key_id: str) -> AESGCM:
+        key = hmac.new(api_secret.encode(), f"fdk-session-token:{key_id}".encode(), hashlib.sha256).digest()
+        return AESGCM(key)
+
+    @staticmethod
+    def is_token(value: Text) -> bool:
+        return bool(value) and value.startswith(TOKEN_VERSION + ".")
+
+    def seal(self, session: Session) -> str:
+        """Return the sealed token, or None if it would be longer than `max_size`."""
+        expires = session.expires.timestamp() if isinstance(session.expires, datetime) else None
+        payload = {
+            "session": {key: value for key, value in session.to_dict().items()
+                        if value is not None and key not in OMITTED_FIELDS},
+            "exp": int(expires) if expires else None,
+            "iat": session.issued_at or int(time.time())
+        }
+        header = f"{TOKEN_VERSION}.{self.key_id}"
+        nonce = os.urandom(12)
+        ciphertext = self._keys[self.key_id].encrypt(
+            nonce, json.dumps(payload, default=json_serial, separators=(",", ":")).encode(), header.encode())
+        token = f"{header}.{_b64encode(nonce + ciphertext)}"
+        if len(token) > self.max_size:
+            return None
+        return token
+
+    def unseal(self, token: Text, defaults: dict=None) -> Session:
+        """Return the sealed session, or None if the token is invalid, sealed with an unknown key or expired.
+
+        `defaults` fills in fields that are not sealed, such as `scope` and `extension_id`.
+        """
+        try:
+            version, key_id, data = token.split(".")
+            key = self._keys.get(key_id)
+            if version != TOKEN_VERSION or key is None:
+                return None
+            data = _b64decode(data)
+            payload = json.loads(key.decrypt(data[:12], data[12:], f"{version}.{key_id}".encode()))
+        except (ValueError, InvalidTag):
+            return None
+
+        if payload.get("exp") and payload["exp"] <= time.time():
+            return None
+        session = {**(defaults or {}), **payload["session"]}
+        session.setdefault("is_new", False)
+        session = Session.clone_session(session)
+        session.mark_stateless(payload.get("iat"))
+        return session
+
+
+class SessionRevocationList:
+    """Revoked stateless session ids and companies, kept in storage and cached in process.
+
+    The cached copy is reloaded at most once per `refresh_interval` seconds, so checking a token does not
+    need a storage read on every request. A revoked company rejects every token first sealed before it was
+    revoked, the tokens of its next install still work.
+    """
+
+    def __init__(self, refresh_interval: float=30):
+        self.refresh_interval = refresh_interval
+        self._revoked: dict = {}
+        self._revoked_companies: dict = {}
+        self._loaded_at: float = None
+
+    async def revoke(self, storage, session_id: Text, expires_at: float=None) -> None:
+        expires_at = expires_at or time.time() + 24 * 60 * 60
+        await storage.hset(REVOKED_SESSIONS_KEY, session_id, str(expires_at))
+        self._revoked[session_id] = expires_at
+
+    async def revoke_company(self, storage, company_id) -> None:
+        revoked_before = time.time()
+        await storage.hset(REVOKED_COMPANIES_KEY, str(company_id), str(revoked_before))
+        self._revoked_companies[str(company_id)] = revoked_before
+
+    def invalidate(self) -> None:
+        """Reload the list from storage on the next check."""
+        self._loaded_at = None
+
+    async def is_revoked(self, storage, session: Session) -> bool:
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval:
+            await self.refresh(storage)
+        if session.session_id in self._revoked:
+            return True
+        revoked_before = self._revoked_companies.get(str(session.company_id))
+        return revoked_before is not None and (session.issued_at or 0) < revoked_before
+
+    async def is_revoked_in_storage(self, storage, session: Session) -> bool:
+        if await storage.hget(REVOKED_SESSIONS_KEY, session.session_id) is not None:
+            return True
+        revoked_before = await storage.hget(REVOKED_COMPANIES_KEY, str(session.company_id))
+        return revoked_before is not None and (session.issued_at or 0) < float(revoked_before)
+
+    async def refresh(self, storage) -> None:
+        self._loaded_at = time.monotonic()
+        self._revoked_companies = {
+            company_id.decode() if isinstance(company_id, bytes) else company_id: float(revoked_before)
+            for company_id, revoked_before in (await storage.hgetall(REVOKED_COMPANIES_KEY) or {}).items()
+        }
+        now = time.time()
+        revoked, expired = {}, []
+        for session_id, expires_at in (await storage.hgetall(REVOKED_SESSIONS_KEY) or {}).items():
+            session_id = session_id.decode() if isinstance(session_id, bytes) else session_id
+            if float(expires_at) > now:
+                revoked[session_id] = float(expires_at)
+            else:
+                expired.append(session_id)
+        self._revoked = revoked
+        if expired:
+            await storage.hdel(REVOKED_SESSIONS_KEY, *expired)
@@ -0,0 +1,64 @@
+"""Request scoped unit of work for session writes."""
+from collections import OrderedDict
+from contextvars import ContextVar, Token
+
+from .session import Session
+
+
+_current_unit_of_work: ContextVar = ContextVar("fdk_session_unit_of_work", default=None)
+
+
+class SessionUnitOfWork:
+    """Collects sessions saved during a request so each one is written once when the request ends."""
+
+    def __init__(self):
+        self._sessions: OrderedDict = OrderedDict()
+        self._closed: bool = False
+
+    def register(self, session: Session) -> bool:
+        """Add session to the pending writes. Returns False if it was already pending."""
+        pending = self._sessions.get(session.session_id)
+        self._sessions[session.session_id] = session
+        if pending is not None and pending is not session:
+            # a different object was saved for the same id, the last one wins with all changed fields
+            session.mark_dirty(pending.dirty_fields)
+        return pending is None
+
+    def get(self, session_id: str) -> Session:
+        return self._sessions.get(session_id)
+
+    def discard(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def pending(self) -> list:
+        return list(self._sessions.values())
+
+    def close(self) -> None:
+        self._closed = True
+
+    @property
+    def is_closed(self) -> bool:
+        return self._closed
+
+    @staticmethod
+    def current():
+        """Open unit of work of the current context.
+
+        Tasks created during a request copy its context, so they still see the unit of work after it was
+        committed. A closed one is ignored and their saves are written directly.
+        """
+        unit_of_work = _current_unit_of_work.get()
+        if unit_of_work is None or unit_of_work.is_closed:
+            return None
+        return unit_of_work
+
+    @staticmethod
+    def begin() -> Token:
+        return _current_unit_of_work.set(SessionUnitOfWork())
+
+    @staticmethod
+    def end(token: Token=None) -> None:
+        if token is not None:
+            _current_unit_of_work.reset(token)
+        else:
+            _current_unit_of_work.set(None)
@@ -34,3 +34,87 @@ class BaseStorage(metaclass=ABCMeta):
     @abstractmethod
     async def hgetall(self, key):
         pass
+
+    async def expire(self, key, ttl) -> bool:
+        """Reset ttl of an existing key. Returns False if the key does not exist.
+
+        The generic version rewrites the value with `setex`, so it only works for string values. Storages
+        with a native EXPIRE override it without rewriting the value.
+        """
+        value = await self.get(key)
+        if value is None:
+            return False
+        await self.setex(key, ttl, value)
+        return True
+
+    async def extend_expire(self, key, ttl) -> bool:
+        """Set the ttl of an existing key to `ttl` unless it already lives longer. Keys without a ttl get one.
+
+        The generic version can not read the current ttl and leaves it unchanged, so the key lives until
+        it is deleted.
+        """
+        return False
+
+    async def setex_extend(self, key, ttl, value):
+        """Set value with a ttl of at least `ttl`, keeping a longer ttl the key already has.
+
+        The generic version can not read the current ttl and sets `ttl`.
+        """
+        return await self.setex(key, ttl, value)
+
+    async def getex(self, key, ttl):
+        """Get value and reset its ttl. Storages with a native GETEX do this in one round trip."""
+        value = await self.get(key)
+        if value is not None:
+            await self.expire(key, ttl)
+        return value
+
+    async def unlink(self, *keys) -> int:
+        """Delete keys. Storages with a native UNLINK reclaim memory in the background."""
+        deleted = 0
+        for key in keys:
+            deleted += 1 if await self.delete(key) else 0
+        return deleted
+
+    async def hdel(self, key, *hash_keys) -> int:
+        """Delete fields of a hash. Returns the number of deleted fields.
+
+        The generic version rewrites the remaining fields, which is not atomic and drops the key ttl.
+        Storages with a native HDEL override it.
+        """
+        hash_map = await self.hgetall(key) or {}
+        remaining = {hash_key: value for hash_key, value in hash_map.items() if hash_key not in hash_keys}
+        if len(remaining) == len(hash_map):
+            return 0
+        await self.delete(key)
+        for hash_key, value in remaining.items():
+            await self.hset(key, hash_key, value)
+        return len(hash_map) - len(remaining)
+
+    async def hmget(self, key, hash_keys: list) -> list:
+        return [await self.hget(key, hash_key) for hash_key in hash_keys]
+
+    async def hset_mapping(self, key, mapping: dict, ttl=None):
+        """Set multiple hash fields and optionally reset the key ttl in one round trip."""
+        for hash_key, value in mapping.items():
+            await self.hset(key, hash_key, value)
+        if ttl:
+            await self.expire(key, ttl)
+
+    async def hset_existing(self, key, mapping: dict, ttl=None) -> bool:
+        """Like `hset_mapping`, but only if the hash exists, so a partial update never recreates a deleted
+        or expired hash. Returns whether it was written.
+
+        The generic version checks and writes in two steps, storages override it with an atomic one.
+        """
+        if not await self.hgetall(key):
+            return False
+        await self.hset_mapping(key, mapping, ttl)
+        return True
+
+    async def hscan(self, key, cursor=0, count: int=100) -> tuple:
+        """Return `(next_cursor, fields)` for one page of a hash. Start with cursor 0, a next cursor of 0 ends the scan.
+
+        Storages without native cursoring return the whole hash at once.
+        """
+        return 0, await self.hgetall(key) if cursor == 0 else {}
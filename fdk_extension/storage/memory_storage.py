@@ -1,3 +1,5 @@
+import time
+
 from .base_storage import BaseStorage
 
 
@@ -6,29 +8,105 @@ class MemoryStorage(BaseStorage):
     def __init__(self, prefix_key):
         super().__init__(prefix_key)
         self._data = {}
+        self._expiry = {}
 
     async def get(self, key):
-        return self._data[self.prefix_key + key]
+        return self._get(self.prefix_key + key)
 
     async def set(self, key, value):
         self._data[self.prefix_key + key] = value
+        self._expiry.pop(self.prefix_key + key, None)
 
     async def delete(self, key):
-        del self._data[self.prefix_key + key]
+        self._data.pop(self.prefix_key + key, None)
+        self._expiry.pop(self.prefix_key + key, None)
+
+    async def unlink(self, *keys):
+        deleted = 0
+        for key in keys:
+            deleted += 1 if self._get(self.prefix_key + key) is not None else 0
+            await self.delete(key)
+        return deleted
+
+    async def setex(self, key, ttl, value):
+        self._data[self.prefix_key + key] = value
+        self._expiry[self.prefix_key + key] = time.monotonic() + ttl
 
-    async def setex(self, key, value, ttl):
-        # TODO: add support for ttl
+    async def setex_extend(self, key, ttl, value):
+        current = self._expiry.get(self.prefix_key + key) if self._get(self.prefix_key + key) is not None else None
         self._data[self.prefix_key + key] = value
+        self._expiry[self.prefix_key + key] = max(time.monotonic() + ttl, current or 0)
+
+    async def expire(self, key, ttl):
+        if self._get(self.prefix_key + key) is None:
+            return False
+        self._expiry[self.prefix_key + key] = time.monotonic() + ttl
+        return True
+
+    async def extend_expire(self, key, ttl):
+        if self._get(self.prefix_key + key) is None:
+            return False
+        expires_at = time.monotonic() + ttl
+        current = self._expiry.get(self.prefix_key + key)
+        if current is not None and current >= expires_at:
+            return False
+        self._expiry[self.prefix_key + key] = expires_at
+        return True
+
+    async def getex(self, key, ttl):
+        value = self._get(self.prefix_key + key)
+        if value is not None:
+            self._expiry[self.prefix_key + key] = time.monotonic() + ttl
+        return value
 
     async def hget(self, key, hash_key):
-        hash_map = self._data[self.prefix_key + key]
+        hash_map = self._get(self.prefix_key + key)
         if hash_map:
-            return hash_map[hash_key]
+            return hash_map.get(hash_key)
 
     async def hset(self, key, hash_key, value):
-        hash_map = self._data.get([self.prefix_key + key], {})
+        hash_map = self._get(self.prefix_key + key)
+        if hash_map is None:
+            hash_map = {}
+            self._data[self.prefix_key + key] = hash_map
         hash_map[hash_key] = value
-        self._data[self.prefix_key + key] = hash_map
 
     async def hgetall(self, key):
-        return self._data[self.prefix_key + key]
+        return self._get(self.prefix_key + key) or {}
+
+    async def hdel(self, key, *hash_keys):
+        hash_map = self._get(self.prefix_key + key) or {}
+        return len([hash_map.pop(hash_key) for hash_key in hash_keys if hash_key in hash_map])
+
+    async def hmget(self, key, hash_keys):
+        hash_map = self._get(self.prefix_key + key) or {}
+        return [hash_map.get(hash_key) for hash_key in hash_keys]
+
+    async def hscan(self, key, cursor=0, count=100):
+        # cursor is the last field returned, so fields added or removed during a scan do not shift pages
+        hash_map = self._get(self.prefix_key + key) or {}
+        fields = sorted(field for field in hash_map if cursor == 0 or field > cursor)[:count]
+        next_cursor = fields[-1] if len(fields) == count else 0
+        return next_cursor, {field: hash_map[field] for field in fields}
+
+    async def hset_mapping(self, key, mapping, ttl=None):
+        hash_map = self._get(self.prefix_key + key)
+        if hash_map is None:
+            hash_map = {}
+            self._data[self.prefix_key + key] = hash_map
+        hash_map.update(mapping)
+        if ttl:
+            self._expiry[self.prefix_key + key] = time.monotonic() + ttl
+
+    async def hset_existing(self, key, mapping, ttl=None):
+        if not self._get(self.prefix_key + key):
+            return False
+        await self.hset_mapping(key, mapping, ttl)
+        return True
+
+    def _get(self, full_key):
+        expires_at = self._expiry.get(full_key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(full_key, None)
+            self._expiry.pop(full_key, None)
+        return self._data.get(full_key)
@@ -1,32 +1,256 @@
+import asyncio
+from collections import OrderedDict
+from typing import List
+import time
+
 from .base_storage import BaseStorage
-from typing import Union
+from ..utilities.latency import LatencyTracker
 
 from aioredis.client import Redis
+from aioredis.exceptions import ResponseError
+
+
+PRIMARY_ENDPOINT = "primary"
+
+# hedging needs enough samples for a meaningful p95 of the replica
+MIN_HEDGE_SAMPLES = 20
+
+# TTL is -2 for a missing key and -1 for a key without ttl
+EXTEND_EXPIRE_SCRIPT = """
+local ttl = redis.call('TTL', KEYS[1])
+if ttl == -2 or (ttl ~= -1 and ttl >= tonumber(ARGV[1])) then
+    return 0
+end
+return redis.call('EXPIRE', KEYS[1], ARGV[1])
+"""
+
+SETEX_EXTEND_SCRIPT = """
+local ttl = math.max(tonumber(ARGV[1]), redis.call('TTL', KEYS[1]))
+return redis.call('SETEX', KEYS[1], ttl, ARGV[2])
+"""
+
+# ARGV is the ttl, 0 for none, followed by field value pairs
+HSET_EXISTING_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+if tonumber(ARGV[1]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return 1
+"""
 
 
 class RedisStorage(BaseStorage):
 
-    def __init__(self, client: Redis, prefix_key: str=""):
+    def __init__(self, client: Redis, prefix_key: str="", replica_clients: List[Redis]=None,
+                 hedged_reads: bool=False, read_your_writes_window: float=5.0,
+                 max_tracked_writes: int=10000):
         super().__init__(prefix_key)
         self.client = client
+        self.replica_clients: List[Redis] = replica_clients or []
+        self.hedged_reads = hedged_reads
+        self.read_your_writes_window = read_your_writes_window
+        self.max_tracked_writes = max_tracked_writes
+        self._recent_writes: OrderedDict = OrderedDict()
+        self._replica_index = 0
+        self._endpoint_names = [f"replica-{index}" for index in range(len(self.replica_clients))]
+        self._latency = {name: LatencyTracker() for name in [PRIMARY_ENDPOINT] + self._endpoint_names}
+        self.hedge_stats = {"hedged": 0, "primary_won": 0, "replica_fallbacks": 0, "read_your_writes": 0}
+        self._getex_supported = True
 
     async def get(self, key):
-        return await self.client.get(self.prefix_key + key)
+        return await self._read(key, "get")
 
     async def set(self, key, value):
-        return await self.client.set(self.prefix_key + key, value)
+        return await self._write(key, "set", value)
 
     async def delete(self, key):
-        await self.client.delete(self.prefix_key + key)
+        await self._write(key, "delete")
 
     async def setex(self, key, ttl, value):
-        return await self.client.setex(self.prefix_key + key, ttl, value)
+        return await self._write(key, "setex", ttl, value)
+
+    async def setex_extend(self, key, ttl, value):
+        full_key = self.prefix_key + key
+        result = await self._timed(PRIMARY_ENDPOINT, self.client, "eval", SETEX_EXTEND_SCRIPT, 1, full_key, int(ttl), value)
+        if self.replica_clients:
+            self._track_write(full_key)
+        return result
+
+    async def expire(self, key, ttl):
+        return await self._write(key, "expire", ttl)
+
+    async def extend_expire(self, key, ttl):
+        full_key = self.prefix_key + key
+        result = await self._timed(PRIMARY_ENDPOINT, self.client, "eval", EXTEND_EXPIRE_SCRIPT, 1, full_key, int(ttl))
+        if self.replica_clients:
+            self._track_write(full_key)
+        return bool(result)
+
+    async def getex(self, key, ttl):
+        # GETEX needs redis 6.2+, older servers get a GET + EXPIRE transaction
+        if self._getex_supported:
+            try:
+                return await self._write(key, "getex", ttl)
+            except ResponseError as e:
+                if "unknown command" not in str(e).lower():
+                    raise
+                self._getex_supported = False
+        full_key = self.prefix_key + key
+        return await self._timed(PRIMARY_ENDPOINT, self, "_execute_get_expire", full_key, ttl)
+
+    async def unlink(self, *keys):
+        if not keys:
+            return 0
+        full_keys = [self.prefix_key + key for key in keys]
+        result = await self._timed(PRIMARY_ENDPOINT, self.client, "unlink", *full_keys)
+        if self.replica_clients:
+            for full_key in full_keys:
+                self._track_write(full_key)
+        return result
 
     async def hget(self, key, hash_key):
-        return await self.client.hget(self.prefix_key + key, hash_key)
+        return await self._read(key, "hget", hash_key)
 
     async def hset(self, key, hash_key, value):
-        return await self.client.hset(self.prefix_key + key, hash_key, value)
+        return await self._write(key, "hset", hash_key, value)
 
     async def hgetall(self, key):
-        return await self.client.hgetall(self.prefix_key + key)
+        return await self._read(key, "hgetall")
+
+    async def hdel(self, key, *hash_keys):
+        return await self._write(key, "hdel", *hash_keys)
+
+    async def hmget(self, key, hash_keys):
+        return await self._read(key, "hmget", hash_keys)
+
+    async def hscan(self, key, cursor=0, count=100):
+        # scan cursors are only meaningful on the node that issued them, so scans stay on the primary
+        return await self._timed(PRIMARY_ENDPOINT, self.client, "hscan", self.prefix_key + key, cursor, None, count)
+
+    async def hset_mapping(self, key, mapping, ttl=None):
+        full_key = self.prefix_key + key
+        result = await self._timed(PRIMARY_ENDPOINT, self, "_execute_hset_mapping", full_key, mapping, ttl)
+        if self.replica_clients:
+            self._track_write(full_key)
+        return result
+
+    async def hset_existing(self, key, mapping, ttl=None):
+        full_key = self.prefix_key + key
+        args = [int(ttl or 0)]
+        for hash_key, value in mapping.items():
+            args.extend((hash_key, value))
+        result = await self._timed(PRIMARY_ENDPOINT, self.client, "eval", HSET_EXISTING_SCRIPT, 1, full_key, *args)
+        if self.replica_clients:
+            self._track_write(full_key)
+        return bool(result)
+
+    def get_latency_stats(self) -> dict:
+        stats = {name: tracker.snapshot() for name, tracker in self._latency.items()}
+        stats["hedging"] = dict(self.hedge_stats)
+        return stats
+
+    async def _execute_hset_mapping(self, full_key, mapping, ttl):
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.hset(full_key, mapping=mapping)
+        if ttl:
+            pipeline.expire(full_key, ttl)
+        results = await pipeline.execute()
+        return results[0]
+
+    async def _execute_get_expire(self, full_key, ttl):
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.get(full_key)
+        pipeline.expire(full_key, ttl)
+        results = await pipeline.execute()
+        return results[0]
+
+    async def _write(self, key, command, *args):
+        full_key = self.prefix_key + key
+        result = await self._timed(PRIMARY_ENDPOINT, self.client, command, full_key, *args)
+        if self.replica_clients:
+            self._track_write(full_key)
+        return result
+
+    async def _read(self, key, command, *args):
+        full_key = self.prefix_key + key
+        if not self.replica_clients:
+            return await self._timed(PRIMARY_ENDPOINT, self.client, command, full_key, *args)
+
+        if self._recently_written(full_key):
+            self.hedge_stats["read_your_writes"] += 1
+            return await self._timed(PRIMARY_ENDPOINT, self.client, command, full_key, *args)
+
+        name, replica = self._next_replica()
+        if self.hedged_reads:
+            return await self._hedged_read(name, replica, command, full_key, *args)
+        try:
+            return await self._timed(name, replica, command, full_key, *args)
+        except Exception:
+            self.hedge_stats["replica_fallbacks"] += 1
+            return await self._timed(PRIMARY_ENDPOINT, self.client, command, full_key, *args)
+
+    async def _hedged_read(self, name, replica, command, full_key, *args):
+        tracker = self._latency[name]
+        deadline = tracker.percentile(95) if tracker.sample_size >= MIN_HEDGE_SAMPLES else None
+        replica_task = asyncio.ensure_future(self._timed(name, replica, command, full_key, *args))
+        primary_task = None
+        try:
+            done, _ = await asyncio.wait({replica_task}, timeout=deadline)
+            if done and not replica_task.exception():
+                return replica_task.result()
+
+            self.hedge_stats["hedged"] += 1
+            primary_task = asyncio.ensure_future(
+                self._timed(PRIMARY_ENDPOINT, self.client, command, full_key, *args))
+            pending = {primary_task} if done else {replica_task, primary_task}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is primary_task:
+                            self.hedge_stats["primary_won"] += 1
+                        for other in pending:
+                            other.cancel()
+                        return task.result()
+            return primary_task.result()
+        except asyncio.CancelledError:
+            for task in (replica_task, primary_task):
+                if task is not None:
+                    task.cancel()
+            raise
+
+    async def _timed(self, name, client, command, *args):
+        tracker = self._latency[name]
+        start = time.perf_counter()
+        try:
+            result = await getattr(client, command)(*args)
+        except asyncio.CancelledError:
+            tracker.record_cancelled(time.perf_counter() - start)
+            raise
+        except Exception:
+            tracker.record_error()
+            raise
+        tracker.record(time.perf_counter() - start)
+        return result
+
+    def _next_replica(self):
+        index = self._replica_index % len(self.replica_clients)
+        self._replica_index = index + 1
+        return self._endpoint_names[index], self.replica_clients[index]
+
+    def _track_write(self, full_key) -> None:
+        now = time.monotonic()
+        self._recent_writes.pop(full_key, None)
+        self._recent_writes[full_key] = now + self.read_your_writes_window
+        while self._recent_writes:
+            oldest_key, expires_at = next(iter(self._recent_writes.items()))
+            if expires_at > now and len(self._recent_writes) <= self.max_tracked_writes:
+                break
+            self._recent_writes.popitem(last=False)
+
+    def _recently_written(self, full_key) -> bool:
+        expires_at = self._recent_writes.get(full_key)
+        return expires_at is not None and expires_at > time.monotonic()
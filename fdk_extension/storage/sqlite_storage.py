@@ -0,0 +1,315 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import sqlite3
+import threading
+import time
+
+from .base_storage import BaseStorage
+from ..utilities.logger import get_logger
+
+logger = get_logger()
+
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB, expires_at REAL)",
+    "CREATE TABLE IF NOT EXISTS hash_kv (key TEXT, field TEXT, value BLOB, expires_at REAL, PRIMARY KEY (key, field))",
+    "CREATE INDEX IF NOT EXISTS kv_expires_at ON kv (expires_at) WHERE expires_at IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS hash_kv_expires_at ON hash_kv (expires_at) WHERE expires_at IS NOT NULL"
+)
+
+
+class SQLiteStorage(BaseStorage):
+    """Embedded storage for single node deployments.
+
+    Data lives in a local SQLite file opened in WAL mode with memory mapped reads, so it
+    survives restarts without running Redis. All SQLite calls run on a dedicated thread
+    pool and never block the event loop.
+    """
+
+    def __init__(self, db_path: str, prefix_key: str="", max_workers: int=4,
+                 mmap_size: int=256 * 1024 * 1024, compaction_batch_size: int=1000):
+        super().__init__(prefix_key)
+        self.db_path = db_path
+        self.mmap_size = mmap_size
+        self.compaction_batch_size = compaction_batch_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fdk-sqlite")
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._compaction_task: asyncio.Task = None
+        self._run_sync(self._create_schema)
+
+    async def get(self, key):
+        return await self._run(self._get, self.prefix_key + key)
+
+    async def set(self, key, value):
+        return await self._run(self._set, self.prefix_key + key, value, None)
+
+    async def delete(self, key):
+        return await self._run(self._delete, self.prefix_key + key)
+
+    async def unlink(self, *keys):
+        return await self._run(self._unlink, [self.prefix_key + key for key in keys])
+
+    async def setex(self, key, ttl, value):
+        return await self._run(self._set, self.prefix_key + key, value, time.time() + ttl)
+
+    async def setex_extend(self, key, ttl, value):
+        return await self._run(self._setex_extend, self.prefix_key + key, ttl, value)
+
+    async def expire(self, key, ttl):
+        return await self._run(self._expire, self.prefix_key + key, ttl)
+
+    async def extend_expire(self, key, ttl):
+        return await self._run(self._extend_expire, self.prefix_key + key, ttl)
+
+    async def getex(self, key, ttl):
+        return await self._run(self._getex, self.prefix_key + key, ttl)
+
+    async def hget(self, key, hash_key):
+        return await self._run(self._hget, self.prefix_key + key, hash_key)
+
+    async def hset(self, key, hash_key, value):
+        return await self._run(self._hset, self.prefix_key + key, hash_key, value)
+
+    async def hgetall(self, key):
+        return await self._run(self._hgetall, self.prefix_key + key)
+
+    async def hdel(self, key, *hash_keys):
+        return await self._run(self._hdel, self.prefix_key + key, list(hash_keys))
+
+    async def hmget(self, key, hash_keys):
+        return await self._run(self._hmget, self.prefix_key + key, list(hash_keys))
+
+    async def hscan(self, key, cursor=0, count=100):
+        return await self._run(self._hscan, self.prefix_key + key, cursor, count)
+
+    async def hset_mapping(self, key, mapping, ttl=None):
+        return await self._run(self._hset_mapping, self.prefix_key + key, dict(mapping), ttl)
+
+    async def hset_existing(self, key, mapping, ttl=None):
+        return await self._run(self._hset_existing, self.prefix_key + key, mapping, ttl)
+
+    async def compact(self) -> int:
+        """Delete expired keys of this storage's prefix. Returns number of removed rows."""
+        return await self._run(self._compact)
+
+    def start_compaction(self, interval: float=60) -> asyncio.Task:
+        """Run `compact` every `interval` seconds on the running event loop."""
+        async def compaction_loop():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    removed = await self.compact()
+                    logger.debug(f"SQLite storage compaction removed {removed} expired rows")
+                except Exception as e:
+                    logger.exception(e)
+
+        if not self._compaction_task or self._compaction_task.done():
+            self._compaction_task = asyncio.ensure_future(compaction_loop())
+        return self._compaction_task
+
+    async def close(self) -> None:
+        if self._compaction_task:
+            self._compaction_task.cancel()
+        self._executor.shutdown(wait=True)
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _run_sync(self, func, *args):
+        return self._executor.submit(func, *args).result()
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, isolation_level=None, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _create_schema(self):
+        for statement in SCHEMA:
+            self._connection.execute(statement)
+
+    def _get(self, key):
+        row = self._connection.execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key, value, expires_at):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)", (key, value, expires_at))
+        return True
+
+    def _delete(self, key):
+        with self._transaction() as connection:
+            deleted = connection.execute("DELETE FROM kv WHERE key = ?", (key,)).rowcount
+            deleted += connection.execute("DELETE FROM hash_kv WHERE key = ?", (key,)).rowcount
+        return 1 if deleted else 0
+
+    def _unlink(self, keys):
+        deleted = 0
+        with self._transaction() as connection:
+            for key in keys:
+                rows = connection.execute("DELETE FROM kv WHERE key = ?", (key,)).rowcount
+                rows += connection.execute("DELETE FROM hash_kv WHERE key = ?", (key,)).rowcount
+                deleted += 1 if rows else 0
+        return deleted
+
+    def _setex_extend(self, key, ttl, value):
+        now = time.time()
+        with self._transaction() as connection:
+            row = connection.execute("SELECT expires_at FROM kv WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+            expires_at = max(now + ttl, row[0]) if row else now + ttl
+            connection.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                               (key, value, expires_at))
+
+    def _expire(self, key, ttl):
+        now = time.time()
+        with self._transaction() as connection:
+            updated = connection.execute(
+                "UPDATE kv SET expires_at = ? WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (now + ttl, key, now)).rowcount
+            updated += connection.execute(
+                "UPDATE hash_kv SET expires_at = ? WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (now + ttl, key, now)).rowcount
+        return updated > 0
+
+    def _extend_expire(self, key, ttl):
+        now = time.time()
+        with self._transaction() as connection:
+            updated = 0
+            for table in ("kv", "hash_kv"):
+                updated += connection.execute(
+                    f"UPDATE {table} SET expires_at = ? WHERE key = ? "
+                    f"AND (expires_at IS NULL OR (expires_at > ? AND expires_at < ?))",
+                    (now + ttl, key, now, now + ttl)).rowcount
+        return updated > 0
+
+    def _getex(self, key, ttl):
+        now = time.time()
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, now)).fetchone()
+            if row:
+                connection.execute("UPDATE kv SET expires_at = ? WHERE key = ?", (now + ttl, key))
+        return row[0] if row else None
+
+    def _hget(self, key, hash_key):
+        row = self._connection.execute(
+            "SELECT value FROM hash_kv WHERE key = ? AND field = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, hash_key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def _hset(self, key, hash_key, value):
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM hash_kv WHERE key = ? AND expires_at <= ?", (key, now))
+            row = connection.execute("SELECT expires_at FROM hash_kv WHERE key = ? LIMIT 1", (key,)).fetchone()
+            existing = connection.execute(
+                "SELECT 1 FROM hash_kv WHERE key = ? AND field = ?", (key, hash_key)).fetchone()
+            connection.execute(
+                "INSERT OR REPLACE INTO hash_kv (key, field, value, expires_at) VALUES (?, ?, ?, ?)",
+                (key, hash_key, value, row[0] if row else None))
+        return 0 if existing else 1
+
+    def _hgetall(self, key):
+        rows = self._connection.execute(
+            "SELECT field, value FROM hash_kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())).fetchall()
+        return dict(rows)
+
+    def _hdel(self, key, hash_keys):
+        now = time.time()
+        with self._transaction() as connection:
+            return sum(connection.execute(
+                "DELETE FROM hash_kv WHERE key = ? AND field = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, hash_key, now)).rowcount for hash_key in hash_keys)
+
+    def _hmget(self, key, hash_keys):
+        placeholders = ", ".join("?" for _ in hash_keys)
+        rows = self._connection.execute(
+            f"SELECT field, value FROM hash_kv WHERE key = ? AND field IN ({placeholders}) "
+            f"AND (expires_at IS NULL OR expires_at > ?)",
+            (key, *hash_keys, time.time())).fetchall()
+        values = dict(rows)
+        return [values.get(hash_key) for hash_key in hash_keys]
+
+    def _hscan(self, key, cursor, count):
+        # cursor is the last field returned, pages follow the primary key order
+        rows = self._connection.execute(
+            "SELECT field, value FROM hash_kv WHERE key = ? AND field > ? AND (expires_at IS NULL OR expires_at > ?) "
+            "ORDER BY field LIMIT ?", (key, "" if cursor == 0 else cursor, time.time(), count)).fetchall()
+        next_cursor = rows[-1][0] if len(rows) == count else 0
+        return next_cursor, dict(rows)
+
+    def _hset_mapping(self, key, mapping, ttl):
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM hash_kv WHERE key = ? AND expires_at <= ?", (key, now))
+            if ttl:
+                expires_at = now + ttl
+                connection.execute("UPDATE hash_kv SET expires_at = ? WHERE key = ?", (expires_at, key))
+            else:
+                row = connection.execute("SELECT expires_at FROM hash_kv WHERE key = ? LIMIT 1", (key,)).fetchone()
+                expires_at = row[0] if row else None
+            connection.executemany(
+                "INSERT OR REPLACE INTO hash_kv (key, field, value, expires_at) VALUES (?, ?, ?, ?)",
+                [(key, hash_key, value, expires_at) for hash_key, value in mapping.items()])
+        return len(mapping)
+
+    def _hset_existing(self, key, mapping, ttl):
+        now = time.time()
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT expires_at FROM hash_kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?) LIMIT 1",
+                (key, now)).fetchone()
+            if not row:
+                return False
+            expires_at = now + ttl if ttl else row[0]
+            if ttl:
+                connection.execute("UPDATE hash_kv SET expires_at = ? WHERE key = ?", (expires_at, key))
+            connection.executemany(
+                "INSERT OR REPLACE INTO hash_kv (key, field, value, expires_at) VALUES (?, ?, ?, ?)",
+                [(key, hash_key, value, expires_at) for hash_key, value in mapping.items()])
+        return True
+
+    def _compact(self):
+        now = time.time()
+        pattern = self.prefix_key.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        removed = 0
+        for table in ("kv", "hash_kv"):
+            while True:
+                with self._transaction() as connection:
+                    deleted = connection.execute(
+                        f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} "
+                        f"WHERE expires_at <= ? AND key LIKE ? ESCAPE '\\' LIMIT ?)",
+                        (now, pattern, self.compaction_batch_size)).rowcount
+                removed += deleted
+                if deleted < self.compaction_batch_size:
+                    break
+        self._connection.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        return removed
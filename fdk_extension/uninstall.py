@@ -0,0 +1,140 @@
+"""Cleanup of company data when the extension is uninstalled."""
+import asyncio
+import json
+from typing import Text
+
+from sanic.request import Request
+
+from .extension import extension
+from .install_index import InstallIndex
+from .session.session import Session
+from .session.session_storage import SessionStorage
+from .session.unit_of_work import SessionUnitOfWork
+from .storage.redis_storage import RedisStorage
+from .utilities.logger import get_logger
+from .utilities.loop_watchdog import watch_step
+
+logger = get_logger()
+
+
+UNINSTALL_CHANNEL = "fdk_uninstall"
+UNLINK_BATCH_SIZE = 100
+
+# keeps background uninstall tasks referenced until they finish
+_background_tasks = set()
+_listener_task: asyncio.Task = None
+
+
+async def cleanup_company(company_id) -> int:
+    """Delete every library owned key of the company in batches and evict its cached data on all workers.
+
+    Returns the number of deleted keys.
+    """
+    offline_session_id = Session.generate_session_id(False, **{
+        "cluster": extension.cluster,
+        "company_id": company_id
+    })
+    keys = [offline_session_id]
+    if extension.rate_limiter:
+        keys.extend(extension.rate_limiter.get_company_keys(company_id))
+
+    deleted = 0
+    company_sessions_key = SessionStorage.get_company_sessions_key(company_id)
+    cursor = 0
+    while True:
+        cursor, page = await extension.storage.hscan(company_sessions_key, cursor, UNLINK_BATCH_SIZE)
+        keys.extend(session_id.decode() if isinstance(session_id, bytes) else session_id for session_id in page or {})
+        while len(keys) >= UNLINK_BATCH_SIZE:
+            deleted += await extension.storage.unlink(*keys[:UNLINK_BATCH_SIZE])
+            keys = keys[UNLINK_BATCH_SIZE:]
+        if cursor == 0 or cursor == b"0":
+            break
+    keys.append(company_sessions_key)
+    deleted += await extension.storage.unlink(*keys)
+    if extension.session_revocation_list:
+        # stateless sessions are not in storage, reject the tokens sealed before the uninstall instead
+        await extension.session_revocation_list.revoke_company(extension.storage, company_id)
+    await InstallIndex.remove(company_id)
+
+    evict_company(company_id)
+    await publish_uninstall(company_id)
+    logger.debug(f"Removed {deleted} keys of uninstalled company {company_id}")
+    return deleted
+
+
+def evict_company(company_id) -> None:
+    """Drop in-process data of the company held by this worker."""
+    if extension.response_cache:
+        extension.response_cache.invalidate(company_id)
+    if extension.rate_limiter:
+        extension.rate_limiter.forget_company(company_id)
+    if extension.session_revocation_list:
+        extension.session_revocation_list.invalidate()
+
+
+def get_uninstall_channel() -> Text:
+    return f"{extension.storage.prefix_key}{UNINSTALL_CHANNEL}"
+
+
+async def publish_uninstall(company_id) -> None:
+    # other workers evict their in-process data when they receive the message
+    if isinstance(extension.storage, RedisStorage):
+        await extension.storage.client.publish(get_uninstall_channel(), json.dumps({"company_id": company_id}))
+
+
+async def run_uninstall(request: Request, company_id) -> None:
+    # the request's unit of work is already committed, writes of the callback go to storage directly
+    SessionUnitOfWork.end()
+    try:
+        with extension.tracer.span("fdk.uninstall.cleanup"):
+            await cleanup_company(company_id)
+    except Exception as e:
+        logger.exception(f"Uninstall cleanup failed for company {company_id}: {e}")
+
+    try:
+        with extension.tracer.span("fdk.callback.uninstall"):
+            await asyncio.wait_for(watch_step("callback:uninstall", extension.callbacks["uninstall"](request)),
+                                   extension.uninstall_callback_timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"Uninstall callback timed out after {extension.uninstall_callback_timeout}s "
+                     f"for company {company_id}")
+    except Exception as e:
+        logger.exception(f"Uninstall callback failed for company {company_id}: {e}")
+
+
+def schedule_uninstall(request: Request, company_id) -> asyncio.Task:
+    """Run cleanup and the uninstall callback in the background."""
+    task = asyncio.ensure_future(run_uninstall(request, company_id))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def uninstall_listener_on_start(app, loop) -> None:
+    global _listener_task
+    if isinstance(extension.storage, RedisStorage) and _listener_task is None:
+        _listener_task = asyncio.ensure_future(_listen_uninstall())
+
+
+async def uninstall_listener_on_stop(app, loop) -> None:
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        _listener_task = None
+
+
+async def _listen_uninstall() -> None:
+    while True:
+        pubsub = extension.storage.client.pubsub()
+        try:
+            await pubsub.subscribe(get_uninstall_channel())
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    evict_company(json.loads(message["data"])["company_id"])
+        except asyncio.CancelledError:
+            await pubsub.close()
+            raise
+        except Exception as e:
+            logger.exception(f"Uninstall listener failed, resubscribing: {e}")
+            await pubsub.close()
+            await asyncio.sleep(1)
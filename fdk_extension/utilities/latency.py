@@ -0,0 +1,56 @@
+"""Latency tracking utility."""
+from collections import deque
+import math
+
+
+class LatencyTracker:
+    """Keeps a rolling window of latency samples (in seconds) for one endpoint."""
+
+    def __init__(self, window_size: int=1024, refresh_every: int=64):
+        self._samples: deque = deque(maxlen=window_size)
+        self._refresh_every = refresh_every
+        self._since_refresh = 0
+        self._sorted: list = []
+        self.count: int = 0
+        self.errors: int = 0
+        self.cancelled: int = 0
+
+    def record(self, latency: float) -> None:
+        self._samples.append(latency)
+        self.count += 1
+        self._since_refresh += 1
+        if self._since_refresh >= self._refresh_every or len(self._sorted) < self._refresh_every:
+            self._refresh()
+
+    def record_error(self) -> None:
+        self.errors += 1
+
+    def record_cancelled(self, elapsed: float) -> None:
+        """Record a call cancelled after `elapsed` seconds. Its latency was at least that, so it stays in the
+        samples, otherwise dropping the slowest calls would pull the percentiles down."""
+        self.cancelled += 1
+        self.record(elapsed)
+
+    def _refresh(self) -> None:
+        self._sorted = sorted(self._samples)
+        self._since_refresh = 0
+
+    def percentile(self, percent: float):
+        if not self._sorted:
+            return None
+        index = min(len(self._sorted) - 1, max(0, math.ceil(percent / 100 * len(self._sorted)) - 1))
+        return self._sorted[index]
+
+    @property
+    def sample_size(self) -> int:
+        return len(self._samples)
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99)
+        }
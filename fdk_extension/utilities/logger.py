@@ -2,40 +2,129 @@
 __credit__ = "https://docs.python.org/3/howto/logging-cookbook.html#" \
              "adding-contextual-information-to-your-logging-output"
 
+import logging
+import re
+import time
+from typing import Text, Union
+
 import structlog
 from structlog import contextvars
 from structlog.stdlib import BoundLogger
+import ujson
 
 
-def get_logger(*args, **kwargs) -> BoundLogger:
-    """Create structlog logger for logging."""
+LOG_FORMAT_CONSOLE = "console"
+LOG_FORMAT_JSON = "json"
+
+# field names whose values are never written to logs
+REDACTED_KEYS = re.compile(r"secret|token|password|authorization|cookie|signature", re.IGNORECASE)
+REDACTED_VALUE = "[REDACTED]"
+
+_configured_level: int = None
+
+
+class LogRateLimiter:
+    """structlog processor dropping lines past `limit` per `interval` seconds.
+
+    Only lines logged with a `log_key` keyword are limited, each key separately. The first line after
+    a dropped run carries the number of dropped lines as `suppressed`.
+    """
+
+    def __init__(self, limit: int=100, interval: float=1.0):
+        self.limit = limit
+        self.interval = interval
+        self._windows: dict = {}
+
+    def __call__(self, logger, method_name, event_dict: dict) -> dict:
+        key = event_dict.pop("log_key", None)
+        if key is None or not self.limit:
+            return event_dict
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self.interval:
+            suppressed = window[2] if window else 0
+            window = self._windows[key] = [now, 0, 0]
+            if suppressed:
+                event_dict["suppressed"] = suppressed
+        window[1] += 1
+        if window[1] > self.limit:
+            window[2] += 1
+            raise structlog.DropEvent
+        return event_dict
 
-    renderer = structlog.dev.ConsoleRenderer()
+
+def configure_logging(log_format: Text=LOG_FORMAT_CONSOLE, level: Union[int, Text]=logging.DEBUG,
+                      rate_limit: int=100, rate_limit_interval: float=1.0) -> None:
+    """Configure the library loggers. Call it before the first line is logged, loggers keep the
+    configuration they were first used with."""
+    global _configured_level
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    if log_format == LOG_FORMAT_JSON:
+        renderer = structlog.processors.JSONRenderer(serializer=ujson.dumps)
+    else:
+        renderer = structlog.dev.ConsoleRenderer()
 
     structlog.configure(
         processors=[
+            LogRateLimiter(rate_limit, rate_limit_interval),
             contextvars.merge_contextvars,
+            structlog.processors.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso"),
             structlog.processors.StackInfoRenderer(),
             structlog.processors.format_exc_info,
             renderer
         ],
-        wrapper_class=structlog.stdlib.BoundLogger,
-        context_class=structlog.threadlocal.wrap_dict(dict),
+        wrapper_class=structlog.make_filtering_bound_logger(level),
+        context_class=dict,
         cache_logger_on_first_use=True,
     )
+    _configured_level = level
+
 
+def get_logger(*args, **kwargs) -> BoundLogger:
+    """Create structlog logger for logging."""
+    if _configured_level is None:
+        configure_logging()
     return structlog.get_logger(**kwargs)
 
 
-def safe_stringify(obj: object, cache: list=[]) -> dict:
-    if hasattr(obj, "__dict__"):
-        cache.append(obj)
-        temp: dict = obj.__dict__.copy()
-        for key, value in temp.items():
-            if hasattr(value, "__dict__"):
-                if value not in cache:
-                    temp[key] = safe_stringify(value, cache)
-                else:
-                    temp[key] = ""
-        return temp
-    return obj
\ No newline at end of file
+def is_debug_enabled() -> bool:
+    """Check before building costly debug messages."""
+    return _configured_level is not None and _configured_level <= logging.DEBUG
+
+
+def safe_stringify(obj: object, max_depth: int=4, max_items: int=50, max_length: int=256, _seen: set=None):
+    """Copy an object into plain data for logging.
+
+    Values of secret looking keys are redacted, nesting, collection sizes and string lengths are bounded.
+    """
+    if isinstance(obj, str):
+        return obj if len(obj) <= max_length else f"{obj[:max_length]}...({len(obj)} chars)"
+    if obj is None or isinstance(obj, (bool, int, float)):
+        return obj
+
+    _seen = _seen or set()
+    if id(obj) in _seen or max_depth <= 0:
+        return f"<{obj.__class__.__name__}>"
+    _seen = _seen | {id(obj)}
+
+    if hasattr(obj, "__dict__") and not isinstance(obj, dict):
+        obj = vars(obj)
+    if isinstance(obj, dict):
+        result = {}
+        for index, (key, value) in enumerate(obj.items()):
+            if index >= max_items:
+                result["..."] = f"{len(obj) - max_items} more"
+                break
+            key = str(key)
+            result[key] = REDACTED_VALUE if REDACTED_KEYS.search(key) \
+                else safe_stringify(value, max_depth - 1, max_items, max_length, _seen)
+        return result
+    if isinstance(obj, (list, tuple, set)):
+        items = [safe_stringify(value, max_depth - 1, max_items, max_length, _seen)
+                 for value in list(obj)[:max_items]]
+        if len(obj) > max_items:
+            items.append(f"...{len(obj) - max_items} more")
+        return items
+    return safe_stringify(repr(obj), max_depth, max_items, max_length, _seen)
@@ -0,0 +1,163 @@
+"""Detection of event loop stalls caused by blocking code in handlers and callbacks."""
+import asyncio
+from collections import deque
+import sys
+import threading
+import time
+import traceback
+from typing import Awaitable, Dict, List, Optional, Text
+
+from .logger import get_logger
+from .metrics import Metrics
+
+logger = get_logger()
+
+
+STALL_METRIC = "fdk_loop_stalls_total"
+STALL_DURATION_METRIC = "fdk_loop_stall_duration_seconds"
+LAG_METRIC = "fdk_loop_lag_seconds"
+
+# step label of stalls outside any watched step
+UNKNOWN_STEP = "unknown"
+
+_running_watchdogs: int = 0
+
+
+async def _watched_step(step_label: Text, awaitable: Awaitable):
+    # this frame is on the loop thread's stack while the step runs, stack samples look for it
+    return await awaitable
+
+
+def watch_step(label: Text, awaitable: Awaitable) -> Awaitable:
+    """Attribute loop stalls while `awaitable` runs to `label`. Returns `awaitable` as is when no watchdog runs."""
+    return _watched_step(label, awaitable) if _running_watchdogs else awaitable
+
+
+class LoopStall:
+
+    def __init__(self, duration: float, steps: List[Text], stack: List[Text], detected_at: float):
+        self.duration = duration
+        self.steps = steps
+        self.stack = stack
+        self.detected_at = detected_at
+
+    @property
+    def step(self) -> Text:
+        return self.steps[-1] if self.steps else UNKNOWN_STEP
+
+    def to_dict(self) -> dict:
+        return {"duration": round(self.duration, 4), "step": self.step, "steps": self.steps, "stack": self.stack,
+                "detected_at": self.detected_at}
+
+
+class LoopWatchdog:
+    """Measures event loop lag and reports stalls longer than `threshold` seconds.
+
+    A heartbeat task on the loop records when it last ran. A monitor thread samples the loop thread's stack
+    while a heartbeat is late, and the stall is attributed to the innermost step watched with `watch_step`.
+    `step_thresholds` raises the threshold of steps whose label starts with a key, like `callback:uninstall`.
+    Warnings are logged at most once per `warning_interval` seconds per step.
+    """
+
+    def __init__(self, threshold: float=0.1, step_thresholds: Dict[Text, float]=None, stack_limit: int=20,
+                 warning_interval: float=60.0, max_stalls: int=100):
+        self.threshold = threshold
+        self.step_thresholds = dict(step_thresholds or {})
+        self.interval = threshold / 2
+        self.stack_limit = stack_limit
+        self.warning_interval = warning_interval
+        self.metrics: Metrics = Metrics()
+        self.stalls: deque = deque(maxlen=max_stalls)
+        self.stats = {"stalls": 0, "max_lag": 0.0}
+        self._loop: asyncio.AbstractEventLoop = None
+        self._loop_thread_id: int = None
+        self._heartbeat_task: asyncio.Task = None
+        self._monitor_thread: threading.Thread = None
+        self._stopped = threading.Event()
+        self._last_beat: float = 0.0
+        self._sample: Optional[tuple] = None
+        self._last_warnings: Dict[Text, float] = {}
+
+    @property
+    def is_running(self) -> bool:
+        return self._heartbeat_task is not None
+
+    def start(self, metrics: Metrics=None) -> None:
+        """Start watching the running loop. Call it from the loop."""
+        global _running_watchdogs
+        if self.is_running:
+            return
+        self.metrics = metrics or self.metrics
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat_task = self._loop.create_task(self._heartbeat())
+        self._monitor_thread = threading.Thread(target=self._monitor, name="fdk-loop-watchdog", daemon=True)
+        self._monitor_thread.start()
+        _running_watchdogs += 1
+
+    def stop(self) -> None:
+        global _running_watchdogs
+        if not self.is_running:
+            return
+        self._stopped.set()
+        self._heartbeat_task.cancel()
+        self._heartbeat_task = None
+        _running_watchdogs -= 1
+
+    def get_stalls(self) -> List[dict]:
+        return [stall.to_dict() for stall in self.stalls]
+
+    def get_threshold(self, step: Text) -> float:
+        thresholds = [threshold for prefix, threshold in self.step_thresholds.items() if step.startswith(prefix)]
+        return max(thresholds) if thresholds else self.threshold
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            lag = max(now - expected, 0.0)
+            self.metrics.observe(LAG_METRIC, lag)
+            self.stats["max_lag"] = max(self.stats["max_lag"], lag)
+            sample, self._sample = self._sample, None
+            if lag >= self.threshold:
+                self._report(lag, sample)
+
+    def _monitor(self) -> None:
+        sampled_beat = None
+        while not self._stopped.wait(self.interval):
+            last_beat = self._last_beat
+            if last_beat != sampled_beat and time.monotonic() - last_beat >= self.threshold + self.interval:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._sample = (self._get_steps(frame), traceback.format_stack(frame, self.stack_limit))
+                    sampled_beat = last_beat
+                del frame
+
+    @staticmethod
+    def _get_steps(frame) -> List[Text]:
+        steps = []
+        while frame is not None:
+            if frame.f_code is _watched_step.__code__:
+                steps.append(frame.f_locals.get("step_label"))
+            frame = frame.f_back
+        return steps[::-1]
+
+    def _report(self, lag: float, sample: Optional[tuple]) -> None:
+        steps, stack = sample or ([], [])
+        stall = LoopStall(lag, steps, stack, time.time())
+        if lag < self.get_threshold(stall.step):
+            return
+        self.stalls.append(stall)
+        self.stats["stalls"] += 1
+        self.metrics.increment(STALL_METRIC, labels={"step": stall.step})
+        self.metrics.observe(STALL_DURATION_METRIC, lag, {"step": stall.step})
+
+        now = time.monotonic()
+        if now - self._last_warnings.get(stall.step, -self.warning_interval) >= self.warning_interval:
+            self._last_warnings[stall.step] = now
+            logger.warning(f"Event loop blocked for {lag:.3f}s in {' > '.join(steps) or UNKNOWN_STEP}",
+                           stack="".join(stack) or None)
@@ -0,0 +1,51 @@
+"""Bounded in-process cache."""
+from collections import OrderedDict
+import time
+
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Size bounded LRU cache with an optional per entry ttl in seconds. Not thread safe."""
+
+    def __init__(self, max_size: int=1000, ttl: float=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self.evictions: int = 0
+
+    def get(self, key, default=None):
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float=None) -> None:
+        ttl = ttl if ttl is not None else self.ttl
+        self._data[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def keys(self) -> list:
+        return list(self._data.keys())
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
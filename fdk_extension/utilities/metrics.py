@@ -0,0 +1,114 @@
+"""Metrics collected by the library."""
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+import time
+from typing import Dict, Text, Tuple
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# label values used once a metric has reached its label set limit
+OVERFLOW_LABEL_VALUE = "_overflow_"
+
+
+class Metrics:
+    """Metrics backend interface. The default implementation drops everything.
+
+    Subclass it to forward metrics to statsd, OpenTelemetry or any other client.
+    """
+
+    def increment(self, name: Text, value: float=1, labels: Dict[Text, Text]=None) -> None:
+        pass
+
+    def observe(self, name: Text, value: float, labels: Dict[Text, Text]=None) -> None:
+        pass
+
+    def set_gauge(self, name: Text, value: float, labels: Dict[Text, Text]=None) -> None:
+        pass
+
+    @contextmanager
+    def timer(self, name: Text, labels: Dict[Text, Text]=None):
+        """Observe the duration of the block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+
+
+class PrometheusMetrics(Metrics):
+    """Keeps metrics in process and renders them in the Prometheus text format.
+
+    Each metric keeps at most `max_label_sets` label combinations, later combinations are merged into
+    one series whose label values are `_overflow_`.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...]=DEFAULT_BUCKETS, max_label_sets: int=1000):
+        self.buckets = tuple(sorted(buckets))
+        self.max_label_sets = max_label_sets
+        self._counters: dict = defaultdict(dict)
+        self._gauges: dict = defaultdict(dict)
+        self._histograms: dict = defaultdict(dict)
+
+    def increment(self, name, value=1, labels=None):
+        series = self._counters[name]
+        key = self.__series_key(series, labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, labels=None):
+        series = self._histograms[name]
+        key = self.__series_key(series, labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            histogram["buckets"][index] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+    def set_gauge(self, name, value, labels=None):
+        series = self._gauges[name]
+        series[self.__series_key(series, labels)] = value
+
+    def __series_key(self, series: dict, labels: dict) -> tuple:
+        key = tuple(sorted((labels or {}).items()))
+        if key in series or len(series) < self.max_label_sets:
+            return key
+        return tuple((name, OVERFLOW_LABEL_VALUE) for name, _ in key)
+
+    def render(self) -> Text:
+        lines = []
+        for metric_type, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+            for name, series in sorted(metrics.items()):
+                lines.append(f"# TYPE {name} {metric_type}")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+        for name, series in sorted(self._histograms.items()):
+            lines.append(f"# TYPE {name} histogram")
+            for key, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram["buckets"]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {histogram['count']}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(histogram['sum'])}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(key: tuple) -> Text:
+    if not key:
+        return ""
+    labels = ",".join(f'{name}="{_escape(value)}"' for name, value in key)
+    return "{" + labels + "}"
+
+
+def _escape(value) -> Text:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> Text:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
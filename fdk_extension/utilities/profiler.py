@@ -0,0 +1,122 @@
+"""Sampling profiler for live workers."""
+import asyncio
+from collections import Counter
+import math
+import sys
+import threading
+import time
+from typing import Text
+
+from ..exceptions import FdkProfilerBusy
+
+# frames of these modules are tagged in profiles, first matching prefix wins
+FRAME_TAGS = (
+    ("fdk_extension.storage", "storage"),
+    ("fdk_extension.session", "session"),
+    ("fdk_client.platform.OAuthClient", "oauth"),
+    ("fdk_extension.webhook", "webhook"),
+    ("fdk_extension", "fdk"),
+)
+
+MIN_INTERVAL_IN_SECONDS = 0.001
+
+# stacks beyond this count are merged into one truncated stack
+MAX_DISTINCT_STACKS = 10000
+TRUNCATED_STACK = "[truncated]"
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads of the worker from a background thread.
+
+    Profiles are capped at `max_duration` seconds and one runs at a time. The sampler keeps its own cpu
+    share under `max_overhead` by widening the interval when sampling gets expensive.
+    """
+
+    def __init__(self, interval: float=0.01, max_duration: float=30.0, max_overhead: float=0.05,
+                 max_depth: int=64):
+        self.interval = max(interval, MIN_INTERVAL_IN_SECONDS)
+        self.max_duration = max_duration
+        self.max_overhead = max_overhead
+        self.max_depth = max_depth
+        self._running = False
+
+    async def profile(self, seconds: float) -> dict:
+        """Profile the worker for `seconds`, bounded by `max_duration`, without blocking the event loop."""
+        if not math.isfinite(float(seconds)):
+            raise ValueError(f"Invalid profile duration. Invalid value: {seconds}")
+        if self._running:
+            raise FdkProfilerBusy("A profile is already running in this worker")
+        self._running = True
+        try:
+            seconds = min(max(float(seconds), 0.0), self.max_duration)
+            stopped = threading.Event()
+            result = {}
+            sampler = threading.Thread(target=self._sample, args=(stopped, result), name="fdk-profiler", daemon=True)
+            sampler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                stopped.set()
+                await asyncio.get_running_loop().run_in_executor(None, sampler.join)
+            return dict(result, duration=seconds)
+        finally:
+            self._running = False
+
+    def _sample(self, stopped: threading.Event, result: dict) -> None:
+        stacks = Counter()
+        interval = self.interval
+        samples = 0
+        sampling_time = 0.0
+        started = time.perf_counter()
+        own_thread_id = threading.get_ident()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        while not stopped.wait(interval):
+            sample_start = time.perf_counter()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread_id:
+                    continue
+                if thread_id not in thread_names:
+                    thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack = self._format_stack(frame, thread_names.get(thread_id, str(thread_id)))
+                if stack in stacks or len(stacks) < MAX_DISTINCT_STACKS:
+                    stacks[stack] += 1
+                else:
+                    stacks[TRUNCATED_STACK] += 1
+            samples += 1
+            cost = time.perf_counter() - sample_start
+            sampling_time += cost
+            # keep the sampler's share of wall time under max_overhead
+            if cost > interval * self.max_overhead:
+                interval = min(cost / self.max_overhead, self.max_duration)
+
+        elapsed = time.perf_counter() - started
+        result.update({
+            "samples": samples,
+            "interval": round(interval, 6),
+            "overhead": round(sampling_time / elapsed, 4) if elapsed else 0.0,
+            "stacks": stacks
+        })
+
+    def _format_stack(self, frame, thread_name: Text) -> Text:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            names.append(_format_frame(frame))
+            frame = frame.f_back
+        names.append(thread_name)
+        return ";".join(reversed(names))
+
+
+def _format_frame(frame) -> Text:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    name = f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+    for prefix, tag in FRAME_TAGS:
+        if module.startswith(prefix):
+            return f"{name} [{tag}]"
+    return name
+
+
+def to_collapsed(stacks: Counter) -> Text:
+    """Collapsed stack lines, `frame;frame;frame count`, as read by flamegraph.pl and speedscope."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
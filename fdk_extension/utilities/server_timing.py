@@ -0,0 +1,45 @@
+"""Request scoped timings written as a `Server-Timing` response header."""
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+import re
+import time
+from typing import Dict, Optional, Text
+
+
+_current_timings: ContextVar = ContextVar("fdk_server_timings", default=None)
+
+_INVALID_NAME_CHARS = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def begin_timings() -> Token:
+    """Collect timings in the current request. Durations of one name are summed."""
+    return _current_timings.set({})
+
+
+def end_timings(token: Token=None) -> None:
+    if token is not None:
+        _current_timings.reset(token)
+    else:
+        _current_timings.set(None)
+
+
+def get_timings() -> Optional[Dict[Text, float]]:
+    return _current_timings.get()
+
+
+@contextmanager
+def server_timing(name: Text):
+    """Add the duration of the block to timing `name` of the current request. A no-op outside a request."""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def format_server_timing(timings: Dict[Text, float]) -> Text:
+    return ", ".join(f"{_INVALID_NAME_CHARS.sub('_', name)};dur={duration:.2f}" for name, duration in timings.items())
@@ -0,0 +1,125 @@
+"""Tracing hooks for the library."""
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+import time
+from typing import Dict, List, Optional, Text
+
+try:
+    from opentelemetry import trace as otel_trace
+    from opentelemetry.propagate import inject as otel_inject
+except ImportError:  # optional dependency, needed only for OpenTelemetryTracer
+    otel_trace = None
+    otel_inject = None
+
+from ..exceptions import FdkInvalidConfig
+
+
+class Span:
+    """Span interface, matching the subset of the OpenTelemetry span the library uses."""
+
+    def set_attribute(self, key: Text, value) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+
+NOOP_SPAN = Span()
+
+
+class Tracer:
+    """Tracing backend interface. The default implementation records nothing."""
+
+    @contextmanager
+    def span(self, name: Text, attributes: Dict[Text, object]=None):
+        """Run the block in a child span of the current span. Spans follow asyncio tasks started inside it."""
+        yield NOOP_SPAN
+
+    def get_traceparent(self) -> Optional[Text]:
+        """W3C traceparent header value of the current span."""
+        return None
+
+
+class SpanRecord(Span):
+
+    def __init__(self, name: Text, trace_id: Text, span_id: Text, parent_id: Text=None,
+                 attributes: Dict[Text, object]=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time()
+        self.end_time: float = None
+        self.status = "ok"
+        self.exception: BaseException = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exception):
+        self.status = "error"
+        self.exception = exception
+
+    @property
+    def duration(self) -> float:
+        return (self.end_time or time.time()) - self.start_time
+
+
+_current_span: ContextVar = ContextVar("fdk_current_span", default=None)
+
+
+class InMemoryTracer(Tracer):
+    """Keeps the last `max_spans` finished spans in memory, for tests and local debugging."""
+
+    def __init__(self, max_spans: int=10000):
+        self.spans: deque = deque(maxlen=max_spans)
+
+    @contextmanager
+    def span(self, name, attributes=None):
+        parent: SpanRecord = _current_span.get()
+        span = SpanRecord(name, parent.trace_id if parent else os.urandom(16).hex(), os.urandom(8).hex(),
+                          parent.span_id if parent else None, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            span.end_time = time.time()
+            _current_span.reset(token)
+            self.spans.append(span)
+
+    def get_traceparent(self):
+        span: SpanRecord = _current_span.get()
+        return f"00-{span.trace_id}-{span.span_id}-01" if span else None
+
+    def get_spans(self, name: Text=None) -> List[SpanRecord]:
+        return [span for span in self.spans if name is None or span.name == name]
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+
+class OpenTelemetryTracer(Tracer):
+    """Creates spans with the OpenTelemetry api, exported by the application's configured tracer provider."""
+
+    def __init__(self, tracer_provider=None):
+        if otel_trace is None:
+            raise FdkInvalidConfig("Tracing needs the `opentelemetry-api` package. "
+                                   "Install it with `pip install fdk_extension[tracing]`")
+        from .. import __version__
+        self._tracer = otel_trace.get_tracer("fdk_extension", __version__, tracer_provider)
+
+    @contextmanager
+    def span(self, name, attributes=None):
+        with self._tracer.start_as_current_span(name, attributes=attributes) as span:
+            yield span
+
+    def get_traceparent(self):
+        carrier = {}
+        otel_inject(carrier)
+        return carrier.get("traceparent")
@@ -37,4 +37,13 @@ def get_current_timestamp() -> int:
     return int(time.time_ns() // 1_000_000)
 
 def get_company_cookie_name(company_id) -> str:
-    return f"{SESSION_COOKIE_NAME}_{str(company_id)}"
\ No newline at end of file
+    return f"{SESSION_COOKIE_NAME}_{str(company_id)}"
+
+
+def set_session_cookie(response, company_id, session_id: Text, expires: datetime) -> None:
+    company_cookie_name = get_company_cookie_name(company_id=company_id)
+    response.cookies[company_cookie_name] = session_id
+    response.cookies[company_cookie_name]["secure"] = True
+    response.cookies[company_cookie_name]["samesite"] = "None"
+    response.cookies[company_cookie_name]["httponly"] = True
+    response.cookies[company_cookie_name]["expires"] = expires
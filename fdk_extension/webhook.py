@@ -1,18 +1,27 @@
 """Webhook utility."""
+import asyncio
 import hashlib
 import hmac
+import inspect
+import pickle
 import re
+import time
+from typing import Dict, Iterable
+import weakref
 
 import ujson
 
 
 from .constants import ASSOCIATION_CRITERIA, TEST_WEBHOOK_EVENT_NAME
+from .constants import WEBHOOK_EXECUTION_ASYNC, WEBHOOK_EXECUTION_THREAD, WEBHOOK_EXECUTION_PROCESS
 from .exceptions import FdkInvalidHMacError
 from .exceptions import FdkInvalidWebhookConfig
 from .exceptions import FdkWebhookHandlerNotFound
 from .exceptions import FdkWebhookProcessError
 from .exceptions import FdkWebhookRegistrationError
-from .utilities.logger import get_logger
+from .utilities.logger import get_logger, is_debug_enabled, safe_stringify
+from .utilities.loop_watchdog import watch_step
+from .webhook_executor import WebhookExecutor
 
 from fdk_client.common.aiohttp_helper import AiohttpHelper
 from fdk_client.common.utils import get_headers_with_signature
@@ -30,6 +39,8 @@ class WebhookRegistry:
         self._handler_map = None
         self._config : dict = None
         self._fdk_config : dict = None
+        self._association_locks = weakref.WeakValueDictionary()
+        self._executors: Dict[str, WebhookExecutor] = {}
 
     async def initialize(self, config: dict, fdk_config: dict):
         email_regex_match = r"^\S+@\S+\.\S+$"
@@ -51,6 +62,7 @@ class WebhookRegistry:
 
         for (event_name, handler_data) in self._config["event_map"].items():
             handler_config[event_name] = handler_data
+        self.__validate_execution_modes(handler_config)
 
         await self.get_event_config(handler_config=handler_config)
         event_config["events_map"] = self.__get_event_id_map(event_config.get("event_configs"))
@@ -66,6 +78,35 @@ class WebhookRegistry:
         self._handler_map = handler_config
         logger.debug('Webhook registry initialized')
 
+    def __validate_execution_modes(self, handler_config: dict):
+        executors_config = self._config.get("executors") or {}
+        for key, handler_data in handler_config.items():
+            execution = handler_data.get("execution", WEBHOOK_EXECUTION_ASYNC)
+            if execution == WEBHOOK_EXECUTION_ASYNC:
+                continue
+            if execution not in (WEBHOOK_EXECUTION_THREAD, WEBHOOK_EXECUTION_PROCESS):
+                raise FdkInvalidWebhookConfig(f"Invalid execution for event {key}. Invalid value: {execution}")
+            handler = handler_data.get("handler")
+            if not callable(handler) or inspect.iscoroutinefunction(handler):
+                raise FdkInvalidWebhookConfig(f"Handler of event {key} should be a regular function to run in {execution} pool")
+            if execution == WEBHOOK_EXECUTION_PROCESS:
+                try:
+                    pickle.dumps(handler)
+                except Exception as e:
+                    raise FdkInvalidWebhookConfig(f"Handler of event {key} can not run in process pool, "
+                                                  f"it should be a module level function. Reason: {str(e)}")
+            if execution not in self._executors:
+                pool_config = executors_config.get(execution) or {}
+                self._executors[execution] = WebhookExecutor(execution, int(pool_config.get("max_workers", 4)),
+                                                             int(pool_config.get("max_queue", 100)))
+
+    def get_executor_stats(self) -> dict:
+        return {mode: executor.get_stats() for mode, executor in self._executors.items()}
+
+    async def shutdown_executors(self) -> None:
+        for executor in self._executors.values():
+            await executor.shutdown()
+
     @property
     def is_initialized(self) -> bool:
         return self._handler_map and self._config["subscribe_on_install"]
@@ -153,7 +194,8 @@ class WebhookRegistry:
             if enable_webhooks is not None:
                 subscriber_config["status"] = "active" if enable_webhooks else "inactive"
         else:
-            logger.debug(f"Webhook config on platform side for company id {platform_client._conf.companyId}: {ujson.dumps(subscriber_config)}")
+            if is_debug_enabled():
+                logger.debug(f"Webhook config on platform side for company id {platform_client._conf.companyId}: {ujson.dumps(safe_stringify(subscriber_config))}")
 
             auth_meta = subscriber_config["auth_meta"]
             event_configs = subscriber_config["event_configs"]
@@ -191,7 +233,8 @@ class WebhookRegistry:
                     for event_name in event_config["events_map"]:
                         event_map[event_config["events_map"][event_name]] = event_name
                     subscriber_config["event_id"] = [event_map[event_id] for event_id in subscriber_config["event_id"]]
-                    logger.debug(f"Webhook config registered for company: {platform_client._conf.companyId}, config: {ujson.dumps(subscriber_config)}")
+                    if is_debug_enabled():
+                        logger.debug(f"Webhook config registered for company: {platform_client._conf.companyId}, config: {ujson.dumps(safe_stringify(subscriber_config))}")
                 
             else:
                 event_diff = [each_event_id for each_event_id in subscriber_config["event_id"]
@@ -207,7 +250,8 @@ class WebhookRegistry:
                         for event_name in event_config["events_map"]:
                             event_map[event_config["events_map"][event_name]] = event_name
                         subscriber_config["event_id"] = [event_map[event_id] for event_id in subscriber_config["event_id"]]
-                        logger.debug(f"Webhook config updated for company: {platform_client._conf.companyId}, config: {ujson.dumps(subscriber_config)}")
+                        if is_debug_enabled():
+                            logger.debug(f"Webhook config updated for company: {platform_client._conf.companyId}, config: {ujson.dumps(safe_stringify(subscriber_config))}")
 
         except Exception as e:
             raise FdkWebhookRegistrationError(f"Failed to sync webhook events. Reason: {str(e)}")
@@ -219,31 +263,13 @@ class WebhookRegistry:
 
         if self._config["subscribed_saleschannel"] != "specific":
             raise FdkWebhookRegistrationError("'subscribed_saleschannel' is not set to 'specific' in webhook config")
-        
-        try:
-            subscriber_config = await self.get_subscribe_config(platform_client=platform_client)
-            
-            if not subscriber_config:
-                raise FdkWebhookRegistrationError("Subscriber config not found")
-
-            event_configs = subscriber_config["event_configs"]
-            for key in list(subscriber_config.keys()):
-                if key not in ["id", "name", "webhook_url", "association", "status", "auth_meta", "email_id"]:
-                    subscriber_config.pop(key)
-
-            subscriber_config["event_id"] = [each_event["id"] for each_event in event_configs]
-            arr_application_id = subscriber_config["association"].get("application_id") or []
-            try:
-                arr_application_id.index(application_id)
-            except ValueError:
-                arr_application_id.append(application_id)
-                subscriber_config["association"]["application_id"] = arr_application_id
-                subscriber_config["association"]["criteria"] = self.__association_criteria(subscriber_config["association"]["application_id"])
-                await platform_client.webhook.updateSubscriberConfig(body=subscriber_config)
-                logger.debug(f"Webhook enabled for saleschannel: {application_id}")
 
+        try:
+            result = await self.update_sales_channel_webhooks(platform_client, enable=[application_id])
         except Exception as e:
             raise FdkWebhookRegistrationError(f"Failed to add saleschannel webhook. Reason: {str(e)}")
+        if result["updated"]:
+            logger.debug(f"Webhook enabled for saleschannel: {application_id}")
 
 
     async def disable_sales_channel_webhook(self, platform_client: PlatformClient, application_id: str):
@@ -252,27 +278,91 @@ class WebhookRegistry:
         
         if self._config["subscribed_saleschannel"] != "specific":
             raise FdkWebhookRegistrationError("`subscribed_saleschannel` is not set to `specific` in webhook config")
+
         try:
-            subscriber_config = await self.get_subscribe_config(platform_client=platform_client)
-            if not subscriber_config:
-                raise FdkWebhookRegistrationError("Subscriber config not found")
+            result = await self.update_sales_channel_webhooks(platform_client, disable=[application_id])
+        except Exception as e:
+            raise FdkWebhookRegistrationError(f"Failed to disabled saleschannel webhook. Reason: {str(e)}")
+        if result["updated"]:
+            logger.debug(f"Webhook disabled for saleschannel: {application_id}")
 
-            event_configs = subscriber_config["event_configs"]
-            for key in list(subscriber_config.keys()):
-                if key not in ["id", "name", "webhook_url", "association", "status", "auth_meta", "email_id"]:
-                    subscriber_config.pop(key)
 
-            subscriber_config["event_id"] = [each_event["id"] for each_event in event_configs]
-            arr_application_id = subscriber_config["association"].get("application_id") or []
-            if application_id in arr_application_id:
-                arr_application_id.remove(application_id)
-                subscriber_config["association"]["criteria"] = self.__association_criteria(subscriber_config["association"].get("application_id", []))
-                subscriber_config["association"]["application_id"] = arr_application_id
-                await platform_client.webhook.updateSubscriberConfig(body=subscriber_config)
-                logger.debug(f"Webhook disabled for saleschannel: {application_id}")
+    async def enable_sales_channel_webhooks(self, platform_client: PlatformClient, application_ids: Iterable[str]) -> dict:
+        return await self.update_sales_channel_webhooks(platform_client, enable=application_ids)
 
-        except Exception as e:
-            raise FdkWebhookRegistrationError(f"Failed to disabled saleschannel webhook. Reason: {str(e)}")
+
+    async def disable_sales_channel_webhooks(self, platform_client: PlatformClient, application_ids: Iterable[str]) -> dict:
+        return await self.update_sales_channel_webhooks(platform_client, disable=application_ids)
+
+
+    async def update_sales_channel_webhooks(self, platform_client: PlatformClient, enable: Iterable[str]=(),
+                                            disable: Iterable[str]=(), max_retries: int=3) -> dict:
+        """Enable and disable webhooks of many sales channels with one subscriber config update.
+
+        The update is skipped when the sales channel set does not change. After an update the config is
+        read back, and the change is applied again on top of the latest config if a concurrent writer
+        overwrote it.
+        """
+        if not self.is_initialized:
+            raise FdkInvalidWebhookConfig("Webhook registry not initialized")
+
+        if self._config["subscribed_saleschannel"] != "specific":
+            raise FdkWebhookRegistrationError("`subscribed_saleschannel` is not set to `specific` in webhook config")
+
+        enable, disable = set(enable), set(disable)
+        if enable & disable:
+            raise FdkWebhookRegistrationError(f"Sales channels both enabled and disabled: {', '.join(enable & disable)}")
+
+        company_id = platform_client._conf.companyId
+        lock = self._association_locks.get(company_id)
+        if lock is None:
+            lock = self._association_locks[company_id] = asyncio.Lock()
+
+        result = {"added": [], "removed": [], "updated": False, "attempts": 0}
+        async with lock:
+            subscriber_config = await self.get_subscribe_config(platform_client=platform_client)
+            while True:
+                if not subscriber_config:
+                    raise FdkWebhookRegistrationError("Subscriber config not found")
+                current = subscriber_config["association"].get("application_id") or []
+                added = [application_id for application_id in enable if application_id not in current]
+                removed = [application_id for application_id in disable if application_id in current]
+                if not added and not removed:
+                    return result
+                if result["attempts"] > max_retries:
+                    raise FdkWebhookRegistrationError(
+                        f"Sales channel webhooks update conflicted {max_retries} times for company {company_id}")
+
+                result["attempts"] += 1
+                self.__strip_subscriber_config(subscriber_config)
+                application_ids = [application_id for application_id in current if application_id not in disable]
+                application_ids.extend(sorted(added))
+                subscriber_config["association"]["application_id"] = application_ids
+                subscriber_config["association"]["criteria"] = self.__association_criteria(application_ids)
+                try:
+                    response = await platform_client.webhook.updateSubscriberConfig(body=subscriber_config)
+                except Exception as e:
+                    raise FdkWebhookRegistrationError(f"Failed to update saleschannel webhooks. Reason: {str(e)}")
+
+                status_code = response.get("status_code") if isinstance(response, dict) else None
+                if status_code in (409, 412):
+                    logger.debug(f"Saleschannel webhooks update conflicted for company {company_id}, retrying")
+                elif status_code and status_code >= 400:
+                    raise FdkWebhookRegistrationError(f"Failed to update saleschannel webhooks. Status: {status_code}")
+                else:
+                    result["added"] = sorted(set(result["added"]) | set(added))
+                    result["removed"] = sorted(set(result["removed"]) | set(removed))
+                    result["updated"] = True
+                # verify against the latest config, a lost update shows up as a remaining difference
+                subscriber_config = await self.get_subscribe_config(platform_client=platform_client)
+
+    @staticmethod
+    def __strip_subscriber_config(subscriber_config: dict) -> None:
+        event_configs = subscriber_config.get("event_configs") or []
+        for key in list(subscriber_config.keys()):
+            if key not in ["id", "name", "webhook_url", "association", "status", "auth_meta", "email_id"]:
+                subscriber_config.pop(key)
+        subscriber_config["event_id"] = [each_event["id"] for each_event in event_configs]
 
     def verify_signature(self, request: Request):
         req_signature = request.headers['x-fp-signature']
@@ -285,11 +375,23 @@ class WebhookRegistry:
     async def process_webhook(self, request: Request):
         if not self.is_initialized:
             raise FdkInvalidWebhookConfig("Webhook registry not initialized")
+        from .extension import extension
+
+        with extension.tracer.span("fdk.webhook.process"):
+            await self.__process_webhook(request, extension)
+
+    async def __process_webhook(self, request: Request, extension):
+        metrics, tracer = extension.metrics, extension.tracer
+        event_key = "unknown"
+        outcome = "error"
+        start = time.perf_counter()
         try:
             body = request.json
             if body["event"]["name"] == TEST_WEBHOOK_EVENT_NAME:
+                outcome = "ping"
                 return
-            self.verify_signature(request)
+            with metrics.timer("fdk_webhook_verify_duration_seconds"), tracer.span("fdk.webhook.verify"):
+                self.verify_signature(request)
             event_name = f"{body['event']['name']}/{body['event']['type']}"
             category_event_name = event_name
             if body["event"].get("category"):
@@ -299,13 +401,30 @@ class WebhookRegistry:
             ext_handler = event_handler_map.get("handler")
 
             if callable(ext_handler):
-                logger.debug(f"Webhook event received for company: {body['company_id']}, "
-                             f"application: {body.get('application_id', '')}, event name: {event_name} ")
-                await ext_handler(event_name, body, body["company_id"], body["application_id"])
+                # only registered event keys become label values
+                event_key = category_event_name if category_event_name in self._handler_map else event_name
+                metrics.observe("fdk_webhook_dispatch_duration_seconds", time.perf_counter() - start,
+                                {"event": event_key})
+                logger.debug("Webhook event received for company: %s, application: %s, event name: %s",
+                             body["company_id"], body.get("application_id", ""), event_name, log_key="webhook_event")
+                with metrics.timer("fdk_webhook_handler_duration_seconds",
+                                   extension.get_metric_labels(body["company_id"], event=event_key)), \
+                        tracer.span("fdk.webhook.handler", {"fdk.event": event_key}):
+                    execution = event_handler_map.get("execution", WEBHOOK_EXECUTION_ASYNC)
+                    if execution == WEBHOOK_EXECUTION_ASYNC:
+                        await watch_step(f"webhook:{event_key}",
+                                         ext_handler(event_name, body, body["company_id"], body["application_id"]))
+                    else:
+                        await self._executors[execution].run(ext_handler, event_name, body, body["company_id"],
+                                                             body["application_id"], metrics=metrics)
+                outcome = "success"
             else:
+                outcome = "handler_not_found"
                 raise FdkWebhookHandlerNotFound(f"Webhook handler not assigned: {category_event_name}")
         except Exception as e:
             raise FdkWebhookProcessError(str(e))
+        finally:
+            metrics.increment("fdk_webhook_events_total", labels={"event": event_key, "outcome": outcome})
 
 
     async def get_subscribe_config(self, platform_client: PlatformClient) -> dict:
@@ -347,7 +466,8 @@ class WebhookRegistry:
             response = await AiohttpHelper().aiohttp_request(request_type="POST", url=url, data=data, headers=headers)
             response_data: dict = response["json"]
             event_config["event_configs"] = response_data.get("event_configs")
-            logger.debug(f"Webhook events config received: {ujson.dumps(response_data)}")
+            if is_debug_enabled():
+                logger.debug(f"Webhook events config received: {ujson.dumps(response_data)}")
             return response_data
 
         except Exception as e:
@@ -0,0 +1,78 @@
+"""Thread and process pools running synchronous webhook handlers off the event loop."""
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import time
+from typing import Callable, Text
+
+from .constants import WEBHOOK_EXECUTION_PROCESS
+from .exceptions import FdkWebhookExecutorBusy
+from .utilities.metrics import Metrics
+
+
+class WebhookExecutor:
+    """Runs handlers in a pool of `max_workers`, with at most `max_queue` calls waiting for a worker.
+
+    Calls beyond the queue limit raise FdkWebhookExecutorBusy, so the platform retries the event later
+    instead of the backlog growing in memory. The pool is created on first use.
+    """
+
+    def __init__(self, mode: Text, max_workers: int=4, max_queue: int=100):
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.stats = {"completed": 0, "failed": 0, "rejected": 0, "queued": 0, "active": 0}
+        self._pool: Executor = None
+        # created on first use, inside the loop serving the webhooks
+        self._semaphore: asyncio.Semaphore = None
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.mode == WEBHOOK_EXECUTION_PROCESS:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix=f"fdk-webhook-{self.mode}")
+        return self._pool
+
+    async def run(self, func: Callable, *args, metrics: Metrics=None):
+        metrics = metrics or Metrics()
+        labels = {"mode": self.mode}
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        if self._semaphore.locked() and self.stats["queued"] >= self.max_queue:
+            self.stats["rejected"] += 1
+            metrics.increment("fdk_webhook_executor_rejected_total", labels=labels)
+            raise FdkWebhookExecutorBusy(f"Webhook {self.mode} pool queue is full ({self.max_queue} waiting)")
+
+        queued_at = time.perf_counter()
+        self.stats["queued"] += 1
+        metrics.set_gauge("fdk_webhook_executor_queue_depth", self.stats["queued"], labels)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.stats["queued"] -= 1
+            metrics.set_gauge("fdk_webhook_executor_queue_depth", self.stats["queued"], labels)
+        metrics.observe("fdk_webhook_executor_wait_seconds", time.perf_counter() - queued_at, labels)
+
+        self.stats["active"] += 1
+        metrics.set_gauge("fdk_webhook_executor_active", self.stats["active"], labels)
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._get_pool(), func, *args)
+            self.stats["completed"] += 1
+            return result
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        finally:
+            self.stats["active"] -= 1
+            metrics.set_gauge("fdk_webhook_executor_active", self.stats["active"], labels)
+            self._semaphore.release()
+
+    def get_stats(self) -> dict:
+        return dict(self.stats, mode=self.mode, max_workers=self.max_workers, max_queue=self.max_queue)
+
+    async def shutdown(self) -> None:
+        """Wait for running handlers and stop the pool."""
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.get_running_loop().run_in_executor(None, pool.shutdown)
@@ -48,11 +48,13 @@ setup(
         "Source Code": "https://github.com/gofynd/fdk-extension-python",
     },
     packages=find_packages(
-        exclude=("examples*", "tests*")
+        exclude=("examples*", "tests*", "benchmarks*")
     ),
     install_requires=install_requires,
     extras_require={
-        "test": test_requires
+        "test": test_requires,
+        "stateless": ["cryptography>=3.4"],
+        "tracing": ["opentelemetry-api>=1.0"]
     },
     keywords=["FDK extension python", "Extension", "FDK"],
     python_requires=">=3.7, <3.11",
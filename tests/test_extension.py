@@ -9,6 +9,8 @@ from fdk_extension.extension import Extension
 from fdk_extension.exceptions import FdkInvalidConfig
 from fdk_extension.session.session import Session
 from fdk_extension.session.session_storage import SessionStorage
+from fdk_extension.storage.base_storage import BaseStorage
+from fdk_extension.storage.memory_storage import MemoryStorage
 
 from fdk_client.platform.PlatformConfig import PlatformConfig
 from fdk_client.platform.PlatformClient import PlatformClient
@@ -119,6 +121,28 @@ async def test_initialize_invalid_cluster() -> None:
         await extension.initialize(data_to_pass)
 
 
+async def test_initialize_hash_layout_needs_expire() -> None:
+    class LegacyStorage(MemoryStorage):
+        expire = BaseStorage.expire
+
+    extension = Extension()
+    data_to_pass = {
+        "api_key": API_KEY,
+        "api_secret": API_SECRET,
+        "base_url": BASE_URL,
+        "callbacks": {
+            "auth": Mock(),
+            "uninstall": Mock()
+        },
+        "storage": LegacyStorage("test"),
+        "access_mode": OFFLINE_ACCESS_MODE,
+        "cluster": FYND_CLUSTER,
+        "session_layout": "hash"
+    }
+    with pytest.raises(FdkInvalidConfig, match="session_layout hash needs a storage implementing expire"):
+        await extension.initialize(data_to_pass)
+
+
 async def test_initialize_invalid_base_url(extension_data_fixture: dict, monkeypatch: MonkeyPatch) -> None:
     extension = Extension()
     data_to_pass = {
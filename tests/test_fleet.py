@@ -0,0 +1,97 @@
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+from pytest import MonkeyPatch
+
+from fdk_extension.extension import Extension, extension
+from fdk_extension.fleet import FleetRunner
+from fdk_extension.install_index import InstallIndex
+from fdk_extension.session.session import Session
+from fdk_extension.session.session_storage import SessionStorage
+from fdk_extension.storage.memory_storage import MemoryStorage
+
+from .conftest import *
+
+
+COMPANY_IDS = [1, 2, 3, 4, 5]
+
+
+@pytest.fixture()
+async def installed_companies_fixture(monkeypatch: MonkeyPatch) -> MemoryStorage:
+    storage = MemoryStorage("test")
+    monkeypatch.setattr(extension, "storage", storage)
+    monkeypatch.setattr(extension, "api_key", API_KEY)
+    monkeypatch.setattr(Extension, "get_platform_client", AsyncMock(return_value=None))
+    for company_id in COMPANY_IDS:
+        session = Session(Session.generate_session_id(False, cluster=extension.cluster, company_id=company_id))
+        session.company_id = company_id
+        await SessionStorage.write_session(session)
+        await InstallIndex.add(company_id, session.session_id)
+    return storage
+
+
+async def test_install_index_is_scanned_in_batches(installed_companies_fixture: MemoryStorage) -> None:
+    await InstallIndex.remove(5)
+
+    batches = [entries async for _, entries in InstallIndex.iter_companies(batch_size=2)]
+
+    assert [len(entries) for entries in batches] == [2, 2]
+    assert sorted(company_id for entries in batches for company_id in entries) == [1, 2, 3, 4]
+    sessions = [session async for batch in InstallIndex.iter_sessions(batch_size=3) for session in batch]
+    assert sorted(session.company_id for session in sessions) == [1, 2, 3, 4]
+
+
+async def test_install_index_keeps_installed_at(installed_companies_fixture: MemoryStorage) -> None:
+    entry = json.loads(await installed_companies_fixture.hget(InstallIndex.get_key(), "1"))
+    await installed_companies_fixture.hset(InstallIndex.get_key(), "1", json.dumps(dict(entry, installed_at=1)))
+
+    # a later launch, in online access mode, keeps the install time and the offline session id
+    await InstallIndex.add(1)
+
+    assert json.loads(await installed_companies_fixture.hget(InstallIndex.get_key(), "1")) == dict(entry, installed_at=1)
+
+
+async def test_fleet_runner_skips_online_installs(installed_companies_fixture: MemoryStorage) -> None:
+    await InstallIndex.add(6)
+    processed = []
+
+    async def task(company_id, platform_client):
+        processed.append(company_id)
+
+    progress = await FleetRunner(task, batch_size=10).run()
+
+    assert sorted(processed) == COMPANY_IDS
+    assert progress["skipped"] == 1
+
+
+async def test_fleet_runner_reports_progress_and_failures(installed_companies_fixture: MemoryStorage) -> None:
+    async def task(company_id, platform_client):
+        if company_id == 3:
+            raise ValueError("failed")
+
+    reports = []
+    progress = await FleetRunner(task, concurrency=2, batch_size=2, on_progress=reports.append).run()
+
+    assert progress["processed"] == 5
+    assert progress["succeeded"] == 4
+    assert progress["failed_companies"] == [3]
+    assert [report["processed"] for report in reports] == [2, 4, 5]
+
+
+async def test_fleet_runner_resumes_from_checkpoint(installed_companies_fixture: MemoryStorage) -> None:
+    processed = []
+
+    async def task(company_id, platform_client):
+        processed.append(company_id)
+
+    def stop_after_first_batch(progress):
+        raise KeyboardInterrupt()
+
+    with pytest.raises(KeyboardInterrupt):
+        await FleetRunner(task, batch_size=2, job_name="nightly", on_progress=stop_after_first_batch).run()
+    progress = await FleetRunner(task, batch_size=2, job_name="nightly").run()
+
+    assert sorted(processed) == COMPANY_IDS
+    assert progress["processed"] == 5
+    assert await installed_companies_fixture.get(f"fdk_fleet_checkpoint:{API_KEY}:nightly") is None
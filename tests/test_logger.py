@@ -0,0 +1,40 @@
+import pytest
+from pytest import MonkeyPatch
+import structlog
+
+from fdk_extension.utilities import logger
+from fdk_extension.utilities.logger import LogRateLimiter, safe_stringify
+
+
+class MockPlatformConfig:
+    def __init__(self):
+        self.companyId = 999
+        self.apiSecret = "mock_secret_key"
+        self.oauthClient = {"config": self, "token": "mock_token", "scopes": list(range(60))}
+
+
+def test_safe_stringify_redacts_and_bounds() -> None:
+    result = safe_stringify(MockPlatformConfig(), max_length=8)
+
+    assert result["companyId"] == 999
+    assert result["apiSecret"] == "[REDACTED]"
+    assert result["oauthClient"]["token"] == "[REDACTED]"
+    assert result["oauthClient"]["config"] == "<MockPlatformConfig>"
+    assert result["oauthClient"]["scopes"][-1] == "...10 more"
+    assert safe_stringify("x" * 10, max_length=8) == "xxxxxxxx...(10 chars)"
+
+
+def test_rate_limiter_drops_and_reports_suppressed(monkeypatch: MonkeyPatch) -> None:
+    now = [0.0]
+    monkeypatch.setattr(logger.time, "monotonic", lambda: now[0])
+    rate_limiter = LogRateLimiter(limit=2, interval=1.0)
+
+    for _ in range(2):
+        assert rate_limiter(None, "debug", {"event": "received", "log_key": "webhook_event"}) == {"event": "received"}
+    with pytest.raises(structlog.DropEvent):
+        rate_limiter(None, "debug", {"event": "received", "log_key": "webhook_event"})
+    assert rate_limiter(None, "debug", {"event": "other"}) == {"event": "other"}
+
+    now[0] = 1.0
+    assert rate_limiter(None, "debug", {"event": "received", "log_key": "webhook_event"}) == \
+        {"event": "received", "suppressed": 1}
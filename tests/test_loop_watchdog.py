@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+from fdk_extension.utilities.loop_watchdog import LoopWatchdog, watch_step
+from fdk_extension.utilities.metrics import PrometheusMetrics
+
+
+async def blocking_handler(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+async def run_watched(watchdog: LoopWatchdog, label: str, seconds: float) -> None:
+    watchdog.start(PrometheusMetrics())
+    try:
+        await asyncio.sleep(0.05)
+        await watch_step("route:auth", watch_step(label, blocking_handler(seconds)))
+        await asyncio.sleep(0.1)
+    finally:
+        watchdog.stop()
+
+
+async def test_stall_is_attributed_to_innermost_step() -> None:
+    watchdog = LoopWatchdog(threshold=0.05)
+
+    await run_watched(watchdog, "callback:auth", 0.3)
+
+    stall, = watchdog.get_stalls()
+    assert stall["step"] == "callback:auth"
+    assert stall["steps"] == ["route:auth", "callback:auth"]
+    assert stall["duration"] >= 0.25
+    assert "blocking_handler" in "".join(stall["stack"])
+    assert 'fdk_loop_stalls_total{step="callback:auth"} 1' in watchdog.metrics.render()
+
+
+async def test_step_threshold_raises_limit() -> None:
+    watchdog = LoopWatchdog(threshold=0.05, step_thresholds={"callback:uninstall": 1.0})
+
+    await run_watched(watchdog, "callback:uninstall", 0.2)
+
+    assert watchdog.get_stalls() == []
+    assert watchdog.stats["max_lag"] >= 0.15
+
+
+async def test_watch_step_is_transparent_without_watchdog() -> None:
+    coroutine = blocking_handler(0)
+
+    assert watch_step("callback:auth", coroutine) is coroutine
+    await coroutine
@@ -38,4 +38,12 @@ async def test_get_platform_client_negative(monkeypatch: MonkeyPatch) -> None:
 
 async def test_get_application_client() -> None:
     client = await get_application_client(APPLICATION_ID, APPLICATION_TOKEN)
-    assert isinstance(client, ApplicationClient)
\ No newline at end of file
+    assert isinstance(client, ApplicationClient)
+
+async def test_get_application_client_is_cached() -> None:
+    client = await get_application_client(APPLICATION_ID, APPLICATION_TOKEN)
+    assert client is await get_application_client(APPLICATION_ID, APPLICATION_TOKEN)
+
+    new_token_client = await get_application_client(APPLICATION_ID, "new_application_token")
+    assert new_token_client is not client
+    assert new_token_client is await get_application_client(APPLICATION_ID, "new_application_token")
@@ -0,0 +1,59 @@
+import pytest
+from pytest import MonkeyPatch
+
+from fdk_extension.extension import extension
+from fdk_extension.session.session_storage import SessionStorage
+from fdk_extension.storage.memory_storage import MemoryStorage
+from fdk_extension.utilities.metrics import PrometheusMetrics
+
+from .conftest import *
+
+
+@pytest.fixture()
+def prometheus_metrics_fixture(monkeypatch: MonkeyPatch) -> PrometheusMetrics:
+    metrics = PrometheusMetrics(buckets=(0.1, 1.0), max_label_sets=2)
+    monkeypatch.setattr(extension, "metrics", metrics)
+    return metrics
+
+
+def test_prometheus_text_format(prometheus_metrics_fixture: PrometheusMetrics) -> None:
+    prometheus_metrics_fixture.increment("fdk_handler_requests_total", labels={"handler": "auth", "outcome": "success"})
+    prometheus_metrics_fixture.observe("fdk_session_storage_duration_seconds", 0.5, {"operation": "get"})
+
+    assert prometheus_metrics_fixture.render() == (
+        '# TYPE fdk_handler_requests_total counter\n'
+        'fdk_handler_requests_total{handler="auth",outcome="success"} 1\n'
+        '# TYPE fdk_session_storage_duration_seconds histogram\n'
+        'fdk_session_storage_duration_seconds_bucket{operation="get",le="0.1"} 0\n'
+        'fdk_session_storage_duration_seconds_bucket{operation="get",le="1"} 1\n'
+        'fdk_session_storage_duration_seconds_bucket{operation="get",le="+Inf"} 1\n'
+        'fdk_session_storage_duration_seconds_sum{operation="get"} 0.5\n'
+        'fdk_session_storage_duration_seconds_count{operation="get"} 1\n'
+    )
+
+
+def test_label_sets_are_bounded(prometheus_metrics_fixture: PrometheusMetrics) -> None:
+    for company_id in range(5):
+        prometheus_metrics_fixture.increment("fdk_platform_client_builds_total", labels={"company_id": str(company_id)})
+
+    rendered = prometheus_metrics_fixture.render()
+    assert 'fdk_platform_client_builds_total{company_id="_overflow_"} 3' in rendered
+
+
+def test_company_label_is_opt_in(monkeypatch: MonkeyPatch) -> None:
+    assert extension.get_metric_labels(COMPANY_ID, outcome="success") == {"outcome": "success"}
+
+    monkeypatch.setattr(extension, "metrics_company_label", True)
+    assert extension.get_metric_labels(COMPANY_ID) == {"company_id": str(COMPANY_ID)}
+
+
+async def test_session_storage_latency_is_observed(prometheus_metrics_fixture: PrometheusMetrics,
+                                                   monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(extension, "storage", MemoryStorage("test"))
+
+    await SessionStorage.get_session(SESSION_ID)
+    await SessionStorage.delete_session(SESSION_ID)
+
+    rendered = prometheus_metrics_fixture.render()
+    assert 'fdk_session_storage_duration_seconds_count{operation="get"} 1' in rendered
+    assert 'fdk_session_storage_duration_seconds_count{operation="delete"} 1' in rendered
@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from pytest import MonkeyPatch
+
+from fdk_extension.exceptions import FdkSessionNotFoundError
+from fdk_extension.extension import Extension, extension
+from fdk_extension.middleware.api_middleware import application_proxy_on_request
+from fdk_extension.middleware.api_middleware import get_request_platform_client
+from fdk_extension.middleware.api_middleware import lazy_platform_api_on_request
+from fdk_extension.middleware.context_middleware import request_context_on_request
+from fdk_extension.request_context import set_context
+from fdk_extension.session.session import Session
+from fdk_extension.session.session_storage import SessionStorage
+
+from fdk_client.platform.PlatformClient import PlatformClient
+
+from .conftest import *
+
+
+def get_request_mock(cookies: dict=None) -> Mock:
+    request = Mock()
+    request.headers = {"x-company-id": str(COMPANY_ID)}
+    request.args = {}
+    request.cookies = cookies or {}
+    request.conn_info.ctx = SimpleNamespace()
+    request.ctx = SimpleNamespace()
+    return request
+
+
+async def test_lazy_platform_api_on_request_without_cookie() -> None:
+    request = get_request_mock()
+
+    response = await lazy_platform_api_on_request(request)
+
+    assert response.status == 401
+
+
+async def test_lazy_platform_client_is_resolved_once(session_fixture: Session, monkeypatch: MonkeyPatch) -> None:
+    request = get_request_mock({f"ext_session_{COMPANY_ID}": SESSION_ID})
+    mock_get_session = AsyncMock(return_value=session_fixture)
+    mock_get_platform_client = AsyncMock(return_value=PlatformClient({}))
+    monkeypatch.setattr(SessionStorage, "get_request_session", mock_get_session)
+    monkeypatch.setattr(Extension, "get_platform_client", mock_get_platform_client)
+
+    assert await lazy_platform_api_on_request(request) is None
+    mock_get_session.assert_not_called()
+
+    client = await get_request_platform_client(request)
+
+    assert client is await get_request_platform_client(request)
+    mock_get_session.assert_called_once_with(SESSION_ID)
+    mock_get_platform_client.assert_called_once()
+
+
+async def test_lazy_platform_client_session_not_found(monkeypatch: MonkeyPatch) -> None:
+    request = get_request_mock({f"ext_session_{COMPANY_ID}": SESSION_ID})
+    monkeypatch.setattr(SessionStorage, "get_request_session", AsyncMock(return_value=None))
+    await lazy_platform_api_on_request(request)
+
+    with pytest.raises(FdkSessionNotFoundError):
+        await get_request_platform_client(request)
+
+
+async def test_request_context_is_reset_per_request(session_fixture: Session) -> None:
+    request = get_request_mock()
+    set_context(request, fdk_session=session_fixture)
+    assert request.conn_info.ctx.fdk_session is session_fixture
+
+    next_request = get_request_mock()
+    next_request.conn_info = request.conn_info
+    await request_context_on_request(next_request)
+
+    assert next_request.ctx.fdk_session is None
+    assert request.conn_info.ctx.fdk_session is None
+    assert next_request.ctx.extension is extension
+
+
+async def test_request_context_without_legacy_mirror(session_fixture: Session, monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(extension, "legacy_conn_ctx", False)
+    request = get_request_mock()
+
+    set_context(request, fdk_session=session_fixture)
+
+    assert request.ctx.fdk_session is session_fixture
+    assert not hasattr(request.conn_info.ctx, "fdk_session")
+
+
+async def test_application_proxy_on_request(monkeypatch: MonkeyPatch) -> None:
+    request = get_request_mock()
+    request.headers = {
+        "x-user-data": '{"_id": "mock_user_id"}',
+        "x-application-data": f'{{"_id": "{APPLICATION_ID}", "token": "{APPLICATION_TOKEN}"}}'
+    }
+
+    await application_proxy_on_request(request)
+    application_client = request.ctx.application_client
+    await application_proxy_on_request(request)
+
+    assert request.ctx.user["user_id"] == "mock_user_id"
+    assert request.ctx.application["_id"] == APPLICATION_ID
+    assert request.ctx.application_client is application_client
@@ -0,0 +1,72 @@
+import asyncio
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from pytest import MonkeyPatch
+
+from fdk_extension.extension import extension
+from fdk_extension.handlers import profile_handler
+from fdk_extension.utilities.profiler import SamplingProfiler
+
+
+def busy_worker(stopped: threading.Event) -> None:
+    while not stopped.is_set():
+        sum(range(1000))
+
+
+def get_profile_request(token: str, **args) -> SimpleNamespace:
+    return SimpleNamespace(headers={"authorization": f"Bearer {token}"}, args=args)
+
+
+async def test_profile_samples_threads_within_bounds() -> None:
+    profiler = SamplingProfiler(interval=0.005, max_duration=0.2)
+    stopped = threading.Event()
+    worker = threading.Thread(target=busy_worker, args=(stopped,), name="busy")
+    worker.start()
+    try:
+        start = time.monotonic()
+        profile = await profiler.profile(60)
+        elapsed = time.monotonic() - start
+    finally:
+        stopped.set()
+        worker.join()
+
+    assert profile["duration"] == 0.2
+    assert elapsed < 1
+    assert profile["samples"] > 0
+    assert any(stack.startswith("busy;") and "busy_worker" in stack for stack in profile["stacks"])
+
+
+def test_library_frames_are_tagged() -> None:
+    namespace = {"__name__": "fdk_extension.storage.redis_storage", "sys": sys}
+    exec("def get():\n    return sys._getframe()", namespace)
+
+    stack = SamplingProfiler()._format_stack(namespace["get"](), "MainThread")
+
+    assert stack.endswith(";fdk_extension.storage.redis_storage:get [storage]")
+
+
+async def test_profile_route_is_authenticated(monkeypatch: MonkeyPatch) -> None:
+    assert (await profile_handler(get_profile_request("secret"))).status == 404
+
+    monkeypatch.setattr(extension, "profiler", SamplingProfiler(max_duration=0.05))
+    monkeypatch.setattr(extension, "profiler_token", "secret")
+
+    assert (await profile_handler(get_profile_request("wrong"))).status == 401
+    response = await profile_handler(get_profile_request("secret", seconds="5"))
+    assert response.status == 200
+    assert response.headers["x-fdk-profile-samples"]
+
+
+async def test_profile_rejects_non_finite_seconds(monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(extension, "profiler", SamplingProfiler(max_duration=0.05))
+    monkeypatch.setattr(extension, "profiler_token", "secret")
+
+    for seconds in ("nan", "inf", "-inf"):
+        response = await asyncio.wait_for(profile_handler(get_profile_request("secret", seconds=seconds)), 1)
+        assert response.status == 400
+    with pytest.raises(ValueError):
+        await asyncio.wait_for(extension.profiler.profile(float("nan")), 1)
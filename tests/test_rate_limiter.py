@@ -0,0 +1,108 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from fdk_extension.clients.rate_limiter import PlatformRateLimiter, TokenBucket
+from fdk_extension.exceptions import FdkInvalidConfig
+
+from .conftest import *
+
+
+class MockService:
+    def __init__(self, responses: list=None):
+        self.responses = responses or []
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+
+    async def getTickets(self, **kwargs):
+        self.calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        if self.responses:
+            return self.responses.pop(0)
+        return {"status_code": 200, "json": {}, "headers": {}}
+
+
+def get_client_mock(service: MockService) -> SimpleNamespace:
+    return SimpleNamespace(config=SimpleNamespace(), lead=service)
+
+
+async def test_token_bucket_reserves_ahead() -> None:
+    bucket = TokenBucket(rate=10, burst=2)
+
+    assert await bucket.reserve() == 0
+    assert await bucket.reserve() == 0
+    assert await bucket.reserve() == pytest.approx(0.1, abs=0.01)
+
+
+async def test_company_concurrency_is_limited() -> None:
+    limiter = PlatformRateLimiter({"company": {"concurrency": 2}}, "https://api.fynd.com")
+    service = MockService()
+    client = limiter.instrument(get_client_mock(service), COMPANY_ID)
+
+    await asyncio.gather(*[client.lead.getTickets() for _ in range(6)])
+
+    assert service.calls == 6
+    assert service.max_running == 2
+    assert limiter.get_stats()["concurrency_waits"] > 0
+
+
+async def test_company_limits_ignore_id_type() -> None:
+    limiter = PlatformRateLimiter({"company": {"concurrency": 2}}, "https://api.fynd.com")
+    service = MockService()
+    int_client = limiter.instrument(get_client_mock(service), COMPANY_ID)
+    str_client = limiter.instrument(get_client_mock(service), str(COMPANY_ID))
+
+    await asyncio.gather(*[client.lead.getTickets() for client in (int_client, str_client) for _ in range(3)])
+
+    assert service.max_running == 2
+    limiter.forget_company(COMPANY_ID)
+    assert limiter._company_limits.get(str(COMPANY_ID)) is None
+
+
+async def test_throttle_waits_are_recorded() -> None:
+    limiter = PlatformRateLimiter({"company": {"rate": 20, "burst": 1}}, "https://api.fynd.com")
+    client = limiter.instrument(get_client_mock(MockService()), COMPANY_ID)
+
+    await client.lead.getTickets()
+    await client.lead.getTickets()
+
+    stats = limiter.get_stats()
+    assert stats["calls"] == 2
+    assert stats["throttled"] == 1
+    assert stats["wait"]["count"] == 1
+
+
+async def test_retry_after_is_honoured() -> None:
+    limiter = PlatformRateLimiter({"company": {"rate": 100}}, "https://api.fynd.com")
+    service = MockService([{"status_code": 429, "json": {}, "headers": {"Retry-After": "0.05"}}])
+    client = limiter.instrument(get_client_mock(service), COMPANY_ID)
+
+    response = await client.lead.getTickets()
+
+    assert response["status_code"] == 200
+    assert service.calls == 2
+    assert limiter.get_stats()["retries"] == 1
+    assert limiter.get_stats()["throttle_wait_seconds"] >= 0.04
+
+
+async def test_huge_retry_after_is_clamped() -> None:
+    limiter = PlatformRateLimiter({"company": {"rate": 100}, "max_retry_after": 0.05}, "https://api.fynd.com")
+    service = MockService([{"status_code": 429, "json": {}, "headers": {"Retry-After": "86400"}}])
+    client = limiter.instrument(get_client_mock(service), COMPANY_ID)
+
+    response = await asyncio.wait_for(client.lead.getTickets(), 1)
+    assert response["status_code"] == 429
+
+    response = await asyncio.wait_for(client.lead.getTickets(), 1)
+    assert response["status_code"] == 200
+    assert limiter.get_stats()["retries"] == 0
+
+
+def test_invalid_rate_limit_config() -> None:
+    with pytest.raises(FdkInvalidConfig):
+        PlatformRateLimiter({"cluster": {"rate": 0}}, "https://api.fynd.com")
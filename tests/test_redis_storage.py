@@ -0,0 +1,95 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+from fdk_extension.storage.redis_storage import PRIMARY_ENDPOINT, RedisStorage
+
+
+def get_redis_client_mock(value=None) -> Mock:
+    client = Mock()
+    client.get = AsyncMock(return_value=value)
+    client.set = AsyncMock(return_value=True)
+    client.setex = AsyncMock(return_value=True)
+    client.delete = AsyncMock(return_value=1)
+    return client
+
+
+async def test_get_without_replicas() -> None:
+    primary = get_redis_client_mock("primary_value")
+    storage = RedisStorage(primary, prefix_key="test")
+
+    assert await storage.get("key") == "primary_value"
+    primary.get.assert_called_once_with("test:key")
+
+
+async def test_reads_go_to_replicas_round_robin() -> None:
+    primary = get_redis_client_mock("primary_value")
+    replicas = [get_redis_client_mock("replica_0"), get_redis_client_mock("replica_1")]
+    storage = RedisStorage(primary, prefix_key="test", replica_clients=replicas)
+
+    assert await storage.get("key") == "replica_0"
+    assert await storage.get("key") == "replica_1"
+    primary.get.assert_not_called()
+    assert storage.get_latency_stats()["replica-0"]["count"] == 1
+
+
+async def test_read_your_writes() -> None:
+    primary = get_redis_client_mock("primary_value")
+    replica = get_redis_client_mock("stale_value")
+    storage = RedisStorage(primary, prefix_key="test", replica_clients=[replica])
+
+    await storage.setex("key", 60, "primary_value")
+
+    assert await storage.get("key") == "primary_value"
+    assert await storage.get("other_key") == "stale_value"
+    assert storage.get_latency_stats()["hedging"]["read_your_writes"] == 1
+
+
+async def test_replica_error_falls_back_to_primary() -> None:
+    primary = get_redis_client_mock("primary_value")
+    replica = get_redis_client_mock()
+    replica.get.side_effect = ConnectionError("replica down")
+    storage = RedisStorage(primary, replica_clients=[replica])
+
+    assert await storage.get("key") == "primary_value"
+    assert storage.get_latency_stats()["replica-0"]["errors"] == 1
+
+
+async def test_hedged_read_uses_primary_when_replica_is_slow() -> None:
+    primary = get_redis_client_mock("primary_value")
+    replica = get_redis_client_mock("replica_value")
+    storage = RedisStorage(primary, replica_clients=[replica], hedged_reads=True)
+    for _ in range(50):
+        storage._latency["replica-0"].record(0.001)
+
+    async def slow_get(key):
+        await asyncio.sleep(1)
+        return "replica_value"
+    replica.get = AsyncMock(side_effect=slow_get)
+
+    assert await storage.get("key") == "primary_value"
+    assert storage.get_latency_stats()["hedging"]["primary_won"] == 1
+
+
+async def test_hedged_read_keeps_cancelled_replica_latency() -> None:
+    primary = get_redis_client_mock("primary_value")
+    replica = get_redis_client_mock("replica_value")
+    storage = RedisStorage(primary, replica_clients=[replica], hedged_reads=True)
+    for _ in range(50):
+        storage._latency["replica-0"].record(0.001)
+
+    async def slow_get(key):
+        await asyncio.sleep(1)
+    replica.get = AsyncMock(side_effect=slow_get)
+    primary.get = AsyncMock(side_effect=slow_get)
+
+    read = asyncio.ensure_future(storage.get("key"))
+    await asyncio.sleep(0.05)
+    read.cancel()
+    await asyncio.gather(read, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    replica_stats = storage.get_latency_stats()["replica-0"]
+    assert replica_stats["cancelled"] == 1
+    assert storage._latency["replica-0"]._samples[-1] >= 0.04
+    # the primary read started by the hedge is cancelled with the caller
+    assert storage.get_latency_stats()[PRIMARY_ENDPOINT]["cancelled"] == 1
@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+
+from fdk_extension.clients.rate_limiter import PlatformRateLimiter
+from fdk_extension.clients.response_cache import PlatformResponseCache
+
+from .conftest import *
+
+
+class MockCompanyProfileService:
+    def __init__(self):
+        self.calls = 0
+
+    async def cbsOnboardGet(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return {"status_code": 200, "json": {"uid": COMPANY_ID}, "headers": {"ETag": "W/\"1\""}}
+
+    async def updateCompany(self, body):
+        self.calls += 1
+        return {"status_code": 200, "json": body, "headers": {}}
+
+
+def get_client_mock(service: MockCompanyProfileService) -> SimpleNamespace:
+    return SimpleNamespace(config=SimpleNamespace(), companyProfile=service)
+
+
+async def test_configured_endpoint_is_cached_per_company() -> None:
+    response_cache = PlatformResponseCache({"companyProfile.cbsOnboardGet": 60})
+    service = MockCompanyProfileService()
+    client = response_cache.instrument(get_client_mock(service), COMPANY_ID)
+
+    response = await client.companyProfile.cbsOnboardGet()
+    response["json"]["uid"] = None
+    assert (await client.companyProfile.cbsOnboardGet())["json"]["uid"] == COMPANY_ID
+    await client.companyProfile.updateCompany(body={})
+    await client.companyProfile.updateCompany(body={})
+
+    other_client = response_cache.instrument(get_client_mock(service), 1000)
+    await other_client.companyProfile.cbsOnboardGet()
+
+    assert service.calls == 4
+    stats = response_cache.get_stats()["endpoints"]["companyProfile.cbsOnboardGet"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+async def test_concurrent_calls_are_coalesced() -> None:
+    response_cache = PlatformResponseCache({"companyProfile.cbsOnboardGet": 60})
+    service = MockCompanyProfileService()
+    client = response_cache.instrument(get_client_mock(service), COMPANY_ID)
+
+    responses = await asyncio.gather(*[client.companyProfile.cbsOnboardGet() for _ in range(5)])
+
+    assert service.calls == 1
+    assert all(response["json"]["uid"] == COMPANY_ID for response in responses)
+    assert response_cache.get_stats()["endpoints"]["companyProfile.cbsOnboardGet"]["coalesced"] == 4
+
+
+async def test_cancelled_caller_does_not_cancel_coalesced_calls() -> None:
+    response_cache = PlatformResponseCache({"companyProfile.cbsOnboardGet": 60})
+    service = MockCompanyProfileService()
+    client = response_cache.instrument(get_client_mock(service), COMPANY_ID)
+
+    leader = asyncio.ensure_future(client.companyProfile.cbsOnboardGet())
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(client.companyProfile.cbsOnboardGet())
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert (await follower)["json"]["uid"] == COMPANY_ID
+    assert leader.cancelled()
+    assert service.calls == 1
+
+
+async def test_cache_hits_skip_rate_limiter() -> None:
+    rate_limiter = PlatformRateLimiter({"company": {"rate": 10}}, "https://api.fynd.com")
+    response_cache = PlatformResponseCache({"companyProfile.cbsOnboardGet": 60})
+    client = rate_limiter.instrument(get_client_mock(MockCompanyProfileService()), COMPANY_ID)
+    client = response_cache.instrument(client, COMPANY_ID)
+
+    await client.companyProfile.cbsOnboardGet()
+    await client.companyProfile.cbsOnboardGet()
+
+    assert rate_limiter.get_stats()["calls"] == 1
+
+
+async def test_invalidate_company() -> None:
+    response_cache = PlatformResponseCache({"companyProfile.cbsOnboardGet": 60})
+    service = MockCompanyProfileService()
+    client = response_cache.instrument(get_client_mock(service), COMPANY_ID)
+
+    await client.companyProfile.cbsOnboardGet()
+    response_cache.invalidate(COMPANY_ID)
+    await client.companyProfile.cbsOnboardGet()
+
+    assert service.calls == 2
+    # the refresh is compared with nothing, the invalidated response is gone with its ETag
+    assert response_cache.get_stats()["endpoints"]["companyProfile.cbsOnboardGet"]["unchanged"] == 0
@@ -0,0 +1,37 @@
+import asyncio
+from types import SimpleNamespace
+
+from sanic.response import text
+
+from fdk_extension.middleware.server_timing_middleware import server_timing_on_request, server_timing_on_response
+from fdk_extension.utilities.server_timing import format_server_timing, get_timings, server_timing
+
+
+def test_format_server_timing() -> None:
+    assert format_server_timing({"session": 1.234, "oauth call": 20}) == "session;dur=1.23, oauth_call;dur=20.00"
+
+
+def test_server_timing_outside_request_is_noop() -> None:
+    with server_timing("session"):
+        pass
+
+    assert get_timings() is None
+
+
+async def test_response_middleware_writes_header() -> None:
+    request = SimpleNamespace()
+    await server_timing_on_request(request)
+    for _ in range(2):
+        with server_timing("session"):
+            await asyncio.sleep(0.01)
+    with server_timing("callback"):
+        pass
+    response = text("ok", headers={"Server-Timing": "app;dur=1"})
+
+    await server_timing_on_response(request, response)
+
+    app_timing, session_timing, callback_timing = response.headers["Server-Timing"].split(", ")
+    assert app_timing == "app;dur=1"
+    assert session_timing.startswith("session;dur=") and float(session_timing.split("=")[1]) >= 20
+    assert callback_timing.startswith("callback;dur=")
+    assert get_timings() is None
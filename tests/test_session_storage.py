@@ -0,0 +1,233 @@
+import asyncio
+from datetime import datetime, timedelta
+import json
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+from pytest import MonkeyPatch
+
+from fdk_extension.constants import SESSION_LAYOUT_HASH, SESSION_LAYOUT_STRING
+from fdk_extension.extension import extension
+from fdk_extension.session.session import Session
+from fdk_extension.session.session_storage import SessionStorage
+from fdk_extension.storage.memory_storage import MemoryStorage
+from fdk_extension.utilities.lru_cache import LRUCache
+
+from .conftest import *
+
+
+@pytest.fixture()
+def memory_storage_fixture(monkeypatch: MonkeyPatch) -> MemoryStorage:
+    storage = MemoryStorage("test")
+    monkeypatch.setattr(extension, "storage", storage)
+    monkeypatch.setattr(extension, "session_layout", SESSION_LAYOUT_STRING)
+    return storage
+
+
+async def test_save_and_get_session(memory_storage_fixture: MemoryStorage, session_fixture: Session) -> None:
+    session_fixture.company_id = COMPANY_ID
+    await SessionStorage.save_session(session_fixture)
+
+    session = await SessionStorage.get_session(SESSION_ID)
+
+    assert session.company_id == COMPANY_ID
+    assert session.access_mode == OFFLINE_ACCESS_MODE
+
+
+async def test_hash_layout_partial_update(memory_storage_fixture: MemoryStorage, session_fixture: Session,
+                                          monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(extension, "session_layout", SESSION_LAYOUT_HASH)
+    session_fixture.company_id = COMPANY_ID
+    await SessionStorage.save_session(session_fixture)
+
+    # field written by another request must not be clobbered by a partial update
+    await memory_storage_fixture.hset_mapping(SESSION_ID, {"state": json.dumps("concurrent_state")})
+    session_fixture.access_token = "renewed_token"
+    await SessionStorage.update_session_fields(session_fixture, ["access_token"])
+
+    session = await SessionStorage.get_session(SESSION_ID)
+    assert session.access_token == "renewed_token"
+    assert session.state == "concurrent_state"
+    assert session.company_id == COMPANY_ID
+
+    session = await SessionStorage.get_session(SESSION_ID, fields=["company_id"])
+    assert session.company_id == COMPANY_ID
+    assert session.access_token is None
+
+
+async def test_hash_layout_partial_update_does_not_recreate_session(memory_storage_fixture: MemoryStorage,
+                                                                    session_fixture: Session,
+                                                                    monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(extension, "session_layout", SESSION_LAYOUT_HASH)
+    session_fixture.company_id = COMPANY_ID
+    await SessionStorage.save_session(session_fixture)
+
+    # deleted by a logout or uninstall while a token renewal was running
+    await SessionStorage.delete_session(SESSION_ID)
+    session_fixture.access_token = "renewed_token"
+    await SessionStorage.update_session_fields(session_fixture, ["access_token"])
+
+    assert await memory_storage_fixture.hgetall(SESSION_ID) == {}
+    await memory_storage_fixture.hset_mapping(SESSION_ID, {"access_token": json.dumps("stray_token")})
+    assert await SessionStorage.get_session(SESSION_ID) is None
+
+
+async def test_expired_session_is_deleted_on_save(memory_storage_fixture: MemoryStorage, session_fixture: Session) -> None:
+    session_fixture.company_id = COMPANY_ID
+    await SessionStorage.save_session(session_fixture)
+
+    session_fixture.expires = datetime.now() - timedelta(seconds=1)
+    await SessionStorage.save_session(session_fixture)
+
+    assert await memory_storage_fixture.get(SESSION_ID) is None
+
+
+async def test_hash_layout_migrates_string_session(memory_storage_fixture: MemoryStorage, session_fixture: Session,
+                                                   monkeypatch: MonkeyPatch) -> None:
+    session_fixture.company_id = COMPANY_ID
+    await SessionStorage.save_session(session_fixture)
+    monkeypatch.setattr(extension, "session_layout", SESSION_LAYOUT_HASH)
+
+    session = await SessionStorage.get_session(SESSION_ID)
+
+    assert session.company_id == COMPANY_ID
+    assert json.loads((await memory_storage_fixture.hgetall(SESSION_ID))["company_id"]) == COMPANY_ID
+
+
+async def test_hash_layout_miss_without_migration(memory_storage_fixture: MemoryStorage,
+                                                  monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(extension, "session_layout", SESSION_LAYOUT_HASH)
+    monkeypatch.setattr(extension, "session_layout_migration", False)
+    monkeypatch.setattr(memory_storage_fixture, "get", AsyncMock(return_value=None))
+
+    assert await SessionStorage.get_session(SESSION_ID) is None
+    memory_storage_fixture.get.assert_not_called()
+
+
+def test_session_dirty_tracking(session_fixture: Session) -> None:
+    session = Session.clone_session({"session_id": SESSION_ID, "is_new": False, "company_id": COMPANY_ID})
+    assert not session.is_dirty
+
+    session.company_id = COMPANY_ID
+    assert not session.is_dirty
+
+    session.access_token = "token"
+    assert session.dirty_fields == {"access_token"}
+
+
+async def test_save_session_skips_clean_session(memory_storage_fixture: MemoryStorage, session_fixture: Session) -> None:
+    await SessionStorage.save_session(session_fixture)
+    writes = SessionStorage.get_write_stats()
+
+    await SessionStorage.save_session(session_fixture)
+
+    assert SessionStorage.get_write_stats()["writes"] == writes["writes"]
+    assert SessionStorage.get_write_stats()["writes_skipped"] == writes["writes_skipped"] + 1
+
+
+async def test_unit_of_work_coalesces_saves(memory_storage_fixture: MemoryStorage, session_fixture: Session) -> None:
+    writes = SessionStorage.get_write_stats()
+    SessionStorage.begin_unit_of_work()
+
+    session_fixture.company_id = COMPANY_ID
+    await SessionStorage.save_session(session_fixture)
+    session_fixture.access_token = "token"
+    await SessionStorage.save_session(session_fixture)
+
+    assert await memory_storage_fixture.get(SESSION_ID) is None
+    assert await SessionStorage.get_session(SESSION_ID) is session_fixture
+
+    await SessionStorage.commit_unit_of_work()
+
+    session = await SessionStorage.get_session(SESSION_ID)
+    assert session.access_token == "token"
+    assert SessionStorage.get_write_stats()["writes"] == writes["writes"] + 1
+    assert SessionStorage.get_write_stats()["writes_coalesced"] == writes["writes_coalesced"] + 1
+
+
+async def test_task_save_after_commit_is_written(memory_storage_fixture: MemoryStorage,
+                                                 session_fixture: Session) -> None:
+    SessionStorage.begin_unit_of_work()
+    saved = asyncio.Event()
+
+    async def save_later():
+        await saved.wait()
+        session_fixture.company_id = COMPANY_ID
+        await SessionStorage.save_session(session_fixture)
+
+    # the task copies the request context, including its unit of work
+    task = asyncio.get_running_loop().create_task(save_later())
+    await SessionStorage.commit_unit_of_work()
+    saved.set()
+    await task
+
+    session = await SessionStorage.get_session(SESSION_ID)
+    assert session.company_id == COMPANY_ID
+
+
+async def test_get_session_touch_is_throttled(memory_storage_fixture: MemoryStorage, session_fixture: Session,
+                                              monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(extension, "sliding_session_expiry", {"ttl": 900, "refresh_interval": 60})
+    session_fixture.session_id = "touch_session_id"
+    session_fixture.expires = datetime.now() + timedelta(seconds=10)
+    await SessionStorage.save_session(session_fixture)
+    touches = SessionStorage.get_write_stats()["touches"]
+
+    session = await SessionStorage.get_session("touch_session_id", touch=True)
+    assert session.expiry_refreshed
+    assert session.expires > datetime.now() + timedelta(seconds=800)
+    assert not session.is_dirty
+
+    session = await SessionStorage.get_session("touch_session_id", touch=True)
+    assert not session.expiry_refreshed
+    assert SessionStorage.get_write_stats()["touches"] == touches + 1
+
+
+async def test_save_after_touch_keeps_sliding_ttl(memory_storage_fixture: MemoryStorage, session_fixture: Session,
+                                                  monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(extension, "sliding_session_expiry", {"ttl": 900, "refresh_interval": 60})
+    session_fixture.session_id = "touch_save_session_id"
+    session_fixture.expires = datetime.now() + timedelta(seconds=10)
+    await SessionStorage.save_session(session_fixture)
+    writes = SessionStorage.get_write_stats()["writes"]
+
+    await SessionStorage.get_session("touch_save_session_id", touch=True)
+    assert SessionStorage.get_write_stats()["writes"] == writes
+    # loaded again inside the refresh interval with the stored expiry, then saved as token renewal does
+    session = await SessionStorage.get_session("touch_save_session_id", touch=True)
+    session.access_token = "renewed_token"
+    await SessionStorage.update_session_fields(session, Session.TOKEN_FIELDS)
+
+    assert memory_storage_fixture._expiry["test:touch_save_session_id"] > time.monotonic() + 800
+
+
+async def test_get_request_session_rejects_without_storage_read(memory_storage_fixture: MemoryStorage,
+                                                                monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(extension, "negative_session_cache", LRUCache(100, 5))
+    monkeypatch.setattr(memory_storage_fixture, "get", AsyncMock(return_value=None))
+    stats = SessionStorage.get_lookup_stats()
+    session_id = Session.generate_session_id(True)
+
+    assert await SessionStorage.get_request_session(None) is None
+    assert await SessionStorage.get_request_session("not-a-session-id") is None
+    assert await SessionStorage.get_request_session(session_id) is None
+    assert await SessionStorage.get_request_session(session_id) is None
+
+    memory_storage_fixture.get.assert_called_once_with(session_id)
+    assert SessionStorage.get_lookup_stats()["missing_cookie"] == stats["missing_cookie"] + 1
+    assert SessionStorage.get_lookup_stats()["rejected"] == stats["rejected"] + 1
+    assert SessionStorage.get_lookup_stats()["misses"] == stats["misses"] + 1
+    assert SessionStorage.get_lookup_stats()["negative_hits"] == stats["negative_hits"] + 1
+
+
+async def test_write_session_clears_negative_cache(memory_storage_fixture: MemoryStorage, session_fixture: Session,
+                                                   monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(extension, "negative_session_cache", LRUCache(100, 5))
+    session_fixture.session_id = Session.generate_session_id(True)
+    session_fixture.company_id = COMPANY_ID
+    assert await SessionStorage.get_request_session(session_fixture.session_id) is None
+
+    await SessionStorage.write_session(session_fixture)
+
+    assert (await SessionStorage.get_request_session(session_fixture.session_id)).company_id == COMPANY_ID
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+import pytest
+from pytest import MonkeyPatch
+
+from fdk_extension.extension import extension
+from fdk_extension.session.session import Session
+from fdk_extension.session.session_storage import SessionStorage
+from fdk_extension.session.session_token import SessionRevocationList, SessionTokenSealer
+from fdk_extension.storage.memory_storage import MemoryStorage
+
+from .conftest import *
+
+
+@pytest.fixture()
+def sealer_fixture() -> SessionTokenSealer:
+    return SessionTokenSealer(API_SECRET, "k2", previous_key_ids=["k1"])
+
+
+@pytest.fixture()
+def online_session_fixture() -> Session:
+    session = Session(SESSION_ID)
+    session.company_id = COMPANY_ID
+    session.access_token = "mock_access_token"
+    session.expires = datetime.now() + timedelta(minutes=15)
+    return session
+
+
+def test_seal_and_unseal(sealer_fixture: SessionTokenSealer, online_session_fixture: Session) -> None:
+    token = sealer_fixture.seal(online_session_fixture)
+
+    session = sealer_fixture.unseal(token)
+
+    assert SessionTokenSealer.is_token(token)
+    assert session.is_stateless
+    assert session.session_id == SESSION_ID
+    assert session.company_id == COMPANY_ID
+    assert session.access_token == "mock_access_token"
+
+
+def test_unseal_rejects_tampered_token(sealer_fixture: SessionTokenSealer, online_session_fixture: Session) -> None:
+    token = sealer_fixture.seal(online_session_fixture)
+    tampered = token[:-2] + ("AA" if token[-2:] != "AA" else "BB")
+
+    assert sealer_fixture.unseal(tampered) is None
+    assert sealer_fixture.unseal("v1.k2.invalid") is None
+    assert SessionTokenSealer(API_SECRET, "k2").unseal(token.replace("v1.k2.", "v1.k3.")) is None
+
+
+def test_unseal_expired_token(sealer_fixture: SessionTokenSealer, online_session_fixture: Session) -> None:
+    online_session_fixture.expires = datetime.now() - timedelta(seconds=1)
+
+    assert sealer_fixture.unseal(sealer_fixture.seal(online_session_fixture)) is None
+
+
+def test_key_rotation(online_session_fixture: Session) -> None:
+    old_token = SessionTokenSealer(API_SECRET, "k1").seal(online_session_fixture)
+
+    assert SessionTokenSealer(API_SECRET, "k2", previous_key_ids=["k1"]).unseal(old_token) is not None
+    assert SessionTokenSealer(API_SECRET, "k2").unseal(old_token) is None
+
+
+async def test_revoked_session_is_rejected(sealer_fixture: SessionTokenSealer, online_session_fixture: Session,
+                                           monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(extension, "storage", MemoryStorage("test"))
+    monkeypatch.setattr(extension, "session_token_sealer", sealer_fixture)
+    monkeypatch.setattr(extension, "session_revocation_list", SessionRevocationList())
+    token = await SessionStorage.seal_session(online_session_fixture)
+
+    assert (await SessionStorage.get_session(token)).session_id == SESSION_ID
+
+    await SessionStorage.revoke_session(online_session_fixture)
+
+    assert await SessionStorage.get_session(token) is None
+
+
+def test_unseal_restores_omitted_fields(sealer_fixture: SessionTokenSealer, online_session_fixture: Session) -> None:
+    online_session_fixture.state = "mock_state"
+    online_session_fixture.scope = ["company/profile"]
+    online_session_fixture.extension_id = API_KEY
+    token = sealer_fixture.seal(online_session_fixture)
+
+    session = sealer_fixture.unseal(token, {"scope": ["company/profile"], "extension_id": API_KEY})
+
+    assert "mock_state" not in sealer_fixture.unseal(token).to_json()
+    assert sealer_fixture.unseal(token).scope is None
+    assert session.scope == ["company/profile"]
+    assert session.extension_id == API_KEY
+    assert not session.is_dirty
+
+
+async def test_oversized_session_is_kept_in_storage(sealer_fixture: SessionTokenSealer, online_session_fixture: Session,
+                                                    monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(extension, "storage", MemoryStorage("test"))
+    monkeypatch.setattr(extension, "session_token_sealer", sealer_fixture)
+    monkeypatch.setattr(extension, "session_revocation_list", SessionRevocationList())
+    token = await SessionStorage.seal_session(online_session_fixture)
+    session = await SessionStorage.get_session(token)
+    session.current_user = {"name": "x" * sealer_fixture.max_size}
+
+    assert sealer_fixture.seal(session) is None
+    assert await SessionStorage.seal_session(session) == SESSION_ID
+    assert (await SessionStorage.get_session(SESSION_ID)).current_user == session.current_user
+    assert await extension.storage.hget(SessionStorage.get_company_sessions_key(COMPANY_ID), SESSION_ID) is not None
@@ -0,0 +1,123 @@
+import asyncio
+import os
+
+import pytest
+
+from fdk_extension.storage.base_storage import BaseStorage
+from fdk_extension.storage.memory_storage import MemoryStorage
+from fdk_extension.storage.sqlite_storage import SQLiteStorage
+
+
+class LegacyStorage(MemoryStorage):
+    """Storage implementing only the original abstract methods."""
+    expire = BaseStorage.expire
+    getex = BaseStorage.getex
+    hdel = BaseStorage.hdel
+
+
+@pytest.fixture()
+def sqlite_storage_fixture(tmp_path) -> SQLiteStorage:
+    storage = SQLiteStorage(os.path.join(tmp_path, "fdk.db"), prefix_key="test")
+    yield storage
+    storage._executor.shutdown(wait=True)
+
+
+async def test_memory_storage_setex_expires() -> None:
+    storage = MemoryStorage("test")
+    await storage.setex("key", 0.01, "value")
+    assert await storage.get("key") == "value"
+
+    await asyncio.sleep(0.02)
+    assert await storage.get("key") is None
+
+
+async def test_memory_storage_hash() -> None:
+    storage = MemoryStorage("test")
+    await storage.hset("key", "field", "value")
+    assert await storage.hget("key", "field") == "value"
+    assert await storage.hgetall("key") == {"field": "value"}
+    assert await storage.hgetall("missing") == {}
+
+
+async def test_base_storage_expire_fallback() -> None:
+    storage = LegacyStorage("test")
+    await storage.setex("key", 0.01, "value")
+
+    assert await storage.getex("key", 10) == "value"
+    await asyncio.sleep(0.02)
+    assert await storage.get("key") == "value"
+    assert not await storage.expire("missing", 10)
+
+
+async def test_base_storage_hdel_fallback() -> None:
+    storage = LegacyStorage("test")
+    await storage.hset("key", "first", "1")
+    await storage.hset("key", "second", "2")
+
+    assert await storage.hdel("key", "first", "missing") == 1
+    assert await storage.hgetall("key") == {"second": "2"}
+    assert await storage.hdel("key", "missing") == 0
+
+
+async def test_sqlite_storage_get_set_delete(sqlite_storage_fixture: SQLiteStorage) -> None:
+    await sqlite_storage_fixture.set("key", "value")
+    assert await sqlite_storage_fixture.get("key") == "value"
+
+    await sqlite_storage_fixture.delete("key")
+    assert await sqlite_storage_fixture.get("key") is None
+
+
+async def test_sqlite_storage_setex_and_compact(sqlite_storage_fixture: SQLiteStorage) -> None:
+    await sqlite_storage_fixture.setex("expired", -1, "value")
+    await sqlite_storage_fixture.setex("alive", 60, "value")
+
+    assert await sqlite_storage_fixture.get("expired") is None
+    assert await sqlite_storage_fixture.compact() == 1
+    assert await sqlite_storage_fixture.get("alive") == "value"
+
+
+async def test_sqlite_storage_extend_expire(sqlite_storage_fixture: SQLiteStorage) -> None:
+    await sqlite_storage_fixture.hset_mapping("index", {"field": "1"}, 0.05)
+
+    assert not await sqlite_storage_fixture.extend_expire("index", 0.01)
+    assert await sqlite_storage_fixture.extend_expire("index", 60)
+    await asyncio.sleep(0.06)
+    assert await sqlite_storage_fixture.hgetall("index") == {"field": "1"}
+    assert not await sqlite_storage_fixture.extend_expire("missing", 60)
+
+
+async def test_sqlite_storage_hset_existing(sqlite_storage_fixture: SQLiteStorage) -> None:
+    assert not await sqlite_storage_fixture.hset_existing("key", {"field": "1"})
+    assert await sqlite_storage_fixture.hgetall("key") == {}
+
+    await sqlite_storage_fixture.hset_mapping("key", {"field": "1"})
+    assert await sqlite_storage_fixture.hset_existing("key", {"other": "2"}, 60)
+    assert await sqlite_storage_fixture.hgetall("key") == {"field": "1", "other": "2"}
+
+
+async def test_sqlite_storage_prefix_namespaces(tmp_path) -> None:
+    db_path = os.path.join(tmp_path, "fdk.db")
+    first, second = SQLiteStorage(db_path, prefix_key="first"), SQLiteStorage(db_path, prefix_key="second")
+    await first.set("key", "first_value")
+    await second.setex("key", -1, "second_value")
+
+    assert await second.get("key") is None
+    assert await first.compact() == 0
+    assert await second.compact() == 1
+    assert await first.get("key") == "first_value"
+
+
+async def test_sqlite_storage_hash(sqlite_storage_fixture: SQLiteStorage) -> None:
+    assert await sqlite_storage_fixture.hset("key", "field", "value") == 1
+    assert await sqlite_storage_fixture.hset("key", "field", "new_value") == 0
+    assert await sqlite_storage_fixture.hget("key", "field") == "new_value"
+    assert await sqlite_storage_fixture.hgetall("key") == {"field": "new_value"}
+
+
+async def test_sqlite_storage_hscan(sqlite_storage_fixture: SQLiteStorage) -> None:
+    await sqlite_storage_fixture.hset_mapping("key", {"a": "1", "b": "2", "c": "3"})
+
+    cursor, page = await sqlite_storage_fixture.hscan("key", 0, 2)
+    assert page == {"a": "1", "b": "2"}
+    cursor, page = await sqlite_storage_fixture.hscan("key", cursor, 2)
+    assert (cursor, page) == (0, {"c": "3"})
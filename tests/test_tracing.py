@@ -0,0 +1,62 @@
+import asyncio
+import hashlib
+import hmac
+import json
+from types import SimpleNamespace
+
+import pytest
+from pytest import MonkeyPatch
+
+from fdk_extension.extension import extension
+from fdk_extension.utilities.tracing import InMemoryTracer
+from fdk_extension.webhook import WebhookRegistry
+
+from .conftest import *
+
+
+@pytest.fixture()
+def in_memory_tracer_fixture(monkeypatch: MonkeyPatch) -> InMemoryTracer:
+    tracer = InMemoryTracer()
+    monkeypatch.setattr(extension, "tracer", tracer)
+    return tracer
+
+
+async def test_spans_follow_background_tasks(in_memory_tracer_fixture: InMemoryTracer) -> None:
+    async def background():
+        with in_memory_tracer_fixture.span("fdk.callback.uninstall"):
+            return in_memory_tracer_fixture.get_traceparent()
+
+    with in_memory_tracer_fixture.span("fdk.uninstall") as parent:
+        task = asyncio.ensure_future(background())
+    traceparent = await task
+
+    child, = in_memory_tracer_fixture.get_spans("fdk.callback.uninstall")
+    assert child.parent_id == parent.span_id
+    assert child.trace_id == parent.trace_id
+    assert traceparent == f"00-{parent.trace_id}-{child.span_id}-01"
+    assert in_memory_tracer_fixture.get_traceparent() is None
+
+
+async def test_webhook_spans(in_memory_tracer_fixture: InMemoryTracer) -> None:
+    async def handler(event_name, body, company_id, application_id):
+        raise ValueError("handler failed")
+
+    webhook_registry = WebhookRegistry()
+    webhook_registry._handler_map = {"coupon/update": {"handler": handler}}
+    webhook_registry._config = {"subscribe_on_install": True}
+    webhook_registry._fdk_config = {"api_secret": API_SECRET}
+    body = json.dumps({"event": {"name": "coupon", "type": "update"}, "company_id": COMPANY_ID,
+                       "application_id": "app_1"}).encode()
+    request = SimpleNamespace(json=json.loads(body), body=body, headers={
+        "x-fp-signature": hmac.new(API_SECRET.encode(), body, hashlib.sha256).hexdigest()
+    })
+
+    with pytest.raises(Exception):
+        await webhook_registry.process_webhook(request)
+
+    process, = in_memory_tracer_fixture.get_spans("fdk.webhook.process")
+    verify, = in_memory_tracer_fixture.get_spans("fdk.webhook.verify")
+    handler_span, = in_memory_tracer_fixture.get_spans("fdk.webhook.handler")
+    assert verify.parent_id == handler_span.parent_id == process.span_id
+    assert handler_span.attributes == {"fdk.event": "coupon/update"}
+    assert handler_span.status == process.status == "error"
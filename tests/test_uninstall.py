@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime, timedelta
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+from pytest import MonkeyPatch
+
+from fdk_extension.clients.response_cache import PlatformResponseCache
+from fdk_extension.constants import ONLINE_ACCESS_MODE
+from fdk_extension.extension import extension
+from fdk_extension.install_index import InstallIndex
+from fdk_extension.session.session import Session
+from fdk_extension.session.session_storage import SessionStorage
+from fdk_extension.session import session_token
+from fdk_extension.session.session_token import SessionRevocationList, SessionTokenSealer
+from fdk_extension.storage.memory_storage import MemoryStorage
+from fdk_extension.uninstall import cleanup_company, schedule_uninstall
+
+from .conftest import *
+
+
+@pytest.fixture()
+async def installed_company_fixture(monkeypatch: MonkeyPatch) -> MemoryStorage:
+    storage = MemoryStorage("test")
+    monkeypatch.setattr(extension, "storage", storage)
+    monkeypatch.setattr(extension, "api_key", API_KEY)
+    offline_session = Session(Session.generate_session_id(False, cluster=extension.cluster, company_id=COMPANY_ID))
+    offline_session.company_id = COMPANY_ID
+    await SessionStorage.write_session(offline_session)
+    for _ in range(3):
+        online_session = Session(Session.generate_session_id(True))
+        online_session.company_id = COMPANY_ID
+        online_session.access_mode = ONLINE_ACCESS_MODE
+        await SessionStorage.write_session(online_session)
+    await InstallIndex.add(COMPANY_ID, offline_session.session_id)
+    return storage
+
+
+async def test_cleanup_company_removes_all_keys(installed_company_fixture: MemoryStorage,
+                                                monkeypatch: MonkeyPatch) -> None:
+    response_cache = PlatformResponseCache({"companyProfile.cbsOnboardGet": 60})
+    response_cache._cache.set((str(COMPANY_ID), None, "companyProfile.cbsOnboardGet", "[[], {}]"), {})
+    monkeypatch.setattr(extension, "response_cache", response_cache)
+
+    assert await cleanup_company(COMPANY_ID) == 5
+
+    assert await installed_company_fixture.hgetall(InstallIndex.get_key()) == {}
+    assert len(response_cache._cache) == 0
+    assert [key for key in installed_company_fixture._data if key.startswith("test:fdk_company")] == []
+
+
+async def test_company_index_outlives_its_sessions(monkeypatch: MonkeyPatch) -> None:
+    storage = MemoryStorage("test")
+    monkeypatch.setattr(extension, "storage", storage)
+    index_key = storage.prefix_key + SessionStorage.get_company_sessions_key(COMPANY_ID)
+    sessions = []
+    for seconds in (600, 60):
+        session = Session(Session.generate_session_id(True))
+        session.company_id = COMPANY_ID
+        session.access_mode = ONLINE_ACCESS_MODE
+        session.expires = datetime.now() + timedelta(seconds=seconds)
+        await SessionStorage.write_session(session)
+        sessions.append(session)
+
+    # the shorter lived session written last does not shorten the index
+    assert storage._expiry[index_key] > time.monotonic() + 590
+    await SessionStorage.touch_session(sessions[0], ttl=1200, force=True)
+    assert storage._expiry[index_key] > time.monotonic() + 1190
+
+    assert await cleanup_company(COMPANY_ID) == 3
+    assert await storage.get(sessions[0].session_id) is None
+
+
+async def test_cleanup_company_revokes_stateless_sessions(installed_company_fixture: MemoryStorage,
+                                                          monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.setattr(extension, "session_token_sealer", SessionTokenSealer(API_SECRET, "k1"))
+    monkeypatch.setattr(extension, "session_revocation_list", SessionRevocationList())
+    session = Session(Session.generate_session_id(True))
+    session.company_id = COMPANY_ID
+    session.expires = datetime.now() + timedelta(minutes=15)
+    token = await SessionStorage.seal_session(session)
+
+    await cleanup_company(COMPANY_ID)
+    # a worker that has not reloaded the revocation list yet reseals the token later, as sliding expiry does
+    later = SimpleNamespace(time=lambda: time.time() + 5, monotonic=time.monotonic)
+    monkeypatch.setattr(session_token, "time", later)
+    resealed = await SessionStorage.seal_session(extension.session_token_sealer.unseal(token))
+
+    assert await SessionStorage.get_session(token) is None
+    assert await SessionStorage.get_session(resealed) is None
+    assert await extension.session_revocation_list.is_revoked_in_storage(
+        extension.storage, extension.session_token_sealer.unseal(resealed))
+    # sessions of the next install are accepted
+    assert await SessionStorage.get_session(await SessionStorage.seal_session(session)) is not None
+
+
+async def test_uninstall_callback_runs_in_background_with_timeout(installed_company_fixture: MemoryStorage,
+                                                                  monkeypatch: MonkeyPatch) -> None:
+    callback_started = asyncio.Event()
+
+    async def slow_uninstall_callback(request):
+        callback_started.set()
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(extension, "callbacks", {"uninstall": slow_uninstall_callback})
+    monkeypatch.setattr(extension, "uninstall_callback_timeout", 0.05)
+
+    task = schedule_uninstall(Mock(), COMPANY_ID)
+    assert not task.done()
+
+    await asyncio.wait_for(task, 1)
+    assert callback_started.is_set()
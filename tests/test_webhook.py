@@ -0,0 +1,91 @@
+import copy
+from types import SimpleNamespace
+
+import pytest
+
+from fdk_extension.exceptions import FdkWebhookRegistrationError
+from fdk_extension.webhook import WebhookRegistry
+
+from .conftest import *
+
+
+class MockWebhookService:
+    def __init__(self, application_ids: list, lost_updates: int=0):
+        self.subscriber_config = {
+            "id": 1,
+            "name": API_KEY,
+            "association": {"company_id": COMPANY_ID, "application_id": application_ids, "criteria": "SPECIFIC-EVENTS"},
+            "event_configs": [{"id": 10}],
+            "modified_by": "system"
+        }
+        self.lost_updates = lost_updates
+        self.reads = 0
+        self.updates = 0
+
+    async def getSubscribersByExtensionId(self, extension_id):
+        self.reads += 1
+        return {"status_code": 200, "json": {"items": [copy.deepcopy(self.subscriber_config)]}, "headers": {}}
+
+    async def updateSubscriberConfig(self, body):
+        self.updates += 1
+        if self.lost_updates:
+            # overwritten by a concurrent writer
+            self.lost_updates -= 1
+        else:
+            self.subscriber_config.update(copy.deepcopy(body))
+        return {"status_code": 200, "json": body, "headers": {}}
+
+
+@pytest.fixture()
+def specific_webhook_registry_fixture() -> WebhookRegistry:
+    webhook_registry = WebhookRegistry()
+    webhook_registry._handler_map = {"application/coupon/update": {}}
+    webhook_registry._config = {"subscribed_saleschannel": "specific", "subscribe_on_install": True}
+    webhook_registry._fdk_config = {"api_key": API_KEY}
+    return webhook_registry
+
+
+def get_platform_client_mock(webhook_service: MockWebhookService) -> SimpleNamespace:
+    return SimpleNamespace(_conf=SimpleNamespace(companyId=COMPANY_ID), webhook=webhook_service)
+
+
+async def test_batch_update_applies_set_difference_once(specific_webhook_registry_fixture: WebhookRegistry) -> None:
+    webhook_service = MockWebhookService(["app_1", "app_2"])
+    platform_client = get_platform_client_mock(webhook_service)
+
+    result = await specific_webhook_registry_fixture.update_sales_channel_webhooks(
+        platform_client, enable=["app_2", "app_3", "app_4"], disable=["app_1", "app_5"])
+
+    assert result == {"added": ["app_3", "app_4"], "removed": ["app_1"], "updated": True, "attempts": 1}
+    assert webhook_service.subscriber_config["association"]["application_id"] == ["app_2", "app_3", "app_4"]
+    assert webhook_service.subscriber_config["event_id"] == [10]
+    assert webhook_service.updates == 1
+
+
+async def test_batch_update_skips_unchanged_set(specific_webhook_registry_fixture: WebhookRegistry) -> None:
+    webhook_service = MockWebhookService(["app_1"])
+
+    result = await specific_webhook_registry_fixture.enable_sales_channel_webhooks(
+        get_platform_client_mock(webhook_service), ["app_1"])
+
+    assert not result["updated"]
+    assert webhook_service.updates == 0
+
+
+async def test_batch_update_retries_lost_update(specific_webhook_registry_fixture: WebhookRegistry) -> None:
+    webhook_service = MockWebhookService([], lost_updates=1)
+
+    result = await specific_webhook_registry_fixture.enable_sales_channel_webhooks(
+        get_platform_client_mock(webhook_service), ["app_1", "app_2"])
+
+    assert result["attempts"] == 2
+    assert webhook_service.subscriber_config["association"]["application_id"] == ["app_1", "app_2"]
+
+
+async def test_batch_update_gives_up_after_retries(specific_webhook_registry_fixture: WebhookRegistry) -> None:
+    webhook_service = MockWebhookService(["app_1"], lost_updates=10)
+
+    with pytest.raises(FdkWebhookRegistrationError):
+        await specific_webhook_registry_fixture.disable_sales_channel_webhooks(
+            get_platform_client_mock(webhook_service), ["app_1"])
+    assert webhook_service.updates == 4
@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from fdk_extension.exceptions import FdkInvalidWebhookConfig, FdkWebhookExecutorBusy
+from fdk_extension.webhook import WebhookRegistry
+from fdk_extension.webhook_executor import WebhookExecutor
+
+from .conftest import *
+
+
+def transform_payload(event_name, body, company_id, application_id):
+    return len(body["payload"]["items"])
+
+
+def get_webhook_request(body: dict) -> SimpleNamespace:
+    raw_body = json.dumps(body).encode()
+    return SimpleNamespace(json=body, body=raw_body, headers={
+        "x-fp-signature": hmac.new(API_SECRET.encode(), raw_body, hashlib.sha256).hexdigest()
+    })
+
+
+@pytest.fixture()
+def thread_webhook_registry_fixture() -> WebhookRegistry:
+    webhook_registry = WebhookRegistry()
+    webhook_registry._config = {"subscribe_on_install": True, "executors": {"thread": {"max_workers": 1}}}
+    webhook_registry._fdk_config = {"api_secret": API_SECRET}
+    return webhook_registry
+
+
+async def test_thread_handler_runs_off_loop(thread_webhook_registry_fixture: WebhookRegistry) -> None:
+    threads = []
+
+    def handler(event_name, body, company_id, application_id):
+        threads.append(threading.current_thread().name)
+
+    handler_map = {"company/product/update": {"version": "1", "handler": handler, "execution": "thread"}}
+    thread_webhook_registry_fixture._WebhookRegistry__validate_execution_modes(handler_map)
+    thread_webhook_registry_fixture._handler_map = handler_map
+
+    await thread_webhook_registry_fixture.process_webhook(get_webhook_request({
+        "event": {"name": "product", "type": "update", "category": "company"},
+        "company_id": COMPANY_ID, "application_id": None
+    }))
+
+    assert threads[0].startswith("fdk-webhook-thread")
+    assert thread_webhook_registry_fixture.get_executor_stats()["thread"]["completed"] == 1
+    await thread_webhook_registry_fixture.shutdown_executors()
+
+
+async def test_invalid_execution_modes(thread_webhook_registry_fixture: WebhookRegistry) -> None:
+    async def async_handler(event_name, body, company_id, application_id):
+        pass
+
+    with pytest.raises(FdkInvalidWebhookConfig, match="regular function"):
+        thread_webhook_registry_fixture._WebhookRegistry__validate_execution_modes(
+            {"company/product/update": {"handler": async_handler, "execution": "thread"}})
+    with pytest.raises(FdkInvalidWebhookConfig, match="process pool"):
+        thread_webhook_registry_fixture._WebhookRegistry__validate_execution_modes(
+            {"company/product/update": {"handler": lambda *args: None, "execution": "process"}})
+    with pytest.raises(FdkInvalidWebhookConfig, match="Invalid execution"):
+        thread_webhook_registry_fixture._WebhookRegistry__validate_execution_modes(
+            {"company/product/update": {"handler": transform_payload, "execution": "fiber"}})
+
+
+async def test_full_queue_rejects() -> None:
+    executor = WebhookExecutor("thread", max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    running = asyncio.ensure_future(executor.run(release.wait))
+    queued = asyncio.ensure_future(executor.run(release.wait))
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(FdkWebhookExecutorBusy):
+        await executor.run(release.wait)
+    release.set()
+    await asyncio.gather(running, queued)
+
+    assert executor.get_stats()["completed"] == 2
+    assert executor.get_stats()["rejected"] == 1
+    await executor.shutdown()
+
+
+async def test_process_pool_returns_result() -> None:
+    executor = WebhookExecutor("process", max_workers=1)
+
+    result = await executor.run(transform_payload, "product/update", {"payload": {"items": [1, 2, 3]}}, COMPANY_ID, None)
+
+    assert result == 3
+    await executor.shutdown()